@@ -0,0 +1,62 @@
+"""
+Compares the results of two runs of `benchmarks.load`, for example of two commits.
+
+    python -m benchmarks.compare baseline.json results.json
+
+Changes in latency and memory are shown as a percentage of the baseline, so negative numbers are improvements.
+For throughput, positive numbers are improvements.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any
+
+
+def format_change(baseline: float, result: float) -> str:
+    if baseline == 0:
+        return "n/a"
+    return f"{(result - baseline) / baseline * 100:+.1f}%"
+
+
+def compare(baseline: dict[str, Any], result: dict[str, Any]) -> list[tuple[str, float, float]]:
+    """Gets the metrics that are compared as tuples of the name, the baseline value and the result value."""
+    metrics = [
+        ("requests_per_second", baseline["requests_per_second"], result["requests_per_second"]),
+        ("peak_rss_mb", baseline["peak_rss_mb"], result["peak_rss_mb"]),
+    ]
+    for statistic in ("p50_ms", "p95_ms", "p99_ms"):
+        metrics.append((f"latency.{statistic}", baseline["latency"][statistic], result["latency"][statistic]))
+    for name in sorted(baseline["latency_per_request"].keys() & result["latency_per_request"].keys()):
+        for statistic in ("p50_ms", "p99_ms"):
+            metrics.append(
+                (
+                    f"{name}.{statistic}",
+                    baseline["latency_per_request"][name][statistic],
+                    result["latency_per_request"][name][statistic],
+                )
+            )
+    return metrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", type=Path, help="the results of the baseline")
+    parser.add_argument("result", type=Path, help="the results to compare with the baseline")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text())
+    result = json.loads(args.result.read_text())
+    if baseline["parameters"] != result["parameters"]:
+        print(f"Warning: the parameters differ:\n  {baseline['parameters']}\n  {result['parameters']}\n")
+
+    print(f"{'metric':40} {'baseline':>12} {'result':>12} {'change':>9}")
+    for name, baseline_value, result_value in compare(baseline, result):
+        change = format_change(baseline_value, result_value)
+        print(f"{name:40} {baseline_value:12.2f} {result_value:12.2f} {change:>9}")
+
+
+if __name__ == "__main__":
+    main()
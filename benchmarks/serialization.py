@@ -0,0 +1,68 @@
+"""
+Compares the previous response path of `GET /songs/` with `SongListResponse`.
+
+The previous path validated a `SongResponse` for each song, after which FastAPI validated the returned list again
+against the response model and serialized it with its JSON encoder. Both paths are served by a minimal FastAPI app
+from songs in memory, so that only validation and serialization are measured.
+
+Run it with:
+
+    python -m benchmarks.serialization
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from collections.abc import Callable
+
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from songs_api.database import SongRow
+from songs_api.endpoints import SongListResponse, SongResponse
+
+
+def build_benchmark_app(songs: list[SongRow]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/previous")
+    def get_songs_previous() -> list[SongResponse]:
+        return [SongResponse.model_validate(song) for song in songs]
+
+    @app.get("/current", response_model=list[SongResponse])
+    def get_songs_current() -> SongListResponse:
+        return SongListResponse(songs)
+
+    return app
+
+
+def measure(request: Callable[[], object], repetitions: int) -> float:
+    """Returns the average duration of a request in milliseconds."""
+    request()  # Warm up.
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        request()
+    return (time.perf_counter() - start) * 1000 / repetitions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=1000, help="the number of songs per response")
+    parser.add_argument("--repetitions", type=int, default=200, help="the number of requests per path")
+    args = parser.parse_args()
+
+    songs = [SongRow(i, f"Song {i}", "Roger Hodgson", "Supertramp", 1979) for i in range(1, args.songs + 1)]
+    client = TestClient(build_benchmark_app(songs))
+    assert client.get("/previous").json() == client.get("/current").json()
+
+    previous = measure(lambda: client.get("/previous"), args.repetitions)
+    current = measure(lambda: client.get("/current"), args.repetitions)
+    print(f"Songs per response: {args.songs}")
+    print(f"Previous path:      {previous:8.2f} ms per request")
+    print(f"SongListResponse:   {current:8.2f} ms per request")
+    print(f"Speedup:            {previous / current:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,4 +11,4 @@ echo "PostgreSQL started"
 cd /app
 
 echo "Starting FastAPI..."
-exec $POETRY_HOME/bin/poetry run fastapi run songs_api/main.py
+exec $POETRY_HOME/bin/poetry run python -m songs_api.serve
@@ -0,0 +1,6 @@
+-- The indexes support the filters and sort orders of GET /songs/. The id is included in each index, so that the
+-- matching songs can be read in the order of the keyset pagination directly from the index.
+CREATE INDEX ix_song_title_id ON song (title, id);
+CREATE INDEX ix_song_composer_id ON song (composer, id);
+CREATE INDEX ix_song_artist_id ON song (artist, id);
+CREATE INDEX ix_song_year_of_release_id ON song (year_of_release, id);
@@ -0,0 +1,7 @@
+-- The full-text index for GET /songs/search. The generated column is kept in sync with the other columns by
+-- PostgreSQL itself. The 'simple' configuration is used, because titles and names are not in a single language.
+ALTER TABLE song ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+    to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(composer, '') || ' ' || coalesce(artist, ''))
+) STORED;
+
+CREATE INDEX ix_song_search_vector ON song USING GIN (search_vector);
@@ -0,0 +1,86 @@
+-- The summary tables for GET /songs/stats/... They contain the number of songs per year of release, composer and
+-- artist, so that the statistics are read in time proportional to the number of groups instead of the number of songs.
+-- The statement-level triggers keep them in sync with the song table. They aggregate the changed rows per group, so a
+-- batch or bulk import updates each group once. Songs without composer or artist are not counted per composer or
+-- artist. Run `python -m songs_api.rebuild_statistics` to recompute the summary tables.
+CREATE TABLE song_count_per_year (
+    year_of_release SMALLINT PRIMARY KEY,
+    song_count INTEGER NOT NULL
+);
+
+CREATE TABLE song_count_per_composer (
+    composer VARCHAR(100) PRIMARY KEY,
+    song_count INTEGER NOT NULL
+);
+
+CREATE TABLE song_count_per_artist (
+    artist VARCHAR(100) PRIMARY KEY,
+    song_count INTEGER NOT NULL
+);
+
+-- These indexes serve the composers and artists with the most songs.
+CREATE INDEX ix_song_count_per_composer_song_count ON song_count_per_composer (song_count DESC, composer);
+
+CREATE INDEX ix_song_count_per_artist_song_count ON song_count_per_artist (song_count DESC, artist);
+
+-- Subtracts the songs in old_songs and adds the songs in new_songs. The transition tables that do not exist for the
+-- operation are not referenced.
+CREATE FUNCTION update_song_statistics() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE song_count_per_year AS s SET song_count = s.song_count - o.song_count
+        FROM (SELECT year_of_release, count(*) AS song_count FROM old_songs GROUP BY year_of_release) AS o
+        WHERE s.year_of_release = o.year_of_release;
+        UPDATE song_count_per_composer AS s SET song_count = s.song_count - o.song_count
+        FROM (SELECT composer, count(*) AS song_count FROM old_songs GROUP BY composer) AS o
+        WHERE s.composer = o.composer;
+        UPDATE song_count_per_artist AS s SET song_count = s.song_count - o.song_count
+        FROM (SELECT artist, count(*) AS song_count FROM old_songs GROUP BY artist) AS o
+        WHERE s.artist = o.artist;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO song_count_per_year AS s (year_of_release, song_count)
+        SELECT year_of_release, count(*) FROM new_songs GROUP BY year_of_release
+        ON CONFLICT (year_of_release) DO UPDATE SET song_count = s.song_count + excluded.song_count;
+        INSERT INTO song_count_per_composer AS s (composer, song_count)
+        SELECT composer, count(*) FROM new_songs WHERE composer IS NOT NULL GROUP BY composer
+        ON CONFLICT (composer) DO UPDATE SET song_count = s.song_count + excluded.song_count;
+        INSERT INTO song_count_per_artist AS s (artist, song_count)
+        SELECT artist, count(*) FROM new_songs WHERE artist IS NOT NULL GROUP BY artist
+        ON CONFLICT (artist) DO UPDATE SET song_count = s.song_count + excluded.song_count;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM song_count_per_year AS s USING old_songs AS o
+        WHERE s.year_of_release = o.year_of_release AND s.song_count = 0;
+        DELETE FROM song_count_per_composer AS s USING old_songs AS o
+        WHERE s.composer = o.composer AND s.song_count = 0;
+        DELETE FROM song_count_per_artist AS s USING old_songs AS o
+        WHERE s.artist = o.artist AND s.song_count = 0;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER song_statistics_after_insert AFTER INSERT ON song
+REFERENCING NEW TABLE AS new_songs
+FOR EACH STATEMENT EXECUTE FUNCTION update_song_statistics();
+
+CREATE TRIGGER song_statistics_after_update AFTER UPDATE ON song
+REFERENCING OLD TABLE AS old_songs NEW TABLE AS new_songs
+FOR EACH STATEMENT EXECUTE FUNCTION update_song_statistics();
+
+CREATE TRIGGER song_statistics_after_delete AFTER DELETE ON song
+REFERENCING OLD TABLE AS old_songs
+FOR EACH STATEMENT EXECUTE FUNCTION update_song_statistics();
+
+-- Count the songs that already exist.
+INSERT INTO song_count_per_year (year_of_release, song_count)
+SELECT year_of_release, count(*) FROM song GROUP BY year_of_release;
+
+INSERT INTO song_count_per_composer (composer, song_count)
+SELECT composer, count(*) FROM song WHERE composer IS NOT NULL GROUP BY composer;
+
+INSERT INTO song_count_per_artist (artist, song_count)
+SELECT artist, count(*) FROM song WHERE artist IS NOT NULL GROUP BY artist;
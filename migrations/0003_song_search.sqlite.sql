@@ -0,0 +1,21 @@
+-- The full-text index for GET /songs/search. It is an external content FTS5 table, which only stores the index and
+-- reads the columns from the song table. The triggers keep the index in sync with the song table.
+CREATE VIRTUAL TABLE song_search USING fts5(title, composer, artist, content='song', content_rowid='id');
+
+CREATE TRIGGER song_search_after_insert AFTER INSERT ON song BEGIN
+    INSERT INTO song_search (rowid, title, composer, artist) VALUES (new.id, new.title, new.composer, new.artist);
+END;
+
+CREATE TRIGGER song_search_after_delete AFTER DELETE ON song BEGIN
+    INSERT INTO song_search (song_search, rowid, title, composer, artist)
+    VALUES ('delete', old.id, old.title, old.composer, old.artist);
+END;
+
+CREATE TRIGGER song_search_after_update AFTER UPDATE ON song BEGIN
+    INSERT INTO song_search (song_search, rowid, title, composer, artist)
+    VALUES ('delete', old.id, old.title, old.composer, old.artist);
+    INSERT INTO song_search (rowid, title, composer, artist) VALUES (new.id, new.title, new.composer, new.artist);
+END;
+
+-- Index the songs that already exist.
+INSERT INTO song_search (song_search) VALUES ('rebuild');
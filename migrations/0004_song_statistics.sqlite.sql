@@ -0,0 +1,69 @@
+-- The summary tables for GET /songs/stats/... They contain the number of songs per year of release, composer and
+-- artist, so that the statistics are read in time proportional to the number of groups instead of the number of songs.
+-- The triggers keep them in sync with the song table. Songs without composer or artist are not counted per composer or
+-- artist. Run `python -m songs_api.rebuild_statistics` to recompute the summary tables.
+CREATE TABLE song_count_per_year (
+    year_of_release SMALLINT PRIMARY KEY,
+    song_count INTEGER NOT NULL
+);
+
+CREATE TABLE song_count_per_composer (
+    composer VARCHAR(100) PRIMARY KEY,
+    song_count INTEGER NOT NULL
+);
+
+CREATE TABLE song_count_per_artist (
+    artist VARCHAR(100) PRIMARY KEY,
+    song_count INTEGER NOT NULL
+);
+
+-- These indexes serve the composers and artists with the most songs.
+CREATE INDEX ix_song_count_per_composer_song_count ON song_count_per_composer (song_count DESC, composer);
+
+CREATE INDEX ix_song_count_per_artist_song_count ON song_count_per_artist (song_count DESC, artist);
+
+CREATE TRIGGER song_statistics_after_insert AFTER INSERT ON song BEGIN
+    INSERT INTO song_count_per_year (year_of_release, song_count) VALUES (new.year_of_release, 1)
+    ON CONFLICT (year_of_release) DO UPDATE SET song_count = song_count + 1;
+    INSERT INTO song_count_per_composer (composer, song_count) SELECT new.composer, 1 WHERE new.composer IS NOT NULL
+    ON CONFLICT (composer) DO UPDATE SET song_count = song_count + 1;
+    INSERT INTO song_count_per_artist (artist, song_count) SELECT new.artist, 1 WHERE new.artist IS NOT NULL
+    ON CONFLICT (artist) DO UPDATE SET song_count = song_count + 1;
+END;
+
+CREATE TRIGGER song_statistics_after_delete AFTER DELETE ON song BEGIN
+    UPDATE song_count_per_year SET song_count = song_count - 1 WHERE year_of_release = old.year_of_release;
+    DELETE FROM song_count_per_year WHERE year_of_release = old.year_of_release AND song_count = 0;
+    UPDATE song_count_per_composer SET song_count = song_count - 1 WHERE composer = old.composer;
+    DELETE FROM song_count_per_composer WHERE composer = old.composer AND song_count = 0;
+    UPDATE song_count_per_artist SET song_count = song_count - 1 WHERE artist = old.artist;
+    DELETE FROM song_count_per_artist WHERE artist = old.artist AND song_count = 0;
+END;
+
+-- The trigger only acts if a counted column changes, so that updates of the title do not touch the summary tables.
+CREATE TRIGGER song_statistics_after_update AFTER UPDATE OF year_of_release, composer, artist ON song
+WHEN new.year_of_release IS NOT old.year_of_release OR new.composer IS NOT old.composer OR new.artist IS NOT old.artist
+BEGIN
+    INSERT INTO song_count_per_year (year_of_release, song_count) VALUES (new.year_of_release, 1)
+    ON CONFLICT (year_of_release) DO UPDATE SET song_count = song_count + 1;
+    UPDATE song_count_per_year SET song_count = song_count - 1 WHERE year_of_release = old.year_of_release;
+    DELETE FROM song_count_per_year WHERE year_of_release = old.year_of_release AND song_count = 0;
+    INSERT INTO song_count_per_composer (composer, song_count) SELECT new.composer, 1 WHERE new.composer IS NOT NULL
+    ON CONFLICT (composer) DO UPDATE SET song_count = song_count + 1;
+    UPDATE song_count_per_composer SET song_count = song_count - 1 WHERE composer = old.composer;
+    DELETE FROM song_count_per_composer WHERE composer = old.composer AND song_count = 0;
+    INSERT INTO song_count_per_artist (artist, song_count) SELECT new.artist, 1 WHERE new.artist IS NOT NULL
+    ON CONFLICT (artist) DO UPDATE SET song_count = song_count + 1;
+    UPDATE song_count_per_artist SET song_count = song_count - 1 WHERE artist = old.artist;
+    DELETE FROM song_count_per_artist WHERE artist = old.artist AND song_count = 0;
+END;
+
+-- Count the songs that already exist.
+INSERT INTO song_count_per_year (year_of_release, song_count)
+SELECT year_of_release, count(*) FROM song GROUP BY year_of_release;
+
+INSERT INTO song_count_per_composer (composer, song_count)
+SELECT composer, count(*) FROM song WHERE composer IS NOT NULL GROUP BY composer;
+
+INSERT INTO song_count_per_artist (artist, song_count)
+SELECT artist, count(*) FROM song WHERE artist IS NOT NULL GROUP BY artist;
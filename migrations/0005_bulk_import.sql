@@ -0,0 +1,7 @@
+-- The progress of bulk imports (python -m songs_api.bulk_import). It is updated in the same transaction as the songs
+-- of each batch, so an interrupted import resumes after the last committed batch.
+CREATE TABLE bulk_import (
+    name VARCHAR(255) PRIMARY KEY,
+    rows_read INTEGER NOT NULL,
+    rows_imported INTEGER NOT NULL
+);
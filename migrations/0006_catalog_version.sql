@@ -0,0 +1,8 @@
+-- The version of the song catalog, which is incremented by every transaction that changes songs. It is used for the
+-- ETags of the song endpoints, so that clients can poll with If-None-Match.
+CREATE TABLE catalog_version (
+    id INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL
+);
+
+INSERT INTO catalog_version (id, version) VALUES (1, 1);
@@ -0,0 +1,47 @@
+-- The change feed for GET /songs/changes. The table holds the last change of each song with the catalog version of the
+-- transaction that made it, so clients can read the songs that changed after the catalog version they know. A deleted
+-- song keeps its row as a tombstone. The statement-level triggers read the catalog version, which DatabaseAccess
+-- increments before the first change of a transaction.
+CREATE TABLE song_change (
+    song_id INTEGER PRIMARY KEY,
+    catalog_version BIGINT NOT NULL,
+    deleted BOOLEAN NOT NULL
+);
+
+-- This index serves the changes after a cursor in the order of the feed.
+CREATE INDEX ix_song_change_catalog_version ON song_change (catalog_version, song_id);
+
+-- Records the songs in new_songs as changed and the songs in old_songs as deleted. The transition tables that do not
+-- exist for the operation are not referenced.
+CREATE FUNCTION record_song_changes() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    current_version BIGINT := (SELECT version FROM catalog_version WHERE id = 1);
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO song_change (song_id, catalog_version, deleted)
+        SELECT id, current_version, FALSE FROM new_songs
+        ON CONFLICT (song_id) DO UPDATE SET catalog_version = excluded.catalog_version, deleted = FALSE;
+    ELSE
+        INSERT INTO song_change (song_id, catalog_version, deleted)
+        SELECT id, current_version, TRUE FROM old_songs
+        ON CONFLICT (song_id) DO UPDATE SET catalog_version = excluded.catalog_version, deleted = TRUE;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER song_change_after_insert AFTER INSERT ON song
+REFERENCING NEW TABLE AS new_songs
+FOR EACH STATEMENT EXECUTE FUNCTION record_song_changes();
+
+CREATE TRIGGER song_change_after_update AFTER UPDATE ON song
+REFERENCING NEW TABLE AS new_songs
+FOR EACH STATEMENT EXECUTE FUNCTION record_song_changes();
+
+CREATE TRIGGER song_change_after_delete AFTER DELETE ON song
+REFERENCING OLD TABLE AS old_songs
+FOR EACH STATEMENT EXECUTE FUNCTION record_song_changes();
+
+-- Record the songs that already exist.
+INSERT INTO song_change (song_id, catalog_version, deleted)
+SELECT id, (SELECT version FROM catalog_version WHERE id = 1), FALSE FROM song;
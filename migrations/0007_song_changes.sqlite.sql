@@ -0,0 +1,34 @@
+-- The change feed for GET /songs/changes. The table holds the last change of each song with the catalog version of the
+-- transaction that made it, so clients can read the songs that changed after the catalog version they know. A deleted
+-- song keeps its row as a tombstone. The triggers read the catalog version, which DatabaseAccess increments before the
+-- first change of a transaction.
+CREATE TABLE song_change (
+    song_id INTEGER PRIMARY KEY,
+    catalog_version BIGINT NOT NULL,
+    deleted BOOLEAN NOT NULL
+);
+
+-- This index serves the changes after a cursor in the order of the feed.
+CREATE INDEX ix_song_change_catalog_version ON song_change (catalog_version, song_id);
+
+CREATE TRIGGER song_change_after_insert AFTER INSERT ON song BEGIN
+    INSERT INTO song_change (song_id, catalog_version, deleted)
+    VALUES (new.id, (SELECT version FROM catalog_version WHERE id = 1), 0)
+    ON CONFLICT (song_id) DO UPDATE SET catalog_version = excluded.catalog_version, deleted = 0;
+END;
+
+CREATE TRIGGER song_change_after_update AFTER UPDATE ON song BEGIN
+    INSERT INTO song_change (song_id, catalog_version, deleted)
+    VALUES (new.id, (SELECT version FROM catalog_version WHERE id = 1), 0)
+    ON CONFLICT (song_id) DO UPDATE SET catalog_version = excluded.catalog_version, deleted = 0;
+END;
+
+CREATE TRIGGER song_change_after_delete AFTER DELETE ON song BEGIN
+    INSERT INTO song_change (song_id, catalog_version, deleted)
+    VALUES (old.id, (SELECT version FROM catalog_version WHERE id = 1), 1)
+    ON CONFLICT (song_id) DO UPDATE SET catalog_version = excluded.catalog_version, deleted = 1;
+END;
+
+-- Record the songs that already exist.
+INSERT INTO song_change (song_id, catalog_version, deleted)
+SELECT id, (SELECT version FROM catalog_version WHERE id = 1), 0 FROM song;
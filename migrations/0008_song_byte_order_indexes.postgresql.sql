@@ -0,0 +1,9 @@
+-- The filters of GET /songs/ compare titles, composers and artists byte-wise with COLLATE "C", because prefixes are
+-- matched with range conditions, which only select the strings that start with the prefix in byte order. The indexes
+-- are rebuilt with the same collation, so that they still serve these filters.
+DROP INDEX ix_song_title_id;
+CREATE INDEX ix_song_title_id ON song (title COLLATE "C", id);
+DROP INDEX ix_song_composer_id;
+CREATE INDEX ix_song_composer_id ON song (composer COLLATE "C", id);
+DROP INDEX ix_song_artist_id;
+CREATE INDEX ix_song_artist_id ON song (artist COLLATE "C", id);
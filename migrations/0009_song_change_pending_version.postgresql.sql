@@ -0,0 +1,18 @@
+-- The triggers record the changes of songs with the pending catalog version 0. DatabaseAccess increments the catalog
+-- version and assigns it to the pending changes of its transaction right before the commit, so the catalog_version row
+-- is only locked for the end of each transaction instead of from its first change until its commit. The pending
+-- changes of other transactions are not visible, so they are not assigned.
+CREATE OR REPLACE FUNCTION record_song_changes() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO song_change (song_id, catalog_version, deleted)
+        SELECT id, 0, FALSE FROM new_songs
+        ON CONFLICT (song_id) DO UPDATE SET catalog_version = excluded.catalog_version, deleted = FALSE;
+    ELSE
+        INSERT INTO song_change (song_id, catalog_version, deleted)
+        SELECT id, 0, TRUE FROM old_songs
+        ON CONFLICT (song_id) DO UPDATE SET catalog_version = excluded.catalog_version, deleted = TRUE;
+    END IF;
+    RETURN NULL;
+END
+$$;
@@ -0,0 +1,24 @@
+-- The triggers record the changes of songs with the pending catalog version 0. DatabaseAccess increments the catalog
+-- version and assigns it to the pending changes right before the commit, so the catalog_version row is only locked for
+-- the end of each transaction instead of from its first change until its commit.
+DROP TRIGGER song_change_after_insert;
+DROP TRIGGER song_change_after_update;
+DROP TRIGGER song_change_after_delete;
+
+CREATE TRIGGER song_change_after_insert AFTER INSERT ON song BEGIN
+    INSERT INTO song_change (song_id, catalog_version, deleted)
+    VALUES (new.id, 0, 0)
+    ON CONFLICT (song_id) DO UPDATE SET catalog_version = excluded.catalog_version, deleted = 0;
+END;
+
+CREATE TRIGGER song_change_after_update AFTER UPDATE ON song BEGIN
+    INSERT INTO song_change (song_id, catalog_version, deleted)
+    VALUES (new.id, 0, 0)
+    ON CONFLICT (song_id) DO UPDATE SET catalog_version = excluded.catalog_version, deleted = 0;
+END;
+
+CREATE TRIGGER song_change_after_delete AFTER DELETE ON song BEGIN
+    INSERT INTO song_change (song_id, catalog_version, deleted)
+    VALUES (old.id, 0, 1)
+    ON CONFLICT (song_id) DO UPDATE SET catalog_version = excluded.catalog_version, deleted = 1;
+END;
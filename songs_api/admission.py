@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from songs_api.config import Config
+
+READ_METHODS = frozenset({"GET", "HEAD"})
+"""The HTTP methods of requests that are admitted as reads. Requests with other methods, except OPTIONS, are writes."""
+
+EXEMPT_PATHS = frozenset({"/metrics"})
+"""The paths of requests that are always admitted, so that an overloaded service can still be monitored."""
+
+STREAM_PATH = "/songs/changes"
+"""The path of the endpoint whose GET requests that accept `text/event-stream` are admitted as streams."""
+
+
+class ConcurrencyLimiter:
+    """
+    This class limits the number of requests that are handled at the same time. A request that exceeds the limit waits
+    in a queue of at most `max_waiting` requests, which are admitted first come, first served. A request is rejected
+    if the queue is full, or if it has not been admitted within `max_wait_seconds`.
+
+    The limiter must be used from a single event loop.
+    """
+
+    def __init__(self, limit: int, max_waiting: int, max_wait_seconds: float) -> None:
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.max_wait_seconds = max_wait_seconds
+        self.active = 0
+        """The number of admitted requests that have not been released yet."""
+        self.rejected = 0
+        """The number of rejected requests."""
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    @property
+    def waiting(self) -> int:
+        """The number of requests that wait to be admitted."""
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """
+        Waits until the request is admitted and returns True, or returns False if the request is rejected.
+        An admitted request must call `release()` when it has been handled.
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.max_waiting:
+            self.rejected += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait((future,), timeout=self.max_wait_seconds)
+        except asyncio.CancelledError:
+            if future.done():
+                self.release()
+            else:
+                self._waiters.remove(future)
+            raise
+        if future.done():
+            return True
+        self._waiters.remove(future)
+        self.rejected += 1
+        return False
+
+    def release(self) -> None:
+        """Releases an admitted request. Its place is passed to the first waiting request."""
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self.active -= 1
+
+
+def get_concurrency_limits(config: Config) -> tuple[int, int]:
+    """
+    Gets the maximum numbers of concurrent reads and writes from the configuration. Limits that are not configured
+    are sized from the connection pools: a read may use a connection of the primary database or of any replica, and a
+    write one of the primary database. Coalesced writes share a connection, so they are limited to a full batch.
+    """
+    admission = config.admission
+    performance = config.database.performance
+    connections = performance.pool_size + performance.max_overflow
+    reads = admission.max_concurrent_reads or connections * (1 + len(config.database.replica_urls))
+    write_coalescing = config.database.write_coalescing
+    writes = admission.max_concurrent_writes or (
+        write_coalescing.max_batch_size if write_coalescing.enabled else connections
+    )
+    return reads, writes
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that limits the number of reads and writes that are handled at the same time, so that requests do
+    not pile up in front of the connection pools. Requests beyond the limits wait briefly; if they cannot be admitted,
+    they are rejected immediately with status 503 and a `Retry-After` header. This keeps the latency of the admitted
+    requests low when the load exceeds the capacity of the database.
+
+    Requests for `EXEMPT_PATHS` are not limited. Streams of Server-Sent Events of `STREAM_PATH`, which mostly wait for
+    changes, are limited by a limiter of their own, so that they do not take the places of the reads.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        reads: ConcurrencyLimiter,
+        writes: ConcurrencyLimiter,
+        streams: ConcurrencyLimiter,
+        retry_after_seconds: int,
+    ):
+        self.app = app
+        self.reads = reads
+        self.writes = writes
+        self.streams = streams
+        self.retry_after_seconds = retry_after_seconds
+
+    def get_limiter(self, scope: Scope) -> ConcurrencyLimiter | None:
+        """Gets the limiter that admits the request, or None if the request is not limited."""
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in EXEMPT_PATHS:
+            return None
+        if scope["method"] not in READ_METHODS:
+            return self.writes
+        # The endpoint only streams if the request accepts text/event-stream, see get_song_changes().
+        if scope["path"] == STREAM_PATH and "text/event-stream" in Headers(scope=scope).get("Accept", ""):
+            return self.streams
+        return self.reads
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self.get_limiter(scope)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await limiter.acquire():
+            response = JSONResponse(
+                {"detail": "The service is overloaded. Try again later."},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(self.retry_after_seconds)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
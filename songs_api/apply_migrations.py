@@ -1,3 +1,4 @@
+import argparse
 import os
 from pathlib import Path
 
@@ -5,14 +6,27 @@ from songs_api.config import load_config
 from songs_api.database import DatabaseAccess
 
 
-def apply_all_migrations(database_access: DatabaseAccess) -> None:
+def apply_all_migrations(database_access: DatabaseAccess, baseline: str | None = None) -> list[str]:
+    """Applies the pending migrations of the directory `migrations` and returns their names."""
     current_file_directory = os.path.dirname(os.path.abspath(__file__))
     migrations_directory = Path(os.path.dirname(current_file_directory), "migrations")
-    database_access.apply_migrations(migrations_directory)
+    return database_access.apply_migrations(migrations_directory, baseline)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Applies the pending migrations to the configured database.")
+    parser.add_argument(
+        "--baseline",
+        metavar="MIGRATION",
+        help="record the migrations up to and including MIGRATION, for example 0001_initial.sql, as applied without "
+        "executing them, for a database that was migrated before migrations were recorded",
+    )
+    args = parser.parse_args()
+
     config = load_config("config.yml")
     database_access = DatabaseAccess(config)
-    apply_all_migrations(database_access)
-    print("The migrations have been applied successfully to the database.")
+    applied_migrations = apply_all_migrations(database_access, args.baseline)
+    if applied_migrations:
+        print(f"The migrations {', '.join(applied_migrations)} have been applied successfully to the database.")
+    else:
+        print("The database is up to date.")
@@ -0,0 +1,155 @@
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, Literal, NamedTuple
+
+from pydantic import ValidationError
+
+from songs_api.config import load_config
+from songs_api.database import DatabaseAccess
+from songs_api.endpoints import SongRequest
+
+FileFormat = Literal["csv", "jsonl"]
+
+FILE_FORMATS: dict[str, FileFormat] = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+"""Maps the file extensions to the file format that is used if no format is specified."""
+
+DEFAULT_BATCH_SIZE = 10_000
+"""
+The number of rows that are imported in a single transaction by default. The commit of each batch increments the
+catalog version, which blocks the commits of other writers of songs until it is done, so larger batches are not much
+faster but make the API wait longer.
+"""
+
+
+class BulkImportResult(NamedTuple):
+    rows_read: int
+    """The number of rows of the file that have been processed, including rows of earlier runs."""
+
+    rows_imported: int
+    """The number of songs that have been imported, including songs of earlier runs."""
+
+    rows_invalid: int
+    """The number of invalid rows in this run, which have been skipped."""
+
+
+class MalformedRow(NamedTuple):
+    """A row of a file that cannot be parsed. It is counted and reported like an invalid song."""
+
+    line_number: int
+    error: str
+
+
+def read_rows(path: Path, file_format: FileFormat) -> Iterator[dict[str, Any] | MalformedRow]:
+    """
+    Reads the rows of a CSV or JSONL file one at a time. A CSV file must have a header with the field names of
+    `SongRequest`. An empty artist in a CSV file means that the song has no artist. A line of a JSONL file that is not
+    valid JSON is returned as `MalformedRow`, so that the import skips it instead of failing on it in every run.
+    """
+    with open(path, newline="" if file_format == "csv" else None) as file:
+        if file_format == "csv":
+            for row in csv.DictReader(file):
+                yield {key: None if key == "artist" and value == "" else value for key, value in row.items()}
+        else:
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield MalformedRow(line_number, str(e))
+
+
+def bulk_import(
+    database_access: DatabaseAccess,
+    path: Path,
+    file_format: FileFormat,
+    name: str | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    restart: bool = False,
+) -> BulkImportResult:
+    """
+    Imports the songs of a file in batches of `batch_size` rows. Each batch is validated with `SongRequest` and
+    inserted in its own transaction, together with the progress of the import. If the import is interrupted, a next
+    run with the same name resumes after the last batch that was committed. A file that has been imported completely
+    is not imported again, unless `restart` is true.
+    Invalid rows are reported on stderr and skipped. The progress is reported on stderr after each batch.
+    :param name: the name of the import, which is the name of the file by default.
+    """
+    name = name or path.name
+    rows_read = rows_imported = rows_invalid = 0
+    if not restart:
+        with database_access.get_session() as session:
+            progress = database_access.get_bulk_import(session, name)
+            if progress is not None:
+                rows_read, rows_imported = progress.rows_read, progress.rows_imported
+                print(f"Resuming import {name} after {rows_read} rows.", file=sys.stderr)
+
+    start = time.perf_counter()
+    rows_imported_at_start = rows_imported
+    rows = itertools.islice(enumerate(read_rows(path, file_format), start=1), rows_read, None)
+    while batch := list(itertools.islice(rows, batch_size)):
+        songs = []
+        for row_number, row in batch:
+            if isinstance(row, MalformedRow):
+                rows_invalid += 1
+                print(
+                    f"Row {row_number} on line {row.line_number} is malformed and has been skipped: {row.error}",
+                    file=sys.stderr,
+                )
+                continue
+            try:
+                songs.append(SongRequest.model_validate(row).model_dump())
+            except ValidationError as e:
+                rows_invalid += 1
+                errors = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+                print(f"Row {row_number} is invalid and has been skipped: {errors}", file=sys.stderr)
+
+        rows_read += len(batch)
+        rows_imported += len(songs)
+        with database_access.get_session() as session:
+            database_access.bulk_insert_songs(session, songs)
+            database_access.save_bulk_import(session, name, rows_read, rows_imported)
+
+        rate = (rows_imported - rows_imported_at_start) / (time.perf_counter() - start)
+        print(f"{rows_read} rows read, {rows_imported} songs imported ({rate:,.0f} rows/s).", file=sys.stderr)
+
+    return BulkImportResult(rows_read, rows_imported, rows_invalid)
+
+
+def get_file_format(path: Path, file_format: FileFormat | None) -> FileFormat:
+    if file_format is not None:
+        return file_format
+    if path.suffix.lower() not in FILE_FORMATS:
+        raise ValueError(f"The format of {path} cannot be derived from its extension. Specify it with --format.")
+    return FILE_FORMATS[path.suffix.lower()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Imports songs from a CSV or JSONL file into the configured database. The fields of the songs are "
+        "the same as in the body of POST /songs/. An interrupted import resumes where it stopped."
+    )
+    parser.add_argument("file", type=Path, help="the CSV or JSONL file with the songs")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="the format of the file (default: by extension)")
+    parser.add_argument("--name", help="the name under which the progress is saved (default: the file name)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="the number of rows per transaction")
+    parser.add_argument("--restart", action="store_true", help="import the file from the start again")
+    args = parser.parse_args()
+
+    config = load_config("config.yml")
+    database_access = DatabaseAccess(config)
+    try:
+        file_format = get_file_format(args.file, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    result = bulk_import(database_access, args.file, file_format, args.name, args.batch_size, args.restart)
+    print(
+        f"The import has finished: {result.rows_imported} songs imported from {result.rows_read} rows, "
+        f"{result.rows_invalid} invalid rows skipped."
+    )
+    sys.exit(1 if result.rows_invalid else 0)
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from pydantic import BaseModel
+
+from songs_api.config import CacheConfig
+
+if TYPE_CHECKING:
+    from songs_api.database import SongRow
+
+
+def get_page(songs: Sequence[SongRow], limit: int, after_id: int | None) -> Sequence[SongRow]:
+    """Gets at most `limit` songs with an id larger than `after_id` from the specified songs ordered by id."""
+    start = 0 if after_id is None else bisect_right(songs, after_id, key=lambda song: song.id)
+    return songs[start : start + limit]
+
+
+class CacheStatistics(BaseModel):
+    """The statistics of a `SongCache`."""
+
+    hits: int
+    """The number of reads that were served from the cache."""
+
+    misses: int
+    """The number of reads that had to go to the database."""
+
+    cached_songs: int
+    """The number of songs in the cache of single songs."""
+
+    snapshot_songs: int | None
+    """The number of songs in the snapshot of all songs, or None if no snapshot is present."""
+
+    version: int
+    """The version of the cache. It is incremented each time songs are changed."""
+
+    catalog_version: int | None
+    """The catalog version of the cached songs, or None if it is not known yet."""
+
+
+class SongCache:
+    """
+    This class caches songs in memory: a bounded LRU cache of single songs and a snapshot of all songs ordered by id.
+    The cache is versioned. Each change of songs increments the version. A reader takes the version before it reads
+    from the database and can only store its result if the version has not changed in the meantime. This way, a reader
+    that raced with a writer never stores outdated songs.
+
+    The cache also holds the catalog version (see `CatalogVersion`) that the cached songs belong to. When a reader sees
+    a newer catalog version in the database, songs have been changed by another process, and the cache is cleared.
+    Unless `single_process` is configured, readers read the catalog version from the database before they use the
+    cache, so changes made by other processes are noticed immediately. Entries expire after `ttl_seconds`.
+
+    All methods are thread-safe.
+    """
+
+    def __init__(self, config: CacheConfig) -> None:
+        self.config = config
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        self._lock = Lock()
+        self._songs: OrderedDict[int, tuple[float, SongRow]] = OrderedDict()
+        self._snapshot: tuple[float, Sequence[SongRow]] | None = None
+        self._count: tuple[float, int] | None = None
+        self._snapshot_too_large_until: float | None = None
+        self._catalog_version: tuple[float, int] | None = None
+
+    def get(self, song_id: int) -> SongRow | None:
+        """Gets the song with the specified id, or None if it is not cached."""
+        with self._lock:
+            entry = self._songs.get(song_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._songs.move_to_end(song_id)
+                self.hits += 1
+                return entry[1]
+
+            snapshot = self._get_snapshot()
+            if snapshot is not None:
+                index = bisect_right(snapshot, song_id, key=lambda song: song.id)
+                if index > 0 and snapshot[index - 1].id == song_id:
+                    self.hits += 1
+                    return snapshot[index - 1]
+
+            self.misses += 1
+            return None
+
+    def put(self, song: SongRow, version: int) -> None:
+        """Stores the specified song if the cache has not changed since `version` was read."""
+        with self._lock:
+            if not self.config.enabled or version != self.version:
+                return
+            self._songs[song.id] = (self._expires_at(), song)
+            self._songs.move_to_end(song.id)
+            while len(self._songs) > self.config.max_songs:
+                self._songs.popitem(last=False)
+
+    def get_page(self, limit: int, after_id: int | None) -> Sequence[SongRow] | None:
+        """
+        Gets at most `limit` songs with an id larger than `after_id` ordered by id from the snapshot,
+        or None if no snapshot is cached.
+        """
+        with self._lock:
+            snapshot = self._get_snapshot()
+            if snapshot is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return get_page(snapshot, limit, after_id)
+
+    def put_snapshot(self, songs: Sequence[SongRow], version: int) -> None:
+        """
+        Stores the snapshot of all songs, which must be ordered by id, if the cache has not changed since `version` was
+        read. The snapshot is not stored if it contains more than `max_snapshot_songs` songs.
+        """
+        with self._lock:
+            if not self.config.enabled or version != self.version or len(songs) > self.config.max_snapshot_songs:
+                return
+            self._snapshot = (self._expires_at(), tuple(songs))
+
+    def is_snapshot_too_large(self) -> bool:
+        """Gets whether there were more than `max_snapshot_songs` songs when a snapshot was last considered."""
+        with self._lock:
+            return self._snapshot_too_large_until is not None and self._snapshot_too_large_until > time.monotonic()
+
+    def put_snapshot_too_large(self, version: int) -> None:
+        """
+        Records that there are more than `max_snapshot_songs` songs, if the cache has not changed since `version` was
+        read, so that the number of songs is not checked again for each page.
+        """
+        with self._lock:
+            if self.config.enabled and version == self.version:
+                self._snapshot_too_large_until = self._expires_at()
+
+    def get_count(self) -> int | None:
+        """Gets the number of songs, or None if it is not cached."""
+        with self._lock:
+            snapshot = self._get_snapshot()
+            if snapshot is not None:
+                return len(snapshot)
+            if self._count is not None and self._count[0] > time.monotonic():
+                return self._count[1]
+            return None
+
+    def put_count(self, count: int, version: int) -> None:
+        """Stores the number of songs if the cache has not changed since `version` was read."""
+        with self._lock:
+            if self.config.enabled and version == self.version:
+                self._count = (self._expires_at(), count)
+
+    def get_catalog_version(self) -> int | None:
+        """
+        Gets the catalog version of the cached songs, or None if it is not cached or has expired. The cached songs can
+        only be used together with their catalog version, so None counts as a miss.
+        """
+        with self._lock:
+            if self._catalog_version is not None and self._catalog_version[0] > time.monotonic():
+                return self._catalog_version[1]
+            self.misses += 1
+            return None
+
+    def put_catalog_version(self, catalog_version: int) -> int | None:
+        """
+        Stores the catalog version that a reader has read from the database before reading songs. If it is newer than
+        the catalog version of the cached songs, the cache is cleared.
+        :return: the version of the cache that the reader must pass when it stores the songs that it reads, or None if
+        the catalog version is older than the cached one (for example because it was read from a lagging replica).
+        Such a reader must not store its songs.
+        """
+        with self._lock:
+            if not self.config.enabled:
+                return None
+            if self._catalog_version is not None and catalog_version < self._catalog_version[1]:
+                return None
+            if self._catalog_version is None or catalog_version > self._catalog_version[1]:
+                self.version += 1
+                self._songs.clear()
+                self._snapshot = None
+                self._count = None
+                self._snapshot_too_large_until = None
+            self._catalog_version = (self._expires_at(), catalog_version)
+            return self.version
+
+    def advance_catalog_version(self, catalog_version: int) -> None:
+        """
+        Is called after this process committed a change of songs that incremented the catalog version to
+        `catalog_version`. The changed songs have already been invalidated, so if the cache holds the previous catalog
+        version, the other cached songs are still valid for the new one.
+        """
+        with self._lock:
+            if self._catalog_version is not None and self._catalog_version[1] == catalog_version - 1:
+                self._catalog_version = (self._catalog_version[0], catalog_version)
+
+    def invalidate(self, song_ids: Iterable[int]) -> None:
+        """
+        Removes the specified songs, the snapshot and the number of songs from the cache and increments the version.
+        This must be called when songs are created, updated or deleted.
+        """
+        with self._lock:
+            self.version += 1
+            for song_id in song_ids:
+                self._songs.pop(song_id, None)
+            self._snapshot = None
+            self._count = None
+            self._snapshot_too_large_until = None
+
+    def get_statistics(self) -> CacheStatistics:
+        with self._lock:
+            snapshot = self._get_snapshot()
+            return CacheStatistics(
+                hits=self.hits,
+                misses=self.misses,
+                cached_songs=len(self._songs),
+                snapshot_songs=None if snapshot is None else len(snapshot),
+                version=self.version,
+                catalog_version=None if self._catalog_version is None else self._catalog_version[1],
+            )
+
+    def _get_snapshot(self) -> Sequence[SongRow] | None:
+        if self._snapshot is None or self._snapshot[0] <= time.monotonic():
+            return None
+        return self._snapshot[1]
+
+    def _expires_at(self) -> float:
+        return time.monotonic() + self.config.ttl_seconds
@@ -1,14 +1,247 @@
+from typing import Literal
+
 import yaml
-from pydantic import BaseModel
+from pydantic import BaseModel, SecretStr
 
 
 # Define a Pydantic model for the configuration.
+class DatabasePerformanceConfig(BaseModel):
+    """
+    The settings that tune the performance of the database access. The defaults are suitable for production.
+    The pool settings do not apply to in-memory SQLite databases, which use a single connection per thread.
+    """
+
+    echo: bool = False
+    """Whether all SQL statements are logged. This slows down every statement, so only enable it for debugging."""
+
+    pool_size: int = 5
+    """The number of connections that are kept open in the connection pool."""
+
+    max_overflow: int = 10
+    """The number of connections that can be opened in addition to `pool_size` when all pooled ones are in use."""
+
+    pool_timeout_seconds: float = 30.0
+    """The number of seconds to wait for a connection from the pool before giving up."""
+
+    pool_recycle_seconds: int = 1800
+    """The age in seconds after which a connection is replaced, to avoid connections closed by the server."""
+
+    pool_pre_ping: bool = True
+    """Whether a connection is tested before it is handed out, to replace connections that have been closed."""
+
+    statement_timeout_ms: int = 30_000
+    """PostgreSQL only: the maximum duration of a statement in milliseconds. 0 disables the timeout."""
+
+    idle_in_transaction_timeout_ms: int = 60_000
+    """
+    PostgreSQL only: the maximum time in milliseconds that a session can be idle inside a transaction.
+    0 disables the timeout.
+    """
+
+    sqlite_journal_mode: Literal["WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"] = "WAL"
+    """
+    SQLite only: the journal mode. WAL lets readers continue while a write is in progress and needs fewer fsyncs.
+    """
+
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    """SQLite only: how often SQLite waits for data to reach the disk. NORMAL is safe in WAL mode."""
+
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    """SQLite only: the maximum number of bytes of the database file that are memory-mapped. 0 disables mmap."""
+
+    sqlite_busy_timeout_ms: int = 5_000
+    """SQLite only: the number of milliseconds to wait for a lock held by another connection."""
+
+
+class WriteCoalescingConfig(BaseModel):
+    """
+    The settings of write coalescing: the changes of single songs that arrive within a short window are applied in a
+    single transaction, so that they share one commit. This multiplies the write throughput under concurrent writes,
+    at the cost of up to `window_ms` extra latency per write.
+    """
+
+    enabled: bool = False
+    """Whether the changes of single songs are coalesced."""
+
+    window_ms: float = 2.0
+    """
+    The number of milliseconds that a transaction waits for more changes after the first one. Changes that arrive while
+    the previous transaction commits are always coalesced, so 0 still groups writes under load.
+    """
+
+    max_batch_size: int = 100
+    """The maximum number of changes in a transaction. A full transaction is committed without waiting."""
+
+
+class SlowQueryLogConfig(BaseModel):
+    """
+    The settings of the slow query log, which records the statements that take at least `threshold_ms`, and a sample
+    of the other statements, with the shapes of their parameters, the route of the request and their query plan.
+    The most recent entries are served by `GET /admin/slow-queries` if `admin_token` is set. Unlike `echo`, a statement
+    that is not recorded only costs two clock readings and the dispatch of two SQLAlchemy events.
+    """
+
+    enabled: bool = False
+    """Whether slow statements are recorded."""
+
+    admin_token: SecretStr | None = None
+    """
+    The token that clients of `GET /admin/slow-queries` must send in the header `Authorization: Bearer <token>`. The
+    entries reveal the statements and the query plans, so the endpoint is not served without a token.
+    """
+
+    threshold_ms: float = 100.0
+    """The duration in milliseconds from which a statement is recorded and logged as a warning."""
+
+    sample_rate: float = 0.0
+    """The fraction of the faster statements that are recorded anyway, for example 0.001. 0 disables sampling."""
+
+    max_entries: int = 100
+    """The number of most recent entries that are kept. Older entries are discarded."""
+
+    explain: bool = True
+    """
+    Whether the query plan of a recorded statement is captured with `EXPLAIN QUERY PLAN` on SQLite and `EXPLAIN` on
+    PostgreSQL. The statement is not executed again.
+    """
+
+
 class DatabaseConfig(BaseModel):
     url: str
 
+    mode: Literal["sync", "async"] = "sync"
+    """
+    Selects how the endpoints access the database. In "sync" mode, the database is accessed from threads of the
+    threadpool. In "async" mode, the database is accessed from the event loop using an async driver
+    (aiosqlite for SQLite and asyncpg for PostgreSQL).
+    """
+
+    performance: DatabasePerformanceConfig = DatabasePerformanceConfig()
+
+    replica_urls: list[str] = []
+    """
+    The URLs of read replicas of the primary database at `url`. Reads of songs are distributed over the replicas
+    round-robin. Writes always go to the primary database.
+    """
+
+    replica_retry_seconds: float = 30.0
+    """
+    The number of seconds that a replica that cannot be reached is skipped. Reads go to the primary database if no
+    replica can be reached.
+    """
+
+    read_your_writes_seconds: float = 0.0
+    """
+    The number of seconds after a change of songs through this process during which all reads go to the primary
+    database, so that clients see their own changes despite the replication lag of the replicas. It also prevents that
+    the song cache is filled from a replica that has not yet received the change. 0 disables this.
+    """
+
+    write_coalescing: WriteCoalescingConfig = WriteCoalescingConfig()
+
+    slow_query_log: SlowQueryLogConfig = SlowQueryLogConfig()
+
+
+class CacheConfig(BaseModel):
+    enabled: bool = True
+    """Whether songs that are read from the database are cached in memory."""
+
+    max_songs: int = 10_000
+    """The maximum number of single songs in the cache. The least recently used songs are evicted first."""
+
+    max_snapshot_songs: int = 10_000
+    """The maximum number of songs for which a snapshot of all songs is kept to serve the pages of `GET /songs/`."""
+
+    ttl_seconds: float = 5.0
+    """
+    The number of seconds that cached songs are used. If `single_process` is true, this is also the maximum time that
+    changes made by other processes can go unnoticed.
+    """
+
+    single_process: bool = False
+    """
+    Whether this process is the only one that changes songs in the database. Only then is the cached catalog version
+    trusted, so that reads of cached songs and conditional requests do not access the database at all. Otherwise, each
+    read first reads the catalog version from the database, a lookup of a single row, and the cached songs are only used
+    if no other process has changed songs since they were cached.
+    """
+
+
+class AdmissionConfig(BaseModel):
+    """
+    The settings of the admission control, which limits the number of reads and writes that are handled at the same
+    time and rejects the requests beyond the limits with status 503 instead of letting them pile up.
+    """
+
+    enabled: bool = True
+    """Whether the numbers of concurrent requests are limited."""
+
+    max_concurrent_reads: int | None = None
+    """
+    The maximum number of reads (GET and HEAD requests) that are handled at the same time. None sizes the limit from
+    the connection pools: `pool_size + max_overflow` connections to the primary database and to each replica.
+    """
+
+    max_concurrent_writes: int | None = None
+    """
+    The maximum number of writes that are handled at the same time. None sizes the limit from the connection pool of
+    the primary database: `pool_size + max_overflow`, or `max_batch_size` if write coalescing is enabled.
+    """
+
+    max_concurrent_streams: int = 100
+    """
+    The maximum number of streams of Server-Sent Events of `GET /songs/changes` that are open at the same time. They
+    mostly wait for changes and only use a connection while they read, so they are limited separately from the reads.
+    """
+
+    max_waiting_requests: int = 100
+    """
+    The maximum number of reads, of writes and of streams that wait to be admitted. Further requests are rejected at
+    once.
+    """
+
+    max_wait_seconds: float = 0.5
+    """The number of seconds after which a waiting request is rejected."""
+
+    retry_after_seconds: int = 1
+    """The number of seconds in the `Retry-After` header of rejected requests."""
+
+
+class ServerConfig(BaseModel):
+    """The settings of `python -m songs_api.serve`, which runs the API in several worker processes."""
+
+    host: str = "0.0.0.0"
+    """The address on which the API is served."""
+
+    port: int = 8000
+    """The port on which the API is served."""
+
+    workers: int = 0
+    """The number of worker processes. 0 starts one worker per CPU that the server may use."""
+
+    database_connection_budget: int | None = None
+    """
+    The maximum number of connections that the workers together open to the database, and to each replica.
+    The budget is divided equally over the workers plus one, because a rolling restart starts the replacement of a
+    worker before it stops the old one. The `pool_size` and `max_overflow` of each worker are reduced to its share.
+    None leaves the pool settings of each worker as configured in `database.performance`.
+    """
+
+    warm_up: bool = True
+    """
+    Whether a worker opens the connections of its pool before it accepts requests, so that the first requests do not
+    wait for new connections.
+    """
+
+    graceful_shutdown_seconds: int = 30
+    """The number of seconds that a stopping worker waits for the requests in progress to finish."""
+
 
 class Config(BaseModel):
     database: DatabaseConfig
+    cache: CacheConfig = CacheConfig()
+    admission: AdmissionConfig = AdmissionConfig()
+    server: ServerConfig = ServerConfig()
 
 
 def load_config(file_path: str) -> Config:
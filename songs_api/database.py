@@ -1,13 +1,63 @@
 from __future__ import annotations
 
-from collections.abc import Iterator, Sequence
-from contextlib import contextmanager
+import hashlib
+import io
+import itertools
+import re
+import sys
+import time
+from collections.abc import AsyncIterator, Callable, Collection, Iterable, Iterator, Sequence
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
 from pathlib import Path
+from typing import Any, Generic, Literal, NamedTuple, TypeVar, get_args
 
-from sqlalchemy import Integer, SmallInteger, String, create_engine, select, text
-from sqlalchemy.orm import DeclarativeBase, Session, mapped_column, sessionmaker
+from anyio import to_thread
+from pydantic import BaseModel
+from sqlalchemy import (
+    URL,
+    BigInteger,
+    Boolean,
+    ColumnElement,
+    Connection,
+    CursorResult,
+    DateTime,
+    Delete,
+    Engine,
+    Integer,
+    Row,
+    Select,
+    SmallInteger,
+    String,
+    Update,
+    create_engine,
+    delete,
+    event,
+    func,
+    insert,
+    inspect,
+    make_url,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import DeclarativeBase, ORMExecuteState, Session, mapped_column, sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.functions import FunctionElement
 
-from songs_api.config import Config
+from songs_api.cache import SongCache, get_page
+from songs_api.config import Config, DatabaseConfig, DatabasePerformanceConfig
+from songs_api.slow_queries import SlowQueryLog
+from songs_api.write_coalescer import WriteCoalescer
+
+T = TypeVar("T")
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+"""Maps the supported database backends to the async driver that is used in async mode."""
 
 
 class Base(DeclarativeBase):
@@ -38,62 +88,880 @@ class Song(Base):
     """
 
 
+class SongCountPerYear(Base):
+    """This class defines the number of songs per year of release. It is maintained by triggers on the song table."""
+
+    __tablename__ = "song_count_per_year"
+
+    year_of_release = mapped_column(SmallInteger, primary_key=True)
+    song_count = mapped_column(Integer, nullable=False)
+
+
+class SongCountPerComposer(Base):
+    """This class defines the number of songs per composer. It is maintained by triggers on the song table."""
+
+    __tablename__ = "song_count_per_composer"
+
+    composer = mapped_column(String(100), primary_key=True)
+    song_count = mapped_column(Integer, nullable=False)
+
+
+class SongCountPerArtist(Base):
+    """This class defines the number of songs per artist. It is maintained by triggers on the song table."""
+
+    __tablename__ = "song_count_per_artist"
+
+    artist = mapped_column(String(100), primary_key=True)
+    song_count = mapped_column(Integer, nullable=False)
+
+
+class SongChange(Base):
+    """
+    This class records the last change of a song for the change feed `GET /songs/changes`. It is maintained by triggers
+    on the song table. The row of a deleted song is kept as a tombstone, so that clients learn about the deletion.
+    """
+
+    __tablename__ = "song_change"
+
+    song_id = mapped_column(Integer, primary_key=True)
+    """The id of the song."""
+
+    catalog_version = mapped_column(BigInteger, nullable=False)
+    """
+    The catalog version of the transaction that changed the song last, or `PENDING_CATALOG_VERSION` until that
+    transaction commits.
+    """
+
+    deleted = mapped_column(Boolean, nullable=False)
+    """Whether the song has been deleted."""
+
+
+class BulkImport(Base):
+    """This class records the progress of a bulk import of songs from a file."""
+
+    __tablename__ = "bulk_import"
+
+    name = mapped_column(String(255), primary_key=True)
+    """The name of the import, which is the name of the file by default."""
+
+    rows_read = mapped_column(Integer, nullable=False)
+    """The number of rows of the file that have been processed, including invalid rows."""
+
+    rows_imported = mapped_column(Integer, nullable=False)
+    """The number of songs that have been imported."""
+
+
+class CatalogVersion(Base):
+    """
+    This class defines the version of the song catalog. The table has a single row, whose version is incremented by
+    every transaction that changes songs. It is shared by all processes, so it identifies the state of the songs in
+    HTTP ETags.
+    """
+
+    __tablename__ = "catalog_version"
+
+    id = mapped_column(Integer, primary_key=True)
+    version = mapped_column(BigInteger, nullable=False)
+
+
+class SchemaMigration(Base):
+    """This class records a migration that has been applied to the database."""
+
+    __tablename__ = "schema_migrations"
+
+    name = mapped_column(String(255), primary_key=True)
+    """The file name of the migration."""
+
+    checksum = mapped_column(String(64), nullable=False)
+    """The SHA-256 hash of the contents of the migration file when it was applied."""
+
+    applied_at = mapped_column(DateTime, nullable=False, server_default=func.current_timestamp())
+    """The time at which the migration was applied."""
+
+
+class Migration(NamedTuple):
+    """A migration script that has been read from a file."""
+
+    name: str
+    """The file name, which identifies the migration in the table `schema_migrations`."""
+
+    checksum: str
+    """The SHA-256 hash of the contents of the file."""
+
+    statements: Sequence[str]
+
+
+MIGRATION_LOCK_KEY = 7_236_173_614
+"""The key of the PostgreSQL advisory lock that is held while migrations are applied."""
+
+PENDING_CATALOG_VERSION = 0
+"""
+The catalog version with which the triggers record the changes of songs. It is replaced by the catalog version of the
+transaction right before the commit (see `assign_catalog_version()`).
+"""
+
+MIGRATION_SESSION_SETTINGS = {
+    "postgresql": ["SET statement_timeout = 0", "SET idle_in_transaction_session_timeout = 0"],
+    "sqlite": ["PRAGMA busy_timeout = 600000"],
+}
+"""
+The settings of the connection that applies migrations by database backend. They replace the timeouts of the
+configuration, which are meant for requests: waiting for the migration lock while another process migrates, or a
+migration that rewrites a large table, must not be cancelled. SQLite waits at most 10 minutes for the lock.
+"""
+
+SQL_TOKEN_PATTERN = re.compile(
+    r"""
+    --[^\n]*                                     # line comment
+    | /\*.*?\*/                                  # block comment
+    | '(?:[^']|'')*'                             # string literal
+    | "(?:[^"]|"")*"                             # quoted identifier
+    | \$\$.*?\$\$                                # dollar-quoted string (PostgreSQL)
+    | \$(?P<tag>[A-Za-z_]\w*)\$.*?\$(?P=tag)\$   # dollar-quoted string with a tag
+    | ;
+    | [^-/'"$;]+
+    | .
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+"""Splits SQL into the tokens that matter for finding the ends of statements."""
+
+CREATE_TRIGGER_PATTERN = re.compile(r"\s*(--[^\n]*\n\s*)*CREATE\s+(TEMP\s+|TEMPORARY\s+)?TRIGGER\b", re.IGNORECASE)
+"""Matches the start of a CREATE TRIGGER statement, optionally preceded by comments."""
+
+TRIGGER_BEGIN_PATTERN = re.compile(r"\bBEGIN\b", re.IGNORECASE)
+"""Matches the start of the body of a trigger. PostgreSQL triggers have no body; they execute a function."""
+
+TRIGGER_END_PATTERN = re.compile(r"\bEND\s*$", re.IGNORECASE)
+"""Matches the end of the body of a trigger."""
+
+SONG_COLUMNS = ("title", "composer", "artist", "year_of_release")
+"""The names of the columns of a song, except for the id."""
+
+CURSOR_PATTERN = re.compile(r"(?P<catalog_version>\d{1,18})(?::(?P<song_id>\d{1,18}))?")
+"""The format of a `SongChangeCursor`. The numbers are limited to 18 digits to fit in a BIGINT."""
+
+
+SongSort = Literal["id", "-id", "year_of_release", "-year_of_release"]
+"""The supported sort orders of songs. A minus sign indicates descending order."""
+
+SongField = Literal["id", "title", "composer", "artist", "year_of_release"]
+"""The fields of a song that a client can select."""
+
+SONG_FIELDS: tuple[SongField, ...] = get_args(SongField)
+"""All fields of a song, in the order of the columns."""
+
+
+class ByteOrder(FunctionElement[str]):
+    """
+    Compares a text column byte-wise, which is code point order for UTF-8: with `COLLATE "C"` on PostgreSQL, whose
+    default collation depends on the locale of the database. SQLite compares byte-wise by default. The indexes of the
+    columns that are compared like this use the same collation (see migration 0008).
+    """
+
+    type = String()
+    inherit_cache = True
+
+
+@compiles(ByteOrder)
+def _compile_byte_order(element: ByteOrder, compiler: SQLCompiler, **kwargs: Any) -> str:
+    return compiler.process(element.clauses, **kwargs)
+
+
+@compiles(ByteOrder, "postgresql")
+def _compile_byte_order_for_postgresql(element: ByteOrder, compiler: SQLCompiler, **kwargs: Any) -> str:
+    return f'({compiler.process(element.clauses, **kwargs)} COLLATE "C")'
+
+
+def get_prefix_upper_bound(prefix: str) -> str | None:
+    """
+    Gets the smallest string in code point order that is larger than all strings that start with the prefix, or None
+    if there is no such string because the prefix consists of U+10FFFF characters only.
+    """
+    stripped_prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped_prefix:
+        return None
+    code_point = ord(stripped_prefix[-1]) + 1
+    if 0xD800 <= code_point <= 0xDFFF:
+        # Surrogates cannot be encoded, and no valid string contains them.
+        code_point = 0xE000
+    return stripped_prefix[:-1] + chr(code_point)
+
+
+def format_copy_row(values: Sequence[Any]) -> str:
+    """
+    Formats a row as a line of the CSV data of a PostgreSQL COPY statement. COPY reads only an unquoted empty field as
+    NULL, so None is written as an empty field and every other value is quoted. A quoted value is always read as a
+    string, even if it is empty or looks like a NULL marker such as \\N.
+    """
+    fields = ("" if value is None else '"' + str(value).replace('"', '""') + '"' for value in values)
+    return ",".join(fields) + "\n"
+
+
+class SongFilter(BaseModel):
+    """
+    The criteria to filter songs. Criteria that are None are ignored. All other criteria must match.
+    The criteria can be evaluated with the indexes on the song table. Names are compared byte-wise (see `ByteOrder`),
+    so prefixes are matched case-sensitively with a range condition on any database.
+    """
+
+    title: str | None = None
+    """The exact title of the song."""
+
+    title_prefix: str | None = None
+    """The start of the title of the song."""
+
+    composer: str | None = None
+    """The exact name of the composer."""
+
+    composer_prefix: str | None = None
+    """The start of the name of the composer."""
+
+    artist: str | None = None
+    """The exact name of the artist."""
+
+    artist_prefix: str | None = None
+    """The start of the name of the artist."""
+
+    year_of_release_from: int | None = None
+    """The first year of release (inclusive)."""
+
+    year_of_release_to: int | None = None
+    """The last year of release (inclusive)."""
+
+    def is_empty(self) -> bool:
+        return all(value is None for value in self.model_dump().values())
+
+    def get_conditions(self) -> list[ColumnElement[bool]]:
+        """Gets the conditions for the WHERE clause of a query of songs."""
+        conditions: list[ColumnElement[bool]] = []
+        for column in (Song.title, Song.composer, Song.artist):
+            value = getattr(self, column.key)
+            if value is not None:
+                conditions.append(ByteOrder(column) == value)
+            prefix = getattr(self, f"{column.key}_prefix")
+            if prefix:
+                conditions.append(ByteOrder(column) >= prefix)
+                upper_bound = get_prefix_upper_bound(prefix)
+                if upper_bound is not None:
+                    conditions.append(ByteOrder(column) < upper_bound)
+        if self.year_of_release_from is not None:
+            conditions.append(Song.year_of_release >= self.year_of_release_from)
+        if self.year_of_release_to is not None:
+            conditions.append(Song.year_of_release <= self.year_of_release_to)
+        return conditions
+
+
+class SongRow(NamedTuple):
+    """A compact, immutable copy of the columns of a song. It is used to cache songs."""
+
+    id: int
+    title: str
+    composer: str | None
+    artist: str | None
+    year_of_release: int
+
+    @staticmethod
+    def from_song(song: Song) -> SongRow:
+        return SongRow(song.id, song.title, song.composer, song.artist, song.year_of_release)
+
+
+SONG_ROW_COLUMNS = (Song.id, Song.title, Song.composer, Song.artist, Song.year_of_release)
+"""The columns to select to construct a `SongRow`."""
+
+PartialSongRow = SongRow | Row[Any]
+"""
+A `SongRow`, or a row with only some columns of a song as returned by `get_partial_song_rows_page()`. Both have an
+attribute per selected column, named after the field.
+"""
+
+
+class CatalogRead(NamedTuple, Generic[T]):
+    """The result of a read of songs together with the catalog version that the songs belong to."""
+
+    catalog_version: int
+    """
+    The catalog version that was read before the songs. The songs are at least as recent as this version, so it can
+    safely be used as their ETag.
+    """
+
+    value: T | None
+    """The songs that were read, or None if the catalog version is one of the versions that the caller already knows."""
+
+
+class SongChangeCursor(NamedTuple):
+    """A position in the change feed. The changes are ordered by catalog version and song id."""
+
+    catalog_version: int
+    """The catalog version up to which the changes have been read."""
+
+    song_id: int | None = None
+    """
+    The last song of `catalog_version` whose change has been read, or None if all changes of `catalog_version` have
+    been read. A transaction can change more songs than fit in a page.
+    """
+
+    def __str__(self) -> str:
+        return str(self.catalog_version) if self.song_id is None else f"{self.catalog_version}:{self.song_id}"
+
+    @staticmethod
+    def parse(cursor: str) -> SongChangeCursor:
+        """
+        Parses a cursor in the format of `str()`: the catalog version, optionally followed by a colon and a song id.
+        :raises ValueError: if the cursor is not in this format.
+        """
+        match = CURSOR_PATTERN.fullmatch(cursor)
+        if match is None:
+            raise ValueError(f"The cursor {cursor!r} is invalid.")
+        song_id = match.group("song_id")
+        return SongChangeCursor(int(match.group("catalog_version")), None if song_id is None else int(song_id))
+
+
+class SongChangeRow(NamedTuple):
+    """The last change of a song in the change feed."""
+
+    song_id: int
+    catalog_version: int
+    deleted: bool
+    song: SongRow | None
+    """The current state of the song, or None if the song has been deleted."""
+
+
+class SongChangePage(NamedTuple):
+    """A page of the change feed."""
+
+    changes: Sequence[SongChangeRow]
+    next_cursor: SongChangeCursor
+    """The cursor from which the next page is read."""
+
+    has_more: bool
+    """Whether more changes could be read immediately from `next_cursor`."""
+
+
+class SongsSession(Session):
+    """
+    The session used by `DatabaseAccess`. The songs that are changed in a session are invalidated in the song cache
+    again after the commit. This removes songs that concurrent readers cached from the state before the commit.
+    A read-only session (see `DatabaseAccess.get_session()`) refuses to change songs.
+    """
+
+
+def assign_catalog_version(session: Session) -> int:
+    """
+    Increments the catalog version and assigns it to the changes of songs that the transaction recorded with
+    `PENDING_CATALOG_VERSION`. This is the last statement before the commit, so the catalog_version row is only locked
+    from here until the commit. That lock serializes the ends of the transactions that change songs, so they commit
+    their catalog versions in order and the change feed never skips a change.
+    :return: the catalog version of the transaction.
+    """
+    query = update(CatalogVersion).values(version=CatalogVersion.version + 1)
+    if session.get_bind().dialect.update_returning:
+        catalog_version = session.scalars(query.returning(CatalogVersion.version)).one()
+    else:
+        session.execute(query)
+        catalog_version = session.scalars(select(CatalogVersion.version)).one()
+    session.execute(
+        update(SongChange)
+        .where(SongChange.catalog_version == PENDING_CATALOG_VERSION)
+        .values(catalog_version=catalog_version)
+    )
+    return catalog_version
+
+
+@event.listens_for(SongsSession, "before_commit")
+def _assign_catalog_version_to_changes(session: Session) -> None:
+    # The release of a SAVEPOINT is reported as a commit as well, but the changes are only committed with the
+    # outermost transaction.
+    if session.in_nested_transaction() or not ("changed_songs" in session.info or session.info.get("songs_written")):
+        return
+    # The pending objects are flushed first, so that their changes are recorded before the version is assigned.
+    session.flush()
+    session.info["catalog_version"] = assign_catalog_version(session)
+
+
+@event.listens_for(SongsSession, "after_commit")
+def _invalidate_changed_songs(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    session.info.pop("songs_written", None)
+    catalog_version = session.info.pop("catalog_version", None)
+    for database_access, song_ids in session.info.pop("changed_songs", []):
+        database_access.songs_committed(song_ids, catalog_version)
+
+
+@event.listens_for(SongsSession, "after_rollback")
+def _forget_changed_songs(session: Session) -> None:
+    # The changed songs are kept after the rollback of a SAVEPOINT; invalidating them once more after the commit and
+    # incrementing the catalog version does no harm.
+    if session.in_nested_transaction():
+        return
+    session.info.pop("changed_songs", None)
+    session.info.pop("songs_written", None)
+    session.info.pop("catalog_version", None)
+
+
+@event.listens_for(SongsSession, "before_flush")
+def _prevent_flush_in_read_only_session(session: Session, flush_context: Any, instances: Any) -> None:
+    if session.info.get("read_only"):
+        raise RuntimeError("Songs cannot be changed in a read-only session.")
+
+
+@event.listens_for(SongsSession, "do_orm_execute")
+def _prevent_changes_in_read_only_session(orm_execute_state: ORMExecuteState) -> None:
+    if orm_execute_state.session.info.get("read_only") and not orm_execute_state.is_select:
+        raise RuntimeError("Songs cannot be changed in a read-only session.")
+
+
+# Songs that are written without the methods of DatabaseAccess, for example by tools and tests, get a catalog version as
+# well. Their changes are not invalidated in the song cache.
+@event.listens_for(SongsSession, "do_orm_execute")
+def _record_song_statements(orm_execute_state: ORMExecuteState) -> None:
+    mapper = orm_execute_state.bind_mapper
+    if not orm_execute_state.is_select and mapper is not None and mapper.class_ is Song:
+        orm_execute_state.session.info["songs_written"] = True
+
+
+@event.listens_for(SongsSession, "after_flush")
+def _record_flushed_songs(session: Session, flush_context: Any) -> None:
+    if any(isinstance(instance, Song) for instance in itertools.chain(session.new, session.dirty, session.deleted)):
+        session.info["songs_written"] = True
+
+
+class Replica:
+    """A read replica of the database. A replica that cannot be reached is skipped until `unhealthy_until`."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        session_maker: sessionmaker[SongsSession],
+        async_engine: AsyncEngine | None,
+        async_session_maker: async_sessionmaker[AsyncSession] | None,
+    ) -> None:
+        self.engine = engine
+        self.session_maker = session_maker
+        self.async_engine = async_engine
+        self.async_session_maker = async_session_maker
+        self.unhealthy_until = 0.0
+
+
 class DatabaseAccess:
     """
     This class provides access to the database.
     It implements the CRUD operations for songs and it offers a method to apply migrations to the database.
+
+    The CRUD operations are implemented with synchronous sessions. In async mode, the endpoints run them on an
+    `AsyncSession` with `run_in_session()`, which executes them inside the event loop using the async driver.
+    The synchronous engine is always available for migrations, tools and tests. It only connects when it is used.
+
+    Reads can be distributed over read replicas (see `replica_urls` of the configuration). Read-only sessions are bound
+    to the next replica that can be reached, or to the primary database if there is none. Writes always use the
+    primary database.
+
+    The changes of single songs can be coalesced into shared transactions with `run_write()`, see `write_coalescing` of
+    the configuration.
+
+    The slow statements of all engines are recorded in `slow_query_log`, see `slow_query_log` of the configuration.
     """
 
     def __init__(self, config: Config) -> None:
-        self.engine = create_engine(config.database.url, echo=True)
-        self.session_maker = sessionmaker(self.engine)
+        self.config = config
+        self.engine, self.session_maker, self.async_engine, self.async_session_maker = self.create_engines(
+            config.database, config.database.url
+        )
+        self.replicas = [Replica(*self.create_engines(config.database, url)) for url in config.database.replica_urls]
+        self.replica_retry_seconds = config.database.replica_retry_seconds
+        self.read_your_writes_seconds = config.database.read_your_writes_seconds
+        self._replica_counter = itertools.count()
+        self._primary_reads_until = 0.0
+        self.song_cache = SongCache(config.cache)
+        self.write_coalescer = (
+            WriteCoalescer(config.database.write_coalescing, self.run_in_session)
+            if config.database.write_coalescing.enabled
+            else None
+        )
+        self.slow_query_log = SlowQueryLog(config.database.slow_query_log)
+        engines = [("primary", self.engine, self.async_engine)] + [
+            (f"replica-{index}", replica.engine, replica.async_engine) for index, replica in enumerate(self.replicas)
+        ]
+        for name, engine, async_engine in engines:
+            self.slow_query_log.instrument_engine(engine, name)
+            if async_engine is not None:
+                self.slow_query_log.instrument_engine(async_engine.sync_engine, name)
 
-    def apply_migrations(self, directory: Path) -> None:
-        """Applies all migrations in the specified directory in alphabetical order."""
-        for sql_file in sorted(directory.glob("*.sql")):
-            self.execute_sql_file(sql_file)
+    @classmethod
+    def create_engines(
+        cls, config: DatabaseConfig, url: str
+    ) -> tuple[Engine, sessionmaker[SongsSession], AsyncEngine | None, async_sessionmaker[AsyncSession] | None]:
+        """
+        Creates the engine and the session maker for the database at the specified URL, and in async mode also the
+        async engine and the async session maker.
+        """
+        options = cls.engine_options(config.model_copy(update={"url": url}))
+        engine = create_engine(url, **options)
+        cls.install_session_settings(engine, config.performance)
+        session_maker = sessionmaker(engine, class_=SongsSession)
+        if config.mode != "async":
+            return engine, session_maker, None, None
+
+        async_engine = create_async_engine(cls.async_url(url), **options)
+        cls.install_session_settings(async_engine.sync_engine, config.performance)
+        async_session_maker = async_sessionmaker(async_engine, expire_on_commit=False, sync_session_class=SongsSession)
+        return engine, session_maker, async_engine, async_session_maker
+
+    @staticmethod
+    def engine_options(config: DatabaseConfig) -> dict[str, Any]:
+        """Gets the keyword arguments for `create_engine()` and `create_async_engine()` from the configuration."""
+        performance = config.performance
+        options: dict[str, Any] = {"echo": performance.echo}
+        url = make_url(config.url)
+        if url.get_backend_name() != "sqlite" or url.database not in (None, "", ":memory:"):
+            options.update(
+                pool_size=performance.pool_size,
+                max_overflow=performance.max_overflow,
+                pool_timeout=performance.pool_timeout_seconds,
+                pool_recycle=performance.pool_recycle_seconds,
+                pool_pre_ping=performance.pool_pre_ping,
+            )
+        return options
 
-    def execute_sql_file(self, sql_file: Path) -> None:
-        """Executes a single SQL file."""
-        with open(sql_file) as file:
-            sql_statements = self.parse_sql_file(file.read())
+    @staticmethod
+    def install_session_settings(engine: Engine, performance: DatabasePerformanceConfig) -> None:
+        """
+        Applies the session-level settings of the configuration to each new connection of the engine:
+        the pragmas on SQLite and the timeouts on PostgreSQL.
+        """
+        backend = engine.dialect.name
+        if backend == "sqlite":
+            statements = [
+                f"PRAGMA journal_mode = {performance.sqlite_journal_mode}",
+                f"PRAGMA synchronous = {performance.sqlite_synchronous}",
+                f"PRAGMA mmap_size = {performance.sqlite_mmap_size:d}",
+                f"PRAGMA busy_timeout = {performance.sqlite_busy_timeout_ms:d}",
+            ]
+        elif backend == "postgresql":
+            statements = [
+                f"SET statement_timeout = {performance.statement_timeout_ms:d}",
+                f"SET idle_in_transaction_session_timeout = {performance.idle_in_transaction_timeout_ms:d}",
+            ]
+        else:
+            return
 
+        @event.listens_for(engine, "connect")
+        def apply_session_settings(dbapi_connection: Any, connection_record: Any) -> None:
+            cursor = dbapi_connection.cursor()
+            try:
+                for statement in statements:
+                    cursor.execute(statement)
+            finally:
+                cursor.close()
+            # The driver may have started a transaction. Commit it, so that a later rollback does not undo the settings.
+            dbapi_connection.commit()
+
+    @staticmethod
+    def async_url(url: str) -> URL:
+        """Gets the URL for the async driver of the database backend of the specified URL."""
+        parsed_url = make_url(url)
+        backend = parsed_url.get_backend_name()
+        if backend not in ASYNC_DRIVERS:
+            raise ValueError(f"Async mode is not supported for database backend {backend}.")
+        return parsed_url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+    @property
+    def is_async(self) -> bool:
+        return self.async_session_maker is not None
+
+    def apply_migrations(self, directory: Path, baseline: str | None = None) -> list[str]:
+        """
+        Applies the pending migrations in the specified directory in alphabetical order and returns their names.
+        A migration that only applies to one database backend has the name of the backend before its extension,
+        for example `0003_song_search.sqlite.sql`. Such migrations are skipped for other database backends.
+
+        Each migration is applied in its own transaction, which also records it with the checksum of its file in the
+        table `schema_migrations`. If all migrations have been applied, only that table is read. Otherwise, the
+        migrations are applied under a lock, so that processes that start at the same time apply each migration once:
+        an advisory lock on PostgreSQL and the write lock of each migration transaction on SQLite. The statement and
+        lock timeouts of the configuration do not apply to migrations (see `MIGRATION_SESSION_SETTINGS`).
+        :param baseline: the name of the last migration that has been applied to a database that was migrated before
+        migrations were recorded. The pending migrations up to and including this one are recorded without executing
+        them; the later ones are applied.
+        :raises ValueError: if the file of a migration has changed after the migration was applied, or if the baseline
+        is not the name of a migration.
+        """
+        migrations = [
+            self.read_migration(sql_file)
+            for sql_file in sorted(directory.glob("*.sql"))
+            if self.is_migration_for_backend(sql_file, self.engine.dialect.name)
+        ]
+        migration_names = [migration.name for migration in migrations]
+        if baseline is not None and baseline not in migration_names:
+            raise ValueError(f"The baseline {baseline} is not one of the migrations {', '.join(migration_names)}.")
+        baseline_migrations = set(migration_names[: migration_names.index(baseline) + 1] if baseline else [])
+        applied_migrations: list[str] = []
+        with self._connect_for_migrations() as conn:
+            if not self._get_pending_migrations(conn, migrations):
+                return applied_migrations
+
+            with self._migration_lock(conn):
+                with self._migration_transaction(conn):
+                    Base.metadata.tables[SchemaMigration.__tablename__].create(conn, checkfirst=True)
+
+                for migration in self._get_pending_migrations(conn, migrations):
+                    with self._migration_transaction(conn):
+                        # Without an advisory lock, another process may have applied the migration in the meantime.
+                        if conn.scalar(select(SchemaMigration.name).where(SchemaMigration.name == migration.name)):
+                            continue
+                        if migration.name not in baseline_migrations:
+                            for statement in migration.statements:
+                                conn.execute(text(statement))
+                        conn.execute(insert(SchemaMigration).values(name=migration.name, checksum=migration.checksum))
+                    applied_migrations.append(migration.name)
+        return applied_migrations
+
+    @staticmethod
+    def is_migration_for_backend(sql_file: Path, backend: str) -> bool:
+        suffixes = sql_file.suffixes
+        return len(suffixes) < 2 or suffixes[-2] == f".{backend}"
+
+    @classmethod
+    def read_migration(cls, sql_file: Path) -> Migration:
+        contents = sql_file.read_bytes()
+        return Migration(sql_file.name, hashlib.sha256(contents).hexdigest(), cls.parse_sql_file(contents.decode()))
+
+    @contextmanager
+    def _connect_for_migrations(self) -> Iterator[Connection]:
         with self.engine.connect() as conn:
-            for statement in sql_statements:
-                conn.execute(text(statement))
+            if conn.dialect.name == "sqlite":
+                # The sqlite3 module does not start a transaction before DDL statements, so the transactions of the
+                # migrations are started explicitly (see _migration_transaction()).
+                conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            for statement in MIGRATION_SESSION_SETTINGS.get(conn.dialect.name, []):
+                conn.exec_driver_sql(statement)
+            conn.commit()
+            try:
+                yield conn
+            finally:
+                # The connection is closed instead of returned to the pool, so that its settings are not reused.
+                conn.invalidate()
+
+    @staticmethod
+    @contextmanager
+    def _migration_transaction(conn: Connection) -> Iterator[None]:
+        if conn.dialect.name != "sqlite":
+            with conn.begin():
+                yield
+            return
+
+        # BEGIN IMMEDIATE takes the write lock, which serializes processes that apply migrations at the same time.
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        conn.exec_driver_sql("COMMIT")
+
+    @staticmethod
+    @contextmanager
+    def _migration_lock(conn: Connection) -> Iterator[None]:
+        if conn.dialect.name != "postgresql":
+            yield
+            return
+
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            conn.commit()
+
+    @staticmethod
+    def _get_pending_migrations(conn: Connection, migrations: Sequence[Migration]) -> list[Migration]:
+        """
+        Gets the migrations that have not been applied. The transaction in which they are read is ended, so that the
+        migrations can be applied in transactions of their own.
+        :raises ValueError: if the file of a migration has changed after the migration was applied.
+        """
+        try:
+            if not inspect(conn).has_table(SchemaMigration.__tablename__):
+                return list(migrations)
+
+            checksums = {
+                name: checksum
+                for name, checksum in conn.execute(select(SchemaMigration.name, SchemaMigration.checksum))
+            }
+        finally:
+            conn.commit()
+        for migration in migrations:
+            if checksums.get(migration.name, migration.checksum) != migration.checksum:
+                raise ValueError(f"The migration {migration.name} has been changed after it was applied.")
+        return [migration for migration in migrations if migration.name not in checksums]
 
     @staticmethod
     def parse_sql_file(sql_statements: str) -> Sequence[str]:
         """
         Parses a string with zero or more SQL statements and returns the individual SQL statements.
-        Each SQL statement must end with a semicolon. The current implementation is aimed at migration scripts
-        and therefore does not handle cases where a semicolon occurs inside a string literal.
+        Each SQL statement must end with a semicolon, except for the last one. Semicolons inside comments, string
+        literals, quoted identifiers, dollar-quoted strings and the body (`BEGIN ... END`) of a `CREATE TRIGGER`
+        statement do not end a statement. Comments before a statement are part of the statement, but comments that
+        are not followed by a statement are dropped.
         """
-        return [stmt.strip() for stmt in (sql_statements.split(";")) if stmt.strip()]
+        statements = []
+        tokens: list[str] = []
+        has_code = False
+        for match in SQL_TOKEN_PATTERN.finditer(sql_statements):
+            token = match.group()
+            if token == ";":
+                statement = "".join(tokens)
+                in_trigger_body = (
+                    CREATE_TRIGGER_PATTERN.match(statement)
+                    and TRIGGER_BEGIN_PATTERN.search(statement)
+                    and not TRIGGER_END_PATTERN.search(statement)
+                )
+                if not in_trigger_body:
+                    if has_code:
+                        statements.append(statement.strip())
+                    tokens = []
+                    has_code = False
+                    continue
+            tokens.append(token)
+            if not token.startswith(("--", "/*")) and not token.isspace():
+                has_code = True
+        if has_code:
+            statements.append("".join(tokens).strip())
+        return statements
 
     def create_song(self, session: Session, song: Song) -> Song:
         session.add(song)
         session.flush()
+        self._songs_changed(session, [song.id])
         return song
 
     def update_song(self, session: Session, song: Song) -> Song:
-        exists = session.scalar(select(select(Song).filter_by(id=song.id).exists()))
-
-        if not exists:
+        """
+        Updates the song with a single UPDATE statement. The song does not have to be added to the session.
+        :raises ValueError: if no song exists with the id of the specified song.
+        """
+        query = update(Song).where(Song.id == song.id).values(**self._column_values(song))
+        if not self._execute_for_single_row(session, query):
             raise ValueError(f"No song with id {song.id} exists.")
 
-        session.merge(song)
-        session.flush()
+        self._songs_changed(session, [song.id])
         return song
 
     def delete_song(self, session: Session, song_id: int) -> None:
-        song = session.get(Song, song_id)
-
-        if song is None:
+        """
+        Deletes the song with a single DELETE statement.
+        :raises ValueError: if no song exists with the specified id.
+        """
+        if not self._execute_for_single_row(session, delete(Song).where(Song.id == song_id)):
             raise ValueError(f"No song with id {song_id} exists.")
 
-        session.delete(song)
-        session.flush()
+        self._songs_changed(session, [song_id])
+
+    @staticmethod
+    def _execute_for_single_row(session: Session, query: Update | Delete) -> bool:
+        """
+        Executes an UPDATE or DELETE statement for at most one row and returns whether a row was affected.
+        The RETURNING clause is used if the database supports it for the statement, and the row count otherwise
+        (for example on SQLite versions before 3.35).
+        """
+        dialect = session.get_bind().dialect
+        if dialect.update_returning if isinstance(query, Update) else dialect.delete_returning:
+            return session.execute(query.returning(Song.id)).first() is not None
+
+        result: CursorResult[Any] = session.execute(query)  # type: ignore[assignment]
+        return result.rowcount > 0
+
+    def create_songs(self, session: Session, songs: Sequence[Song]) -> Sequence[Song]:
+        """
+        Creates the specified songs with multi-row INSERT statements and sets the generated ids on the songs.
+        The songs are not added to the session.
+        :return: the songs.
+        """
+        if not songs:
+            return songs
+
+        query = insert(Song).returning(Song.id, sort_by_parameter_order=True)
+        song_ids = session.scalars(query, [self._column_values(song) for song in songs]).all()
+        for song, song_id in zip(songs, song_ids, strict=True):
+            song.id = song_id
+        self._songs_changed(session, song_ids)
+        return songs
+
+    def bulk_insert_songs(self, session: Session, songs: Sequence[dict[str, Any]]) -> None:
+        """
+        Inserts songs, given as dictionaries with the column values, as fast as the database backend allows:
+        with COPY on PostgreSQL and with an executemany INSERT on other backends. The ids of the songs are not read.
+        """
+        if not songs:
+            return
+
+        connection = session.connection()
+        if connection.dialect.name == "postgresql":
+            buffer = io.StringIO()
+            for song in songs:
+                buffer.write(format_copy_row([song[column] for column in SONG_COLUMNS]))
+            buffer.seek(0)
+            cursor: Any = connection.connection.cursor()
+            try:
+                columns = ", ".join(SONG_COLUMNS)
+                cursor.copy_expert(f"COPY song ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+            finally:
+                cursor.close()
+        else:
+            session.execute(insert(Song), songs)
+        # The ids are unknown, so only the snapshot and the count in the song cache are invalidated.
+        self._songs_changed(session, [])
+
+    @staticmethod
+    def get_bulk_import(session: Session, name: str) -> BulkImport | None:
+        return session.get(BulkImport, name)
+
+    @staticmethod
+    def save_bulk_import(session: Session, name: str, rows_read: int, rows_imported: int) -> None:
+        session.merge(BulkImport(name=name, rows_read=rows_read, rows_imported=rows_imported))
+
+    def update_songs(self, session: Session, songs: Sequence[Song]) -> set[int]:
+        """
+        Updates the specified songs with a single executemany UPDATE statement. Songs that do not exist are skipped.
+        :return: the ids of the songs that exist and have been updated.
+        """
+        existing_ids = self._get_existing_ids(session, [song.id for song in songs])
+        parameters = [{"id": song.id, **self._column_values(song)} for song in songs if song.id in existing_ids]
+        if parameters:
+            session.execute(update(Song), parameters)
+            self._songs_changed(session, existing_ids)
+        return existing_ids
+
+    def delete_songs(self, session: Session, song_ids: Sequence[int]) -> set[int]:
+        """
+        Deletes the songs with the specified ids with a single DELETE statement. Ids of songs that do not exist are
+        ignored.
+        :return: the ids of the songs that have been deleted.
+        """
+        if not song_ids:
+            return set()
+
+        query = delete(Song).where(Song.id.in_(song_ids))
+        if session.get_bind().dialect.delete_returning:
+            deleted_ids = set(session.scalars(query.returning(Song.id)).all())
+        else:
+            deleted_ids = self._get_existing_ids(session, song_ids)
+            session.execute(query)
+        if deleted_ids:
+            self._songs_changed(session, deleted_ids)
+        return deleted_ids
+
+    @staticmethod
+    def _get_existing_ids(session: Session, song_ids: Sequence[int]) -> set[int]:
+        if not song_ids:
+            return set()
+        return set(session.scalars(select(Song.id).where(Song.id.in_(song_ids))).all())
+
+    @staticmethod
+    def _column_values(song: Song) -> dict[str, object]:
+        return {column: getattr(song, column) for column in SONG_COLUMNS}
 
     def get_song(self, session: Session, song_id: int) -> Song:
         """
@@ -107,13 +975,428 @@ class DatabaseAccess:
     def get_all_songs(self, session: Session) -> list[Song]:
         return list(session.execute(select(Song).order_by(Song.id)).scalars().all())
 
+    def get_songs_page(
+        self,
+        session: Session,
+        limit: int,
+        after_id: int | None = None,
+        song_filter: SongFilter | None = None,
+        sort: SongSort = "id",
+        after_year_of_release: int | None = None,
+    ) -> list[Song]:
+        """
+        Gets a page of songs using keyset pagination. Only the requested rows are read, so the cost of getting a page
+        does not depend on the position of the page or on the size of the table.
+        :param limit: the maximum number of songs to return.
+        :param after_id: if not None, only songs after the song with this id in the sort order are returned.
+        :param song_filter: if not None, only songs that match this filter are returned.
+        :param sort: the sort order. Songs with the same year of release are ordered by id.
+        :param after_year_of_release: the year of release of the song with id `after_id`. This is required if `after_id`
+            is not None and the songs are sorted by year of release.
+        :return: the songs.
+        """
+        query = self._page_query(select(Song), limit, after_id, song_filter, sort, after_year_of_release)
+        return list(session.execute(query).scalars().all())
+
+    def get_song_rows_page(
+        self,
+        session: Session,
+        limit: int,
+        after_id: int | None = None,
+        song_filter: SongFilter | None = None,
+        sort: SongSort = "id",
+        after_year_of_release: int | None = None,
+    ) -> list[SongRow]:
+        """
+        Gets a page of songs like `get_songs_page()` does, but selects the columns into `SongRow` tuples instead of
+        loading ORM entities. This avoids the overhead of the identity map for large pages.
+        """
+        query = self._page_query(select(*SONG_ROW_COLUMNS), limit, after_id, song_filter, sort, after_year_of_release)
+        return [SongRow(*row) for row in session.execute(query)]
+
+    def get_partial_song_rows_page(
+        self,
+        session: Session,
+        fields: Sequence[SongField],
+        limit: int,
+        after_id: int | None = None,
+        song_filter: SongFilter | None = None,
+        sort: SongSort = "id",
+        after_year_of_release: int | None = None,
+    ) -> list[Row[Any]]:
+        """
+        Gets a page of songs like `get_song_rows_page()` does, but selects only the columns of the specified fields.
+        The columns of the sort order are always selected, because they are needed to request the next page.
+        """
+        sort_fields = {"id", "year_of_release"} if sort.endswith("year_of_release") else {"id"}
+        columns = [getattr(Song, field) for field in SONG_FIELDS if field in fields or field in sort_fields]
+        query = self._page_query(select(*columns), limit, after_id, song_filter, sort, after_year_of_release)
+        return list(session.execute(query))
+
+    @staticmethod
+    def _page_query(
+        query: Select[Any],
+        limit: int,
+        after_id: int | None,
+        song_filter: SongFilter | None,
+        sort: SongSort,
+        after_year_of_release: int | None,
+    ) -> Select[Any]:
+        sort_columns = [Song.year_of_release, Song.id] if sort.endswith("year_of_release") else [Song.id]
+        descending = sort.startswith("-")
+
+        query = query.order_by(*(column.desc() if descending else column for column in sort_columns))
+        if song_filter is not None:
+            query = query.where(*song_filter.get_conditions())
+        if after_id is not None:
+            if len(sort_columns) == 1:
+                after_values = [after_id]
+            elif after_year_of_release is not None:
+                after_values = [after_year_of_release, after_id]
+            else:
+                raise ValueError("after_year_of_release is required when sorting by year of release.")
+            sort_key, after_key = tuple_(*sort_columns), tuple_(*after_values)
+            query = query.where(sort_key < after_key if descending else sort_key > after_key)
+        return query.limit(limit)
+
+    def search_songs(self, session: Session, search_text: str, limit: int, offset: int = 0) -> list[Song]:
+        """
+        Searches songs with the full-text index on title, composer and artist. All words of the search text must
+        occur in a song. The last word also matches words that start with it, so that the search can be used while
+        typing. The songs are ordered by relevance and then by id.
+        :param search_text: the text to search for.
+        :param limit: the maximum number of songs to return.
+        :param offset: the number of matching songs to skip.
+        :return: the songs.
+        """
+        words = re.findall(r"\w+", search_text)
+        if not words:
+            return []
+
+        backend = session.get_bind().dialect.name
+        if backend == "sqlite":
+            query = " ".join(f'"{word}"' for word in words) + "*"
+            statement = text(
+                "SELECT song.id, song.title, song.composer, song.artist, song.year_of_release "
+                "FROM song_search JOIN song ON song.id = song_search.rowid "
+                "WHERE song_search MATCH :query ORDER BY song_search.rank, song.id LIMIT :limit OFFSET :offset"
+            )
+        elif backend == "postgresql":
+            query = " & ".join(words) + ":*"
+            statement = text(
+                "SELECT song.id, song.title, song.composer, song.artist, song.year_of_release "
+                "FROM song, to_tsquery('simple', :query) AS query WHERE song.search_vector @@ query "
+                "ORDER BY ts_rank(song.search_vector, query) DESC, song.id LIMIT :limit OFFSET :offset"
+            )
+        else:
+            raise ValueError(f"Full-text search is not supported for database backend {backend}.")
+
+        songs = select(Song).from_statement(statement.columns(*SONG_ROW_COLUMNS))
+        return list(session.scalars(songs, {"query": query, "limit": limit, "offset": offset}).all())
+
+    def stream_songs(self, session: Session, batch_size: int = 1000) -> Iterator[Sequence[Song]]:
+        """
+        Streams all songs ordered by id in batches. A server-side cursor is used where the database supports it, so
+        at most `batch_size` songs are held in memory at a time, regardless of the number of songs in the database.
+        :param batch_size: the number of songs that are fetched from the cursor per batch.
+        :return: an iterator over the batches of songs.
+        """
+        query = select(Song).order_by(Song.id).execution_options(yield_per=batch_size)
+        yield from session.execute(query).scalars().partitions()
+
+    def count_songs(self, session: Session, song_filter: SongFilter | None = None) -> int:
+        """
+        Gets the number of songs that match the filter. Without filter, the result is cached in the song cache,
+        because counting requires a scan of the whole table. Creating or deleting songs through this instance
+        invalidates the cached count.
+        """
+        query = select(func.count()).select_from(Song)
+        if song_filter is not None and not song_filter.is_empty():
+            return session.scalar(query.where(*song_filter.get_conditions())) or 0
+
+        count = self.song_cache.get_count()
+        if count is None:
+            version = self.song_cache.version
+            count = session.scalar(query) or 0
+            self.song_cache.put_count(count, version)
+        return count
+
+    def get_song_counts_per_year(self, session: Session) -> list[tuple[int, int]]:
+        """Gets the years of release with their number of songs, ordered by year."""
+        query = select(SongCountPerYear.year_of_release, SongCountPerYear.song_count)
+        return [(year, count) for year, count in session.execute(query.order_by(SongCountPerYear.year_of_release))]
+
+    def get_song_counts_per_composer(self, session: Session, limit: int) -> list[tuple[str, int]]:
+        """Gets the `limit` composers with the most songs with their number of songs, ordered by number of songs."""
+        query = select(SongCountPerComposer.composer, SongCountPerComposer.song_count)
+        order = (SongCountPerComposer.song_count.desc(), SongCountPerComposer.composer)
+        return [(name, count) for name, count in session.execute(query.order_by(*order).limit(limit))]
+
+    def get_song_counts_per_artist(self, session: Session, limit: int) -> list[tuple[str, int]]:
+        """Gets the `limit` artists with the most songs with their number of songs, ordered by number of songs."""
+        query = select(SongCountPerArtist.artist, SongCountPerArtist.song_count)
+        order = (SongCountPerArtist.song_count.desc(), SongCountPerArtist.artist)
+        return [(name, count) for name, count in session.execute(query.order_by(*order).limit(limit))]
+
+    def rebuild_song_statistics(self, session: Session) -> None:
+        """
+        Recomputes the summary tables of the song statistics from the song table. The summary tables are maintained
+        by triggers, so this is only needed to repair them, for example after they were changed by hand.
+        On PostgreSQL, changes of songs are blocked until the session ends, so that no change is counted twice or lost.
+        """
+        if session.get_bind().dialect.name == "postgresql":
+            session.execute(text("LOCK TABLE song IN SHARE MODE"))
+
+        summaries = (
+            (SongCountPerYear, Song.year_of_release),
+            (SongCountPerComposer, Song.composer),
+            (SongCountPerArtist, Song.artist),
+        )
+        for summary, column in summaries:
+            session.execute(delete(summary))
+            counts = select(column, func.count()).where(column.is_not(None)).group_by(column)
+            session.execute(insert(summary).from_select([column.key, "song_count"], counts))
+
+    def get_catalog_version(self, session: Session) -> int:
+        """Gets the catalog version, which is incremented by every transaction that changes songs."""
+        return session.scalars(select(CatalogVersion.version)).one()
+
+    def get_song_changes(self, session: Session, cursor: SongChangeCursor, limit: int) -> SongChangePage:
+        """
+        Gets at most `limit` changes of songs after the cursor, ordered by catalog version and song id, together with
+        the current state of the changed songs. A song that changed several times is only returned with its last
+        change, so the number of changes is bounded by the number of songs that changed.
+        """
+        # The catalog version is read first. All changes up to this version are visible to the next statement.
+        catalog_version = self.get_catalog_version(session)
+        position = SongChange.catalog_version > cursor.catalog_version
+        if cursor.song_id is not None:
+            position = tuple_(SongChange.catalog_version, SongChange.song_id) > tuple_(
+                cursor.catalog_version, cursor.song_id
+            )
+        query = (
+            select(SongChange.song_id, SongChange.catalog_version, SongChange.deleted, *SONG_ROW_COLUMNS)
+            .outerjoin(Song, Song.id == SongChange.song_id)
+            .where(position)
+            .order_by(SongChange.catalog_version, SongChange.song_id)
+            .limit(limit + 1)
+        )
+        changes = [
+            SongChangeRow(song_id, version, deleted, None if deleted or row[0] is None else SongRow(*row))
+            for song_id, version, deleted, *row in session.execute(query)
+        ]
+
+        if len(changes) > limit:
+            changes = changes[:limit]
+            return SongChangePage(changes, SongChangeCursor(changes[-1].catalog_version, changes[-1].song_id), True)
+        # All changes have been read, including the changes up to the catalog version that was read first.
+        last_catalog_version = changes[-1].catalog_version if changes else 0
+        next_cursor = SongChangeCursor(max(cursor.catalog_version, catalog_version, last_catalog_version))
+        return SongChangePage(changes, next_cursor, False)
+
+    async def read_catalog_version(self) -> int:
+        """Gets the catalog version from the song cache if it can be trusted, otherwise from the database."""
+        catalog_version = self._get_cached_catalog_version()
+        if catalog_version is None:
+            catalog_version = await self.run_in_session(
+                lambda session: self._read_catalog_version(session)[0], read_only=True
+            )
+        return catalog_version
+
+    def _get_cached_catalog_version(self) -> int | None:
+        """
+        Gets the catalog version from the song cache if this process is the only one that changes songs (see
+        `CacheConfig.single_process`), or None. Otherwise, another process may have changed songs since it was cached.
+        """
+        return self.song_cache.get_catalog_version() if self.config.cache.single_process else None
+
+    def _read_catalog_version(self, session: Session) -> tuple[int, int | None]:
+        """
+        Reads the catalog version before songs are read in the same session and passes it to the song cache.
+        :return: the catalog version and the version of the song cache with which the songs may be stored in the cache,
+        or None if they must not be stored.
+        """
+        catalog_version = self.get_catalog_version(session)
+        return catalog_version, self.song_cache.put_catalog_version(catalog_version)
+
+    async def read_song(self, song_id: int, known_catalog_versions: Collection[int] = ()) -> CatalogRead[SongRow]:
+        """
+        Gets the song with the specified id from the song cache, after the catalog version has been read from the
+        database unless the cached one can be trusted. If the song is not cached, it is read from the database and
+        added to the cache.
+        :param known_catalog_versions: the catalog versions of the song that the caller already has. If the catalog
+        version is one of them, the value of the result is None. The song is looked up anyway, because only a song
+        that exists can be unchanged.
+        :raises NoResultFound: if no song exists with the specified id.
+        """
+        catalog_version = self._get_cached_catalog_version()
+        if catalog_version is not None:
+            song = self.song_cache.get(song_id)
+            if song is not None:
+                return CatalogRead(catalog_version, None if catalog_version in known_catalog_versions else song)
+
+        def read(session: Session) -> CatalogRead[SongRow]:
+            catalog_version, version = self._read_catalog_version(session)
+            # The cached songs belong to the catalog version that was read, unless the version of the cache is None.
+            song = self.song_cache.get(song_id) if version is not None else None
+            if song is None:
+                song = SongRow.from_song(self.get_song(session, song_id))
+                if version is not None:
+                    self.song_cache.put(song, version)
+            return CatalogRead(catalog_version, None if catalog_version in known_catalog_versions else song)
+
+        return await self.run_in_session(read, read_only=True)
+
+    async def read_song_count(self, song_filter: SongFilter | None = None) -> int:
+        """
+        Gets the number of songs that match the filter. Without filter, the number is taken from the song cache if
+        present.
+        """
+        count = self.song_cache.get_count() if song_filter is None or song_filter.is_empty() else None
+        if count is None:
+            count = await self.run_in_session(lambda session: self.count_songs(session, song_filter), read_only=True)
+        return count
+
+    async def read_songs_page(
+        self,
+        limit: int,
+        after_id: int | None = None,
+        song_filter: SongFilter | None = None,
+        sort: SongSort = "id",
+        after_year_of_release: int | None = None,
+        known_catalog_versions: Collection[int] = (),
+        fields: Sequence[SongField] = SONG_FIELDS,
+    ) -> CatalogRead[Sequence[PartialSongRow]]:
+        """
+        Gets a page of songs like `get_songs_page()` does. Unfiltered pages ordered by id are served from the
+        snapshot of all songs in the song cache if present, after the catalog version has been read from the database
+        unless the cached one can be trusted. Otherwise, the snapshot is loaded if the number of songs
+        does not exceed `max_snapshot_songs`, and the page is read from the database if it does. The number of songs
+        is not counted, which would scan the whole table after each change, but checked with a query that reads at most
+        `max_snapshot_songs + 1` ids from the primary key.
+        Other pages are always read from the database.
+        :param known_catalog_versions: the catalog versions of the page that the caller already has. If the catalog
+        version is one of them, the page is not read and the value of the result is None.
+        :param fields: the fields that the caller needs. Pages read from the database contain only these fields and
+        the fields of the sort order; pages from the song cache contain all fields.
+        """
+        unfiltered = (song_filter is None or song_filter.is_empty()) and sort == "id"
+        catalog_version = self._get_cached_catalog_version()
+        if catalog_version is not None:
+            if catalog_version in known_catalog_versions:
+                return CatalogRead(catalog_version, None)
+            songs = self.song_cache.get_page(limit, after_id) if unfiltered else None
+            if songs is not None:
+                return CatalogRead(catalog_version, songs)
+
+        def read(session: Session) -> CatalogRead[Sequence[PartialSongRow]]:
+            catalog_version, version = self._read_catalog_version(session)
+            if catalog_version in known_catalog_versions:
+                return CatalogRead(catalog_version, None)
+            songs = self.song_cache.get_page(limit, after_id) if unfiltered and version is not None else None
+            if songs is not None:
+                return CatalogRead(catalog_version, songs)
+            if unfiltered:
+                return CatalogRead(catalog_version, self._read_songs_page(session, limit, after_id, version, fields))
+            return CatalogRead(
+                catalog_version,
+                self._read_song_rows_page(session, fields, limit, after_id, song_filter, sort, after_year_of_release),
+            )
+
+        return await self.run_in_session(read, read_only=True)
+
+    def _read_songs_page(
+        self, session: Session, limit: int, after_id: int | None, version: int | None, fields: Sequence[SongField]
+    ) -> Sequence[PartialSongRow]:
+        if version is not None and not self.song_cache.is_snapshot_too_large():
+            # There are at most max_snapshot_songs songs if no song follows the first max_snapshot_songs ones.
+            max_snapshot_songs = self.song_cache.config.max_snapshot_songs
+            if session.scalar(select(Song.id).order_by(Song.id).offset(max_snapshot_songs).limit(1)) is None:
+                snapshot = [SongRow(*row) for row in session.execute(select(*SONG_ROW_COLUMNS).order_by(Song.id))]
+                self.song_cache.put_snapshot(snapshot, version)
+                return get_page(snapshot, limit, after_id)
+            self.song_cache.put_snapshot_too_large(version)
+
+        return self._read_song_rows_page(session, fields, limit, after_id)
+
+    def _read_song_rows_page(
+        self,
+        session: Session,
+        fields: Sequence[SongField],
+        limit: int,
+        after_id: int | None,
+        song_filter: SongFilter | None = None,
+        sort: SongSort = "id",
+        after_year_of_release: int | None = None,
+    ) -> Sequence[PartialSongRow]:
+        if set(fields) == set(SONG_FIELDS):
+            return self.get_song_rows_page(session, limit, after_id, song_filter, sort, after_year_of_release)
+        return self.get_partial_song_rows_page(
+            session, fields, limit, after_id, song_filter, sort, after_year_of_release
+        )
+
+    def _songs_changed(self, session: Session, song_ids: Iterable[int]) -> None:
+        song_ids = list(song_ids)
+        self.song_cache.invalidate(song_ids)
+        session.info.setdefault("changed_songs", []).append((self, song_ids))
+
+    def songs_committed(self, song_ids: Iterable[int], catalog_version: int | None = None) -> None:
+        """
+        Is called after the changes of the specified songs have been committed. It invalidates the songs in the song
+        cache again, advances the catalog version of the song cache to `catalog_version` and starts the
+        read-your-writes window.
+        """
+        self.song_cache.invalidate(song_ids)
+        if catalog_version is not None:
+            self.song_cache.advance_catalog_version(catalog_version)
+        if self.read_your_writes_seconds > 0:
+            self._primary_reads_until = time.monotonic() + self.read_your_writes_seconds
+
+    def _get_replicas(self) -> list[Replica]:
+        """
+        Gets the replicas that may be used for the next read, in the order in which they must be tried. The start
+        replica rotates round-robin. No replicas are returned during the read-your-writes window.
+        """
+        now = time.monotonic()
+        if not self.replicas or now < self._primary_reads_until:
+            return []
+        start = next(self._replica_counter) % len(self.replicas)
+        return [replica for replica in self.replicas[start:] + self.replicas[:start] if replica.unhealthy_until <= now]
+
+    def _create_read_only_session(self) -> Session:
+        for replica in self._get_replicas():
+            session = replica.session_maker(info={"read_only": True})
+            try:
+                # Connect now, so that an unreachable replica can be skipped.
+                session.connection()
+                return session
+            except DBAPIError:
+                session.close()
+                replica.unhealthy_until = time.monotonic() + self.replica_retry_seconds
+        return self.session_maker(info={"read_only": True})
+
+    async def _create_read_only_async_session(self) -> AsyncSession:
+        for replica in self._get_replicas():
+            assert replica.async_session_maker is not None
+            session = replica.async_session_maker(info={"read_only": True})
+            try:
+                await session.connection()
+                return session
+            except DBAPIError:
+                await session.close()
+                replica.unhealthy_until = time.monotonic() + self.replica_retry_seconds
+        assert self.async_session_maker is not None
+        return self.async_session_maker(info={"read_only": True})
+
     @contextmanager
-    def get_session(self) -> Iterator[Session]:
+    def get_session(self, read_only: bool = False) -> Iterator[Session]:
         """
         Gets a context manager that commits the session if no exception was raised, and rolls back the session
         if an exception was raised.
+        :param read_only: whether the session only reads. A read-only session is bound to a read replica if one
+        can be reached, and raises `RuntimeError` when songs are changed.
         """
-        session = self.session_maker()
+        session = self._create_read_only_session() if read_only else self.session_maker()
         try:
             yield session
             session.commit()
@@ -122,3 +1405,105 @@ class DatabaseAccess:
             raise
         finally:
             session.close()
+
+    @asynccontextmanager
+    async def get_async_session(self, read_only: bool = False) -> AsyncIterator[AsyncSession]:
+        """
+        Gets an async context manager that commits the session if no exception was raised, and rolls back the session
+        if an exception was raised. This is only available in async mode.
+        :param read_only: whether the session only reads, see `get_session()`.
+        """
+        if self.async_session_maker is None:
+            raise RuntimeError("Async sessions are only available if the database mode is async.")
+
+        session = await self._create_read_only_async_session() if read_only else self.async_session_maker()
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+    async def run_in_session(self, function: Callable[[Session], T], read_only: bool = False) -> T:
+        """
+        Runs the specified function with a session without blocking the event loop and returns its result.
+        The session is committed if the function returns normally and rolled back if it raises an exception.
+        In sync mode, the function runs in a thread of the threadpool. In async mode, the function runs inside the event
+        loop on an `AsyncSession`, whose I/O is performed by the async driver.
+        :param read_only: whether the function only reads, see `get_session()`.
+        """
+        if self.async_session_maker is None:
+            return await to_thread.run_sync(self._run_in_sync_session, function, read_only)
+
+        async with self.get_async_session(read_only) as session:
+            return await session.run_sync(function)
+
+    async def run_write(self, function: Callable[[Session], T]) -> T:
+        """
+        Runs the specified function, which changes songs, like `run_in_session()` does. If write coalescing is enabled,
+        the function runs in a transaction shared with concurrent writes (see `WriteCoalescer`), and the result is
+        returned after that transaction has been committed.
+        """
+        if self.write_coalescer is None:
+            return await self.run_in_session(function)
+        return await self.write_coalescer.run(function)
+
+    def _run_in_sync_session(self, function: Callable[[Session], T], read_only: bool) -> T:
+        with self.get_session(read_only) as session:
+            return function(session)
+
+    async def stream_songs_async(self, batch_size: int = 1000) -> AsyncIterator[Sequence[Song]]:
+        """
+        The async mode counterpart of `stream_songs()`. It opens its own session, which stays open until the iterator is
+        exhausted or closed.
+        """
+        query = select(Song).order_by(Song.id).execution_options(yield_per=batch_size)
+        async with self.get_async_session(read_only=True) as session:
+            result = await session.stream_scalars(query)
+            async for songs in result.partitions():
+                yield songs
+
+    async def warm_up(self) -> None:
+        """
+        Opens `pool_size` connections to the primary database and to each replica and returns them to their pools, so
+        that the first requests do not wait for new connections. Only the engines that serve the endpoints are warmed
+        up, which are the async engines in async mode. A replica that cannot be reached is skipped for
+        `replica_retry_seconds`.
+        """
+        await self._warm_up_engine(self.engine, self.async_engine)
+        for replica in self.replicas:
+            try:
+                await self._warm_up_engine(replica.engine, replica.async_engine)
+            except DBAPIError:
+                replica.unhealthy_until = time.monotonic() + self.replica_retry_seconds
+
+    @staticmethod
+    async def _warm_up_engine(engine: Engine, async_engine: AsyncEngine | None) -> None:
+        # The connections are held at the same time, so that the pool has to open a new one for each of them.
+        if async_engine is not None:
+            pool = async_engine.sync_engine.pool
+            async with AsyncExitStack() as stack:
+                for _ in range(pool.size() if isinstance(pool, QueuePool) else 1):
+                    await stack.enter_async_context(async_engine.connect())
+            return
+
+        def open_connections() -> None:
+            with ExitStack() as stack:
+                for _ in range(engine.pool.size() if isinstance(engine.pool, QueuePool) else 1):
+                    stack.enter_context(engine.connect())
+
+        await to_thread.run_sync(open_connections)
+
+    async def dispose(self) -> None:
+        """Commits the coalesced writes in progress and closes all connections of the connection pools."""
+        if self.write_coalescer is not None:
+            await self.write_coalescer.wait_closed()
+        engines = [(self.engine, self.async_engine)] + [
+            (replica.engine, replica.async_engine) for replica in self.replicas
+        ]
+        for engine, async_engine in engines:
+            engine.dispose()
+            if async_engine is not None:
+                await async_engine.dispose()
@@ -1,13 +1,53 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, FastAPI, HTTPException, status
-from fastapi.responses import Response
+import asyncio
+import secrets
+import time
+from collections.abc import AsyncIterator, Iterable, Iterator, Sequence
+from contextlib import asynccontextmanager
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Body, Depends, FastAPI, Header, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+from pydantic_core import to_json
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.orm import Session
+
+from songs_api.admission import AdmissionMiddleware, ConcurrencyLimiter, get_concurrency_limits
+from songs_api.cache import CacheStatistics
+from songs_api.database import (
+    SONG_FIELDS,
+    DatabaseAccess,
+    PartialSongRow,
+    Song,
+    SongChangeCursor,
+    SongChangePage,
+    SongField,
+    SongFilter,
+    SongRow,
+    SongSort,
+)
+from songs_api.metrics import Metrics, MetricsMiddleware
+from songs_api.slow_queries import SlowQuery, SlowQueryMiddleware
+
 
-from songs_api.database import DatabaseAccess, Song
+def build_app(database_access: DatabaseAccess, warm_up: bool = False) -> FastAPI:
+    """
+    Builds the app with the song endpoints, the metrics endpoint and, if it is enabled and has an admin token, the
+    endpoint of the slow query log. If admission control is enabled in the configuration of the `DatabaseAccess`
+    instance, the numbers of concurrent reads and writes are limited.
+    :param warm_up: whether the connection pools are filled at startup, before the server accepts requests.
+    """
 
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        if warm_up:
+            await database_access.warm_up()
+        yield
+        await database_access.dispose()
+        metrics.close()
 
-def build_app(database_access: DatabaseAccess) -> FastAPI:
     app = FastAPI(
         title="Songs API",
         description="An API for maintaining a collection of songs.",
@@ -21,24 +61,325 @@ def build_app(database_access: DatabaseAccess) -> FastAPI:
             "name": "Apache 2.0",
             "url": "https://www.apache.org/licenses/LICENSE-2.0.html",
         },
+        lifespan=lifespan,
     )
     app.include_router(build_router(database_access))
+
+    metrics = Metrics()
+    metrics.instrument_engine(database_access.engine, "sync")
+    if database_access.async_engine is not None:
+        metrics.instrument_engine(database_access.async_engine.sync_engine, "async")
+    for index, replica in enumerate(database_access.replicas):
+        metrics.instrument_engine(replica.engine, f"replica-{index}")
+        if replica.async_engine is not None:
+            metrics.instrument_engine(replica.async_engine.sync_engine, f"replica-{index}-async")
+
+    app.add_middleware(SlowQueryMiddleware)
+    admission = database_access.config.admission
+    if admission.enabled:
+        limits = (*get_concurrency_limits(database_access.config), admission.max_concurrent_streams)
+        limiters = {
+            kind: ConcurrencyLimiter(limit, admission.max_waiting_requests, admission.max_wait_seconds)
+            for kind, limit in zip(("read", "write", "stream"), limits, strict=True)
+        }
+        metrics.instrument_admission(limiters)
+        # The metrics middleware is added last, so it is the outer one and also records the rejected requests.
+        app.add_middleware(
+            AdmissionMiddleware,
+            reads=limiters["read"],
+            writes=limiters["write"],
+            streams=limiters["stream"],
+            retry_after_seconds=admission.retry_after_seconds,
+        )
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics() -> Response:
+        """Gets the metrics of the HTTP requests and the database access in the Prometheus text format."""
+        content, media_type = metrics.render()
+        return Response(content, media_type=media_type)
+
+    slow_query_log = database_access.config.database.slow_query_log
+    if slow_query_log.enabled and slow_query_log.admin_token is not None:
+        expected_authorization = f"Bearer {slow_query_log.admin_token.get_secret_value()}"
+
+        @app.get("/admin/slow-queries", include_in_schema=False)
+        async def get_slow_queries(authorization: Annotated[str, Header()] = "") -> list[SlowQuery]:
+            """Gets the most recent statements of the slow query log with their query plans, the most recent first."""
+            if not secrets.compare_digest(authorization.encode(), expected_authorization.encode()):
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="A valid admin token is required.",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            return database_access.slow_query_log.get_entries()
+
     return app
 
 
+DEFAULT_PAGE_SIZE = 100
+"""The number of songs returned by `GET /songs/` if the client does not specify a limit."""
+
+MAX_PAGE_SIZE = 1000
+"""The maximum number of songs that a client can request in a single page."""
+
+MAX_SEARCH_OFFSET = 10_000
+"""The maximum number of search results that a client can skip. Deeper pages are not useful for relevance ranking."""
+
+MAX_BATCH_SIZE = 1000
+"""The maximum number of songs that a client can send in a single batch request."""
+
+DEFAULT_CHANGE_STREAM_TIMEOUT_SECONDS = 30.0
+"""The number of seconds without changes after which a stream of `GET /songs/changes` ends by default."""
+
+MAX_CHANGE_STREAM_TIMEOUT_SECONDS = 300.0
+"""The maximum number of seconds without changes that a client can wait for in a stream of `GET /songs/changes`."""
+
+CHANGE_POLL_SECONDS = 1.0
+"""
+The interval at which a stream of `GET /songs/changes` checks whether the catalog version has changed. The check is
+served from the song cache, so the streams of a process read the catalog version at most once per `ttl_seconds`.
+"""
+
+KEEP_ALIVE_SECONDS = 15.0
+"""The maximum interval between messages of a stream, so that proxies do not close idle streams."""
+
+
 def build_router(database_access: DatabaseAccess) -> APIRouter:
+    """
+    Builds the router with the song endpoints. The endpoints are coroutines that access the database through
+    `DatabaseAccess.run_in_session()`, so they work with both the sync and the async database mode.
+    """
     router = APIRouter()
 
-    @router.get("/songs/")
-    def get_registered_songs() -> list[SongResponse]:
-        """Gets the registered songs. Filtering has not been implemented yet. For now, all songs are returned."""
-        with database_access.get_session() as session:
-            return [SongResponse.model_validate(song) for song in database_access.get_all_songs(session)]
+    @router.get("/songs/", response_model=list[SongResponse] | list[PartialSongResponse])
+    async def get_registered_songs(
+        request: Request,
+        song_filter: Annotated[SongFilter, Depends()],
+        fields: Annotated[tuple[SongField, ...] | None, Depends(get_song_fields)],
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        after_id: Annotated[int | None, Query()] = None,
+        after_year_of_release: Annotated[int | None, Query()] = None,
+        sort: SongSort = "id",
+        include_total: bool = False,
+    ) -> Response:
+        """
+        Gets a page of registered songs that match the filter, in the specified sort order.
+        If `fields` is specified, the songs contain only these fields and only their columns are read.
+        If more songs are available, the `Link` header contains the URL of the next page (`rel="next"`).
+        If `include_total` is true, the `X-Total-Count` header contains the total number of songs that match the
+        filter. Without filter, this number is cached and can be slightly outdated.
+        The `ETag` header contains the catalog version. If it matches the `If-None-Match` header of the request,
+        the response has status 304 without body.
+        """
+        if after_id is not None and sort.endswith("year_of_release") and after_year_of_release is None:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="after_year_of_release is required when sorting by year of release.",
+            )
+
+        # Read one extra song to find out whether a next page exists.
+        result = await database_access.read_songs_page(
+            limit + 1,
+            after_id,
+            song_filter,
+            sort,
+            after_year_of_release,
+            get_catalog_versions_from_etags(request),
+            fields or SONG_FIELDS,
+        )
+        headers = get_etag_headers(result.catalog_version)
+        if result.value is None:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        songs = result.value
+        if include_total:
+            headers["X-Total-Count"] = str(await database_access.read_song_count(song_filter))
+
+        if len(songs) > limit:
+            songs = songs[:limit]
+            next_url = request.url.include_query_params(
+                after_id=songs[-1].id,
+                **({"after_year_of_release": songs[-1].year_of_release} if sort.endswith("year_of_release") else {}),
+            )
+            headers["Link"] = f'<{next_url}>; rel="next"'
+
+        return SongListResponse(songs, headers=headers, fields=fields)
+
+    @router.get("/songs/search", response_model=list[SongResponse])
+    async def search_songs(
+        request: Request,
+        q: Annotated[str, Query(min_length=1)],
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        offset: Annotated[int, Query(ge=0, le=MAX_SEARCH_OFFSET)] = 0,
+    ) -> SongListResponse:
+        """
+        Searches registered songs by the words in their title, composer and artist. The songs are ordered by
+        relevance. If more songs are available, the `Link` header contains the URL of the next page (`rel="next"`).
+        """
+
+        def search(session: Session) -> list[SongRow]:
+            # Read one extra song to find out whether a next page exists.
+            return [SongRow.from_song(song) for song in database_access.search_songs(session, q, limit + 1, offset)]
+
+        songs = await database_access.run_in_session(search, read_only=True)
+        headers = {}
+        if len(songs) > limit and offset + limit <= MAX_SEARCH_OFFSET:
+            next_url = request.url.include_query_params(offset=offset + limit)
+            headers["Link"] = f'<{next_url}>; rel="next"'
+
+        return SongListResponse(songs[:limit], headers=headers)
+
+    @router.get("/songs/export", response_class=StreamingResponse)
+    async def export_songs() -> StreamingResponse:
+        """
+        Exports all registered songs ordered by id as newline-delimited JSON (one `SongResponse` per line).
+        The songs are streamed from a server-side cursor, so the response starts immediately and memory usage does not
+        grow with the number of songs.
+        """
+
+        def to_lines(songs: Sequence[Song]) -> bytes:
+            return b"".join(to_json(song_to_dict(SongRow.from_song(song))) + b"\n" for song in songs)
+
+        def generate_lines() -> Iterator[bytes]:
+            with database_access.get_session(read_only=True) as session:
+                for songs in database_access.stream_songs(session):
+                    yield to_lines(songs)
+
+        async def generate_lines_async() -> AsyncIterator[bytes]:
+            async for songs in database_access.stream_songs_async():
+                yield to_lines(songs)
+
+        lines = generate_lines_async() if database_access.is_async else generate_lines()
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    @router.get("/songs/changes", response_model=SongChangesResponse)
+    async def get_song_changes(
+        request: Request,
+        since: str = "0",
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        timeout: Annotated[
+            float, Query(ge=0, le=MAX_CHANGE_STREAM_TIMEOUT_SECONDS)
+        ] = DEFAULT_CHANGE_STREAM_TIMEOUT_SECONDS,
+    ) -> SongChangesResponse | StreamingResponse:
+        """
+        Gets the songs that changed after the cursor `since`, ordered by the catalog version of their last change.
+        Pass `next_cursor` of the response as `since` of the next request; `since=0` returns all songs. A deleted song
+        is returned with `deleted` true and without song. If `has_more` is true, more changes can be read immediately.
+
+        If the request accepts `text/event-stream`, the response is a stream of Server-Sent Events. Each event has the
+        type `changes`, a page of changes as data and its `next_cursor` as id. The stream waits for new changes and
+        ends when no change occurred for `timeout` seconds. A client that reconnects with the `Last-Event-ID` header
+        continues where the stream ended.
+        """
+        try:
+            cursor = SongChangeCursor.parse(request.headers.get("Last-Event-ID", since))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+        async def read_changes(cursor: SongChangeCursor) -> SongChangePage:
+            return await database_access.run_in_session(
+                lambda session: database_access.get_song_changes(session, cursor, limit), read_only=True
+            )
+
+        if "text/event-stream" not in request.headers.get("Accept", ""):
+            return SongChangesResponse.from_page(await read_changes(cursor))
+
+        async def generate_events(cursor: SongChangeCursor) -> AsyncIterator[str]:
+            last_change = last_message = time.monotonic()
+            while True:
+                page = await read_changes(cursor)
+                cursor = page.next_cursor
+                if page.changes:
+                    data = SongChangesResponse.from_page(page).model_dump_json()
+                    yield f"id: {cursor}\nevent: changes\ndata: {data}\n\n"
+                    last_change = last_message = time.monotonic()
+                if page.has_more:
+                    continue
+
+                # Wait until the catalog version moves past the cursor.
+                while time.monotonic() - last_change < timeout:
+                    await asyncio.sleep(CHANGE_POLL_SECONDS)
+                    if await database_access.read_catalog_version() > cursor.catalog_version:
+                        break
+                    if time.monotonic() - last_message >= KEEP_ALIVE_SECONDS:
+                        yield ": keep-alive\n\n"
+                        last_message = time.monotonic()
+                else:
+                    return
+
+        # NGINX must pass the events on immediately instead of buffering them.
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        return StreamingResponse(generate_events(cursor), media_type="text/event-stream", headers=headers)
+
+    @router.get("/songs/stats/years")
+    async def get_song_counts_per_year() -> list[YearStatistics]:
+        """Gets the number of songs per year of release, ordered by year."""
+        counts = await database_access.run_in_session(database_access.get_song_counts_per_year, read_only=True)
+        return [YearStatistics(year_of_release=year, song_count=count) for year, count in counts]
+
+    @router.get("/songs/stats/composers")
+    async def get_song_counts_per_composer(
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    ) -> list[ComposerStatistics]:
+        """
+        Gets the composers with the most songs, ordered by their number of songs.
+        Songs without composer are not counted.
+        """
+        counts = await database_access.run_in_session(
+            lambda session: database_access.get_song_counts_per_composer(session, limit), read_only=True
+        )
+        return [ComposerStatistics(composer=composer, song_count=count) for composer, count in counts]
+
+    @router.get("/songs/stats/artists")
+    async def get_song_counts_per_artist(
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    ) -> list[ArtistStatistics]:
+        """
+        Gets the artists with the most songs, ordered by their number of songs.
+        Songs without artist are not counted.
+        """
+        counts = await database_access.run_in_session(
+            lambda session: database_access.get_song_counts_per_artist(session, limit), read_only=True
+        )
+        return [ArtistStatistics(artist=artist, song_count=count) for artist, count in counts]
+
+    @router.get("/songs/cache/statistics")
+    async def get_cache_statistics() -> CacheStatistics:
+        """Gets the hit and miss counters and the size of the in-memory song cache."""
+        return database_access.song_cache.get_statistics()
+
+    @router.get("/songs/{song_id}", response_model=SongResponse | PartialSongResponse)
+    async def get_registered_song(
+        request: Request,
+        response: Response,
+        song_id: int,
+        fields: Annotated[tuple[SongField, ...] | None, Depends(get_song_fields)],
+    ) -> SongResponse | Response:
+        """
+        Gets a registered song. If `fields` is specified, the song contains only these fields. The `ETag` header
+        contains the catalog version. If it matches the `If-None-Match` header of the request, the response has status
+        304 without body.
+        """
+        try:
+            result = await database_access.read_song(song_id, get_catalog_versions_from_etags(request))
+        except NoResultFound:
+            raise HTTPException(status_code=404, detail=f"No song with id {song_id} exists.")
+
+        headers = get_etag_headers(result.catalog_version)
+        if result.value is None:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if fields is not None:
+            content = to_json(partial_song_to_dict(result.value, fields))
+            return Response(content, media_type="application/json", headers=headers)
+        response.headers.update(headers)
+        return SongResponse.model_validate(result.value)
 
     @router.post("/songs/", status_code=status.HTTP_201_CREATED)
-    def register_song(song: SongRequest) -> SongResponse:
+    async def register_song(song: SongRequest) -> SongResponse:
         """Registers a song."""
-        with database_access.get_session() as session:
+
+        def create(session: Session) -> SongResponse:
             new_song = Song(
                 title=song.title,
                 composer=song.composer,
@@ -48,10 +389,69 @@ def build_router(database_access: DatabaseAccess) -> APIRouter:
             database_access.create_song(session, new_song)
             return SongResponse.model_validate(new_song)
 
+        return await database_access.run_write(create)
+
+    # The batch endpoints must be registered before the endpoints with a song id in the path.
+    @router.post("/songs/batch", status_code=status.HTTP_201_CREATED)
+    async def register_songs(
+        songs: Annotated[list[SongRequest], Body(max_length=MAX_BATCH_SIZE)],
+    ) -> list[BatchItemResult]:
+        """Registers multiple songs in a single transaction. The results are in the same order as the songs."""
+
+        def create(session: Session) -> list[BatchItemResult]:
+            new_songs = database_access.create_songs(session, [Song(**song.model_dump()) for song in songs])
+            return [
+                BatchItemResult(id=song.id, status=status.HTTP_201_CREATED, song=SongResponse.model_validate(song))
+                for song in new_songs
+            ]
+
+        return await database_access.run_in_session(create)
+
+    @router.put("/songs/batch")
+    async def update_songs(
+        songs: Annotated[list[SongBatchUpdateRequest], Body(max_length=MAX_BATCH_SIZE)],
+    ) -> list[BatchItemResult]:
+        """
+        Updates multiple registered songs in a single transaction. The results are in the same order as the songs.
+        Songs that do not exist get a result with status 404. The other songs are updated.
+        """
+
+        def update(session: Session) -> list[BatchItemResult]:
+            updated_ids = database_access.update_songs(session, [Song(**song.model_dump()) for song in songs])
+            return [
+                BatchItemResult(id=song.id, status=status.HTTP_200_OK, song=SongResponse.model_validate(song))
+                if song.id in updated_ids
+                else BatchItemResult.not_found(song.id)
+                for song in songs
+            ]
+
+        return await database_access.run_in_session(update)
+
+    @router.delete("/songs/batch")
+    async def delete_songs(
+        song_ids: Annotated[list[int], Body(max_length=MAX_BATCH_SIZE)],
+    ) -> list[BatchItemResult]:
+        """
+        Deletes multiple registered songs in a single transaction. The results are in the same order as the ids.
+        Songs that do not exist get a result with status 404. The other songs are deleted.
+        """
+
+        def delete(session: Session) -> list[BatchItemResult]:
+            deleted_ids = database_access.delete_songs(session, song_ids)
+            return [
+                BatchItemResult(id=song_id, status=status.HTTP_204_NO_CONTENT)
+                if song_id in deleted_ids
+                else BatchItemResult.not_found(song_id)
+                for song_id in song_ids
+            ]
+
+        return await database_access.run_in_session(delete)
+
     @router.put("/songs/{song_id}")
-    def update_song(song_id: int, song: SongRequest) -> SongResponse:
+    async def update_song(song_id: int, song: SongRequest) -> SongResponse:
         """Updates a registered song."""
-        with database_access.get_session() as session:
+
+        def update(session: Session) -> SongResponse:
             updated_song = Song(
                 id=song_id,
                 title=song.title,
@@ -66,15 +466,19 @@ def build_router(database_access: DatabaseAccess) -> APIRouter:
 
             return SongResponse.model_validate(updated_song)
 
+        return await database_access.run_write(update)
+
     @router.delete("/songs/{song_id}")
-    def delete_song(song_id: int) -> Response:
+    async def delete_song(song_id: int) -> Response:
         """Deletes a registered song."""
-        with database_access.get_session() as session:
+
+        def delete(session: Session) -> None:
             try:
                 database_access.delete_song(session, song_id)
             except ValueError as e:
                 raise HTTPException(status_code=404, detail=str(e))
 
+        await database_access.run_write(delete)
         return Response(status_code=status.HTTP_204_NO_CONTENT)
 
     return router
@@ -119,3 +523,189 @@ class SongResponse(SongRequest):
     """The id of the song."""
 
     model_config = {"from_attributes": True}
+
+
+class PartialSongResponse(BaseModel):
+    """
+    The model for a song with only the fields that the client selected with the query parameter `fields`, in the order
+    of the columns. The fields are the same as those of `SongResponse`; fields that were not selected are omitted.
+    """
+
+    id: int | None = None
+    title: str | None = None
+    composer: str | None = None
+    artist: str | None = None
+    year_of_release: int | None = None
+
+
+class SongBatchUpdateRequest(SongRequest):
+    """The model for a song in a batch update request. It contains the same fields as `Song` including the id."""
+
+    id: int
+    """The id of the song."""
+
+
+class BatchItemResult(BaseModel):
+    """The model for the result of a single song in the response of a batch endpoint."""
+
+    id: int
+    """The id of the song."""
+
+    status: int
+    """The HTTP status code for the song, as it would have been returned by the endpoint for a single song."""
+
+    song: SongResponse | None = None
+    """The song after it has been created or updated. This is None for deleted songs and for errors."""
+
+    detail: str | None = None
+    """A description of the error if the status indicates an error."""
+
+    @staticmethod
+    def not_found(song_id: int) -> BatchItemResult:
+        return BatchItemResult(
+            id=song_id, status=status.HTTP_404_NOT_FOUND, detail=f"No song with id {song_id} exists."
+        )
+
+
+class SongChangeResponse(BaseModel):
+    """The model for the last change of a song in the change feed."""
+
+    id: int
+    """The id of the song."""
+
+    catalog_version: int
+    """The catalog version of the last change of the song."""
+
+    deleted: bool
+    """Whether the song has been deleted."""
+
+    song: SongResponse | None = None
+    """The current song, or None if it has been deleted."""
+
+
+class SongChangesResponse(BaseModel):
+    """The model for a page of the change feed."""
+
+    changes: list[SongChangeResponse]
+
+    next_cursor: str
+    """The cursor to pass as `since` to read the changes after this page."""
+
+    has_more: bool
+    """Whether more changes can be read immediately with `next_cursor`."""
+
+    @staticmethod
+    def from_page(page: SongChangePage) -> SongChangesResponse:
+        return SongChangesResponse(
+            changes=[
+                SongChangeResponse(
+                    id=change.song_id,
+                    catalog_version=change.catalog_version,
+                    deleted=change.deleted,
+                    song=None if change.song is None else SongResponse.model_validate(change.song),
+                )
+                for change in page.changes
+            ],
+            next_cursor=str(page.next_cursor),
+            has_more=page.has_more,
+        )
+
+
+class YearStatistics(BaseModel):
+    """The model for the number of songs released in a year."""
+
+    year_of_release: int
+    song_count: int
+
+
+class ComposerStatistics(BaseModel):
+    """The model for the number of songs of a composer."""
+
+    composer: str
+    song_count: int
+
+
+class ArtistStatistics(BaseModel):
+    """The model for the number of songs of an artist."""
+
+    artist: str
+    song_count: int
+
+
+def get_etag_headers(catalog_version: int) -> dict[str, str]:
+    """
+    Gets the headers of a response with songs of the specified catalog version. The ETag is strong, because the catalog
+    version changes with every change of songs. `no-cache` makes clients revalidate their copy with `If-None-Match`.
+    """
+    return {"ETag": f'"{catalog_version}"', "Cache-Control": "no-cache"}
+
+
+def get_catalog_versions_from_etags(request: Request) -> set[int]:
+    """
+    Gets the catalog versions of the ETags in the `If-None-Match` header of the request. The set is empty if the header
+    is absent or does not contain an ETag of this API. The response is not modified if the current catalog version is
+    one of them.
+    """
+    etags = (etag.strip().removeprefix("W/").strip('"') for etag in request.headers.get("If-None-Match", "").split(","))
+    return {int(etag) for etag in etags if etag.isdecimal()}
+
+
+def get_song_fields(
+    fields: Annotated[
+        str | None, Query(description="A comma-separated list of the fields to return, for example `id,title`.")
+    ] = None,
+) -> tuple[SongField, ...] | None:
+    """
+    Gets the fields selected by the query parameter `fields` in the order of the columns, or None if the parameter is
+    absent.
+    :raises HTTPException: with status 422 if the parameter contains an unknown field.
+    """
+    if fields is None:
+        return None
+    selected = {field.strip() for field in fields.split(",")}
+    unknown = selected.difference(SONG_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Valid fields are: {', '.join(SONG_FIELDS)}.",
+        )
+    return tuple(field for field in SONG_FIELDS if field in selected)
+
+
+def song_to_dict(song: SongRow) -> dict[str, object]:
+    """Converts a song to a dictionary with the same keys, in the same order, as the JSON of a `SongResponse`."""
+    return {
+        "title": song.title,
+        "composer": song.composer,
+        "artist": song.artist,
+        "year_of_release": song.year_of_release,
+        "id": song.id,
+    }
+
+
+def partial_song_to_dict(song: PartialSongRow, fields: Sequence[SongField]) -> dict[str, object]:
+    """Converts a song to a dictionary with the specified fields, like the JSON of a `PartialSongResponse`."""
+    return {field: getattr(song, field) for field in fields}
+
+
+class SongListResponse(Response):
+    """
+    A JSON response with a list of songs, which has the same content as a response with a list of `SongResponse`, or
+    of `PartialSongResponse` if `fields` is specified. The songs are serialized by pydantic-core in a single pass
+    without creating and validating a response model for each song. This is safe, because the songs come straight
+    from the columns of the song table.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self, content: Iterable[PartialSongRow], fields: Sequence[SongField] | None = None, **kwargs: Any
+    ) -> None:
+        # The content is rendered by the constructor of Response.
+        self.fields = fields
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Iterable[PartialSongRow]) -> bytes:
+        if self.fields is not None:
+            return to_json([partial_song_to_dict(song, self.fields) for song in content])
+        return to_json([song_to_dict(song) for song in content])  # type: ignore[arg-type]
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import os
+import time
+import weakref
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+from prometheus_client.registry import Collector
+from sqlalchemy import Engine, event
+from sqlalchemy.pool import QueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+if TYPE_CHECKING:
+    from songs_api.admission import ConcurrencyLimiter
+
+DATABASE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""The buckets of the database histograms in seconds. Most statements take less than the smallest default bucket."""
+
+STATEMENT_TYPES = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE"})
+"""The statement types that are measured separately. Other statements are counted as "OTHER"."""
+
+UNMATCHED_ROUTE = "unmatched"
+"""The route label of requests that do not match any route, such as requests for unknown paths."""
+
+MULTIPROCESS_DIRECTORY_VARIABLE = "PROMETHEUS_MULTIPROC_DIR"
+"""
+The environment variable with the directory in which the worker processes write their metrics (see `Metrics`). It must
+be set before prometheus_client is imported by the workers.
+"""
+
+
+class EngineMetrics(NamedTuple):
+    """The metrics that record the statements and the connections of an engine, and the label of the engine."""
+
+    metrics: weakref.ref[Metrics]
+    """A weak reference, so that the metrics of an app that is gone can be collected while the engine is still used."""
+
+    name: str
+
+
+_engine_metrics: weakref.WeakKeyDictionary[Engine, EngineMetrics] = weakref.WeakKeyDictionary()
+"""
+The metrics of each instrumented engine. The listeners are added to an engine only once and record into the metrics
+that instrumented the engine last, so the statements are not counted twice if several apps are built for the same
+engine.
+"""
+
+
+def get_engine_metrics(engine: Engine) -> tuple[Metrics, str] | None:
+    """Gets the metrics that record the engine and its label, or None if these metrics have been collected."""
+    metrics_ref, name = _engine_metrics[engine]
+    metrics = metrics_ref()
+    return None if metrics is None else (metrics, name)
+
+
+def get_statement_type(statement: str) -> str:
+    """Gets the type of the SQL statement, which is its first keyword if it is in `STATEMENT_TYPES`."""
+    keyword = statement.lstrip()[:6].upper()  # All measured statement types have six letters.
+    return keyword if keyword in STATEMENT_TYPES else "OTHER"
+
+
+class Metrics:
+    """
+    This class holds the Prometheus metrics of the songs API: the latency, the number and the status codes of the HTTP
+    requests per route, the state of the admission control, and the duration of the database statements and the state
+    of the connection pools.
+    Each instance has its own registry, so that several apps can be built in one process.
+
+    If `MULTIPROCESS_DIRECTORY_VARIABLE` is set, as it is by `songs_api.serve`, several worker processes serve the API,
+    and a scrape reaches one of them. The request and database metrics of all workers are then written to files in
+    that directory and rendered together by each worker, so that the counters do not jump between the workers. The
+    state of the connection pools and of the admission control can only be collected in the worker that is scraped;
+    it is labelled with the process id of that worker as `worker`.
+    """
+
+    def __init__(self) -> None:
+        self.multiprocess = MULTIPROCESS_DIRECTORY_VARIABLE in os.environ
+        self.registry = CollectorRegistry()
+        self.requests = Counter(
+            "songs_api_http_requests",
+            "The number of HTTP requests by method, route and status code.",
+            ["method", "route", "status"],
+            registry=self.registry,
+        )
+        self.request_duration = Histogram(
+            "songs_api_http_request_duration_seconds",
+            "The duration of HTTP requests by method and route, until the response has been sent completely.",
+            ["method", "route"],
+            registry=self.registry,
+        )
+        self.requests_in_progress = Gauge(
+            "songs_api_http_requests_in_progress",
+            "The number of HTTP requests that are being handled by method.",
+            ["method"],
+            registry=self.registry,
+            # Only the requests of the workers that are running are summed.
+            multiprocess_mode="livesum",
+        )
+        self.query_duration = Histogram(
+            "songs_api_db_query_duration_seconds",
+            "The duration of database statements by engine and statement type.",
+            ["engine", "statement"],
+            buckets=DATABASE_BUCKETS,
+            registry=self.registry,
+        )
+        self.connection_wait = Histogram(
+            "songs_api_db_connection_wait_seconds",
+            "The time to get a connection from the pool by engine, including opening a new connection.",
+            ["engine"],
+            buckets=DATABASE_BUCKETS,
+            registry=self.registry,
+        )
+        worker_labels = {"worker": str(os.getpid())} if self.multiprocess else {}
+        self.pool_collector = PoolCollector(worker_labels)
+        self.registry.register(self.pool_collector)
+        self.admission_collector = AdmissionCollector(worker_labels)
+        self.registry.register(self.admission_collector)
+        if self.multiprocess:
+            # The metrics of this process are written to the directory, so they are rendered from there.
+            self.registry = CollectorRegistry()
+            MultiProcessCollector(self.registry)
+            self.registry.register(self.pool_collector)
+            self.registry.register(self.admission_collector)
+
+    def instrument_admission(self, limiters: dict[str, ConcurrencyLimiter]) -> None:
+        """Records the metrics of the admission control, with the key of each limiter as label `kind`."""
+        self.admission_collector.limiters.update(limiters)
+
+    def instrument_engine(self, engine: Engine, name: str) -> None:
+        """
+        Records the metrics of the statements and the connection pool of the engine with the label `engine=name`. If
+        the engine has been instrumented before, by these or other metrics, it is recorded by these metrics from now on.
+        """
+        self.pool_collector.engines[name] = engine
+        instrumented = engine in _engine_metrics
+        _engine_metrics[engine] = EngineMetrics(weakref.ref(self), name)
+        if instrumented:
+            return
+        self._time_connections(engine)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def start_timer(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+        # The timer is stopped before the other listeners run, such as the slow query log, which may run EXPLAIN.
+        @event.listens_for(engine, "after_cursor_execute", insert=True)
+        def stop_timer(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            duration = time.perf_counter() - conn.info["query_start_times"].pop()
+            engine_metrics = get_engine_metrics(engine)
+            if engine_metrics is not None:
+                metrics, name = engine_metrics
+                metrics.query_duration.labels(name, get_statement_type(statement)).observe(duration)
+
+        @event.listens_for(engine, "handle_error")
+        def discard_timer(context: Any) -> None:
+            start_times = context.connection.info.get("query_start_times") if context.connection else None
+            if start_times:
+                start_times.pop()
+
+        @event.listens_for(engine, "engine_disposed")
+        def time_new_pool(engine: Engine) -> None:
+            # Engine.dispose() replaces the pool.
+            self._time_connections(engine)
+
+    @staticmethod
+    def _time_connections(engine: Engine) -> None:
+        # The pool has no event before a checkout, so the time to get a connection is measured around Pool.connect().
+        pool = engine.pool
+        connect = pool.connect
+
+        def timed_connect() -> Any:
+            start = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                engine_metrics = get_engine_metrics(engine)
+                if engine_metrics is not None:
+                    metrics, name = engine_metrics
+                    metrics.connection_wait.labels(name).observe(time.perf_counter() - start)
+
+        pool.connect = timed_connect  # type: ignore[method-assign]
+
+    def render(self) -> tuple[bytes, str]:
+        """Gets the metrics in the Prometheus text format and their content type."""
+        return generate_latest(self.registry), CONTENT_TYPE_LATEST
+
+    def close(self) -> None:
+        """Is called when the app stops. The requests in progress of this process are no longer counted."""
+        if self.multiprocess:
+            mark_process_dead(os.getpid())
+
+
+class PoolCollector(Collector):
+    """
+    Collects the number of checked out and overflow connections of the connection pools when they are scraped.
+    :param worker_labels: the labels that identify the process, which are added to the metrics.
+    """
+
+    def __init__(self, worker_labels: dict[str, str]) -> None:
+        self.engines: dict[str, Engine] = {}
+        self.worker_labels = worker_labels
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        labels = ["engine", *self.worker_labels]
+        checked_out = GaugeMetricFamily(
+            "songs_api_db_pool_checked_out_connections",
+            "The number of connections that are checked out of the pool by engine.",
+            labels=labels,
+        )
+        overflow = GaugeMetricFamily(
+            "songs_api_db_pool_overflow_connections",
+            "The number of connections that are open in addition to the pool size by engine.",
+            labels=labels,
+        )
+        for name, engine in self.engines.items():
+            # In-memory SQLite databases use a pool without a size limit.
+            pool = engine.pool
+            if isinstance(pool, QueuePool):
+                label_values = [name, *self.worker_labels.values()]
+                checked_out.add_metric(label_values, pool.checkedout())
+                overflow.add_metric(label_values, max(pool.overflow(), 0))
+        yield checked_out
+        yield overflow
+
+
+class AdmissionCollector(Collector):
+    """
+    Collects the limits, the admitted, waiting and rejected requests of the admission control when scraped.
+    :param worker_labels: the labels that identify the process, which are added to the metrics.
+    """
+
+    def __init__(self, worker_labels: dict[str, str]) -> None:
+        self.limiters: dict[str, ConcurrencyLimiter] = {}
+        self.worker_labels = worker_labels
+
+    def collect(self) -> Iterator[Metric]:
+        labels = ["kind", *self.worker_labels]
+        limit = GaugeMetricFamily(
+            "songs_api_admission_limit",
+            "The maximum number of requests that are handled at the same time by kind (read, write or stream).",
+            labels=labels,
+        )
+        active = GaugeMetricFamily(
+            "songs_api_admission_active_requests",
+            "The number of admitted requests that are being handled by kind.",
+            labels=labels,
+        )
+        waiting = GaugeMetricFamily(
+            "songs_api_admission_waiting_requests",
+            "The number of requests that wait to be admitted by kind.",
+            labels=labels,
+        )
+        rejected = CounterMetricFamily(
+            "songs_api_admission_rejected_requests",
+            "The number of requests that were rejected with status 503 by kind.",
+            labels=labels,
+        )
+        for kind, limiter in self.limiters.items():
+            label_values = [kind, *self.worker_labels.values()]
+            limit.add_metric(label_values, limiter.limit)
+            active.add_metric(label_values, limiter.active)
+            waiting.add_metric(label_values, limiter.waiting)
+            rejected.add_metric(label_values, limiter.rejected)
+        yield limit
+        yield active
+        yield waiting
+        yield rejected
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records the metrics of the HTTP requests. Requests are labelled with the path template of the
+    route that handled them, such as `/songs/{song_id}`, so that the number of label values stays bounded. The route is
+    only known after routing, so the requests in progress are labelled with the method only.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: Metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = self.metrics.requests_in_progress.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the route that matched the request in the scope.
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            self.metrics.request_duration.labels(method, route).observe(time.perf_counter() - start)
+            self.metrics.requests.labels(method, route, str(status_code)).inc()
+            in_progress.dec()
@@ -0,0 +1,9 @@
+from songs_api.config import load_config
+from songs_api.database import DatabaseAccess
+
+if __name__ == "__main__":
+    config = load_config("config.yml")
+    database_access = DatabaseAccess(config)
+    with database_access.get_session() as session:
+        database_access.rebuild_song_statistics(session)
+    print("The song statistics have been rebuilt successfully.")
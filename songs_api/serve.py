@@ -0,0 +1,99 @@
+import argparse
+import os
+import tempfile
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI
+from uvicorn.supervisors import Multiprocess
+
+from songs_api.config import Config, ServerConfig, load_config
+from songs_api.database import DatabaseAccess
+from songs_api.endpoints import build_app
+from songs_api.metrics import MULTIPROCESS_DIRECTORY_VARIABLE
+
+
+def get_worker_count(server_config: ServerConfig) -> int:
+    """Gets the number of worker processes, which is the number of CPUs that this process may use by default."""
+    if server_config.workers > 0:
+        return server_config.workers
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def get_worker_config(config: Config) -> Config:
+    """
+    Gets the configuration of a worker process. If a database connection budget is configured, the pool of the worker
+    is reduced to its share of the budget (see `ServerConfig.database_connection_budget`).
+    :raises ValueError: if the budget is smaller than the number of workers plus one, or if the cache is configured
+    for a single process and there are several workers.
+    """
+    workers = get_worker_count(config.server)
+    if config.cache.single_process and workers > 1:
+        raise ValueError(f"cache.single_process cannot be used with {workers} workers, which all change songs.")
+
+    budget = config.server.database_connection_budget
+    if budget is None:
+        return config
+
+    share = budget // (workers + 1)
+    if share < 1:
+        raise ValueError(
+            f"The database connection budget {budget} is too small for {workers} workers. "
+            f"It must be at least {workers + 1}."
+        )
+
+    performance = config.database.performance
+    pool_size = min(performance.pool_size, share)
+    performance = performance.model_copy(
+        update={"pool_size": pool_size, "max_overflow": min(performance.max_overflow, share - pool_size)}
+    )
+    return config.model_copy(update={"database": config.database.model_copy(update={"performance": performance})})
+
+
+def prepare_metrics_directory() -> None:
+    """
+    Prepares the directory in which the workers write their metrics, so that each worker renders the metrics of all
+    workers (see `Metrics`). A directory configured with `PROMETHEUS_MULTIPROC_DIR` is emptied, because it may
+    contain the metrics of a previous run; otherwise, a temporary directory is created. The workers inherit the
+    environment variable.
+    """
+    directory = os.environ.get(MULTIPROCESS_DIRECTORY_VARIABLE)
+    if directory is None:
+        os.environ[MULTIPROCESS_DIRECTORY_VARIABLE] = tempfile.mkdtemp(prefix="songs_api_metrics_")
+        return
+    for metrics_file in Path(directory).glob("*.db"):
+        metrics_file.unlink()
+
+
+def create_app() -> FastAPI:
+    """Creates the app of a worker process. It is called by uvicorn in each worker."""
+    config = get_worker_config(load_config("config.yml"))
+    return build_app(DatabaseAccess(config), warm_up=config.server.warm_up)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serves the API with the worker processes configured in the section `server` of config.yml. "
+        "Send SIGHUP to replace the workers one at a time without downtime, for example after a deployment. "
+        "Each replacement only accepts requests after its startup, including the warm-up of its connection pool, has "
+        "finished. SIGTERM and SIGINT stop the server gracefully."
+    )
+    parser.parse_args()
+
+    config = load_config("config.yml")
+    # Fail before the workers are started if the budget does not suffice.
+    get_worker_config(config)
+    prepare_metrics_directory()
+    server = config.server
+    uvicorn_config = uvicorn.Config(
+        "songs_api.serve:create_app",
+        factory=True,
+        host=server.host,
+        port=server.port,
+        workers=get_worker_count(server),
+        timeout_graceful_shutdown=server.graceful_shutdown_seconds,
+    )
+    # The supervisor is also used for a single worker, so that it can be restarted without downtime as well.
+    Multiprocess(uvicorn_config, sockets=[uvicorn_config.bind_socket()]).run()
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Sequence
+from contextvars import ContextVar
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy import Engine, event
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from songs_api.config import SlowQueryLogConfig
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+"""The prefix that gets the query plan of a statement by database backend. Other backends have no plans."""
+
+EXPLAINED_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+"""The first keywords of the statements for which a query plan is captured."""
+
+EXPLAIN_SAVEPOINT_DIALECTS = {"postgresql"}
+"""The backends on which a failed statement aborts the transaction, so that the plan is captured in a savepoint."""
+
+EXPLAIN_SAVEPOINT = "slow_query_explain"
+"""The name of the savepoint in which the plan is captured."""
+
+_request_scope: ContextVar[Scope | None] = ContextVar("request_scope", default=None)
+
+
+class SlowQuery(BaseModel):
+    """A statement that was recorded by the `SlowQueryLog`."""
+
+    recorded_at: float
+    """The time at which the statement finished, in seconds since the epoch."""
+
+    duration_ms: float
+    """The duration of the statement in milliseconds, without fetching the rows."""
+
+    sampled: bool
+    """Whether the statement was recorded as sample, because it was faster than the threshold."""
+
+    database: str
+    """The database that executed the statement: "primary" or "replica-<index>"."""
+
+    route: str | None
+    """The method and the route of the request that executed the statement, or None outside of requests."""
+
+    statement: str
+
+    parameters: list[str] | dict[str, str]
+    """The types of the bound parameters. The values are not recorded, because they may contain personal data."""
+
+    executions: int
+    """The number of parameter sets if the statement was executed with `executemany()`, otherwise 1."""
+
+    plan: list[str] | None
+    """The lines of the query plan, or None if no plan was captured."""
+
+
+def get_parameter_shape(parameters: Any) -> list[str] | dict[str, str]:
+    """Gets the type names of the bound parameters of a single execution, by position or by name."""
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def get_route(scope: Scope | None) -> str | None:
+    """Gets the method and the route of the request, or its path if it has not been routed."""
+    if scope is None:
+        return None
+    # The router stores the route that matched the request in the scope.
+    path = getattr(scope.get("route"), "path", scope["path"])
+    return f"{scope['method']} {path}"
+
+
+class SlowQueryLog:
+    """
+    This class records the statements of SQLAlchemy engines that take at least `threshold_ms`, and a random sample of
+    the other statements, in a ring buffer of the `max_entries` most recent entries. Each entry has the shapes of the
+    bound parameters, the route of the request that executed the statement (see `SlowQueryMiddleware`) and the query
+    plan, which is captured on the connection of the statement right after it has been executed.
+
+    Slow statements are also logged as warnings, and sampled ones at level INFO.
+    """
+
+    def __init__(self, config: SlowQueryLogConfig) -> None:
+        self.config = config
+        self._entries: deque[SlowQuery] = deque(maxlen=config.max_entries)
+        # The statements of sync sessions are executed in threads of the threadpool.
+        self._lock = threading.Lock()
+
+    def get_entries(self) -> list[SlowQuery]:
+        """Gets the recorded statements, the most recent first."""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def instrument_engine(self, engine: Engine, database: str) -> None:
+        """Records the slow statements of the engine with the specified name of the database."""
+        if not self.config.enabled:
+            return
+        threshold = self.config.threshold_ms / 1000
+        sample_rate = self.config.sample_rate
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def start_timer(conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+            conn.info.setdefault("slow_query_start_times", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def stop_timer(
+            conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+        ) -> None:
+            duration = time.perf_counter() - conn.info["slow_query_start_times"].pop()
+            if duration >= threshold:
+                self._record(conn, database, statement, parameters, executemany, duration, sampled=False)
+            elif sample_rate > 0 and random.random() < sample_rate:
+                self._record(conn, database, statement, parameters, executemany, duration, sampled=True)
+
+        @event.listens_for(engine, "handle_error")
+        def discard_timer(context: Any) -> None:
+            start_times = context.connection.info.get("slow_query_start_times") if context.connection else None
+            if start_times:
+                start_times.pop()
+
+    def _record(
+        self,
+        conn: Any,
+        database: str,
+        statement: str,
+        parameters: Any,
+        executemany: bool,
+        duration: float,
+        sampled: bool,
+    ) -> None:
+        single_parameters = parameters[0] if executemany and parameters else parameters
+        entry = SlowQuery(
+            recorded_at=time.time(),
+            duration_ms=duration * 1000,
+            sampled=sampled,
+            database=database,
+            route=get_route(_request_scope.get()),
+            statement=statement,
+            parameters=get_parameter_shape(single_parameters),
+            executions=len(parameters) if executemany else 1,
+            plan=self._explain(conn, statement, single_parameters) if self.config.explain else None,
+        )
+        with self._lock:
+            self._entries.append(entry)
+        logger.log(
+            logging.INFO if sampled else logging.WARNING,
+            "%s statement (%.1f ms) on %s from %s: %s",
+            "Sampled" if sampled else "Slow",
+            entry.duration_ms,
+            database,
+            entry.route,
+            statement,
+        )
+
+    @staticmethod
+    def _explain(conn: Any, statement: str, parameters: Any) -> list[str] | None:
+        """
+        Gets the query plan of the statement on the connection that executed it, or None if the backend or the
+        statement has no plan. The plan is read with a DBAPI cursor of its own, so that the rows of the statement are
+        not affected and the events of the engine are not triggered again. Where a failed statement aborts the
+        transaction, EXPLAIN is run in a savepoint that is rolled back on failure, so the transaction of the statement
+        can go on.
+        """
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+            return None
+        # Outside of a transaction a failed statement has nothing to abort, and a savepoint cannot be created.
+        use_savepoint = (
+            conn.dialect.name in EXPLAIN_SAVEPOINT_DIALECTS
+            and conn.in_transaction()
+            and conn.get_execution_options().get("isolation_level") != "AUTOCOMMIT"
+        )
+        cursor = conn.connection.cursor()
+        try:
+            if use_savepoint:
+                cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            try:
+                cursor.execute(prefix + statement, parameters)
+                rows: Sequence[Sequence[Any]] = cursor.fetchall()
+            except Exception:
+                if use_savepoint:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+                raise
+            finally:
+                if use_savepoint:
+                    cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        except Exception as e:
+            # A missing plan must not fail the statement, which has been executed successfully.
+            logger.warning("Cannot explain statement %s: %s", statement, e)
+            return None
+        finally:
+            cursor.close()
+        # The rows of EXPLAIN QUERY PLAN are (id, parent, notused, detail); those of EXPLAIN have one column.
+        return [str(row[-1]) for row in rows]
+
+
+class SlowQueryMiddleware:
+    """ASGI middleware that makes the request known to the slow query log, which records its route with statements."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # The scope is stored instead of the route, because the router adds the route to the scope later.
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
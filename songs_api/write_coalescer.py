@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from sqlalchemy.orm import Session
+
+from songs_api.config import WriteCoalescingConfig
+
+T = TypeVar("T")
+
+
+class _Failure:
+    """The exception raised by a change. It is wrapped, so that a change can return an exception as its result."""
+
+    def __init__(self, exception: Exception) -> None:
+        self.exception = exception
+
+
+class _Batch:
+    """The changes that are applied together in one transaction."""
+
+    def __init__(self) -> None:
+        self.functions: list[Callable[[Session], Any]] = []
+        self.futures: list[asyncio.Future[Any]] = []
+        self.full = asyncio.Event()
+
+
+class WriteCoalescer:
+    """
+    This class applies changes that arrive concurrently in a single transaction (group commit), so that they share the
+    commit: one fsync on SQLite and one commit round trip on PostgreSQL instead of one per change.
+
+    A change is a function that is called with the session of the transaction, like the functions passed to
+    `DatabaseAccess.run_in_session()`. The first change of a batch starts a task that waits `window_ms` for more
+    changes, or less if the batch reaches `max_batch_size`. Batches are committed one at a time, so the changes that
+    arrive while a batch commits are collected in the next one.
+
+    Each change runs in its own SAVEPOINT. If a change raises an exception, only that change is rolled back and its
+    caller gets the exception; the other changes are committed. If the commit fails, all callers of the batch get the
+    exception.
+    """
+
+    def __init__(
+        self,
+        config: WriteCoalescingConfig,
+        run_in_session: Callable[[Callable[[Session], Any]], Awaitable[Any]],
+    ) -> None:
+        """
+        :param run_in_session: runs a function in a new session and commits it, like `DatabaseAccess.run_in_session()`.
+        """
+        self.config = config
+        self.run_in_session = run_in_session
+        self._batch: _Batch | None = None
+        self._lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def run(self, function: Callable[[Session], T]) -> T:
+        """Runs the function in the transaction of the next batch and returns its result after the commit."""
+        batch = self._batch
+        if batch is None:
+            batch = self._batch = _Batch()
+            # The batch is committed by its own task, so that it does not depend on the request that started it.
+            task = asyncio.create_task(self._commit(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        future: asyncio.Future[T] = asyncio.get_running_loop().create_future()
+        batch.functions.append(function)
+        batch.futures.append(future)
+        if len(batch.functions) >= self.config.max_batch_size:
+            self._batch = None
+            batch.full.set()
+        return await future
+
+    async def _commit(self, batch: _Batch) -> None:
+        try:
+            try:
+                await asyncio.wait_for(batch.full.wait(), self.config.window_ms / 1000)
+            except TimeoutError:
+                pass
+
+            # The batch keeps collecting changes until the previous batch has been committed.
+            async with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+                try:
+                    outcomes = await self.run_in_session(lambda session: self._apply(session, batch.functions))
+                except Exception as e:
+                    outcomes = [_Failure(e)] * len(batch.futures)
+
+            for future, outcome in zip(batch.futures, outcomes, strict=True):
+                # A future is done if its caller has been cancelled.
+                if not future.done():
+                    if isinstance(outcome, _Failure):
+                        future.set_exception(outcome.exception)
+                    else:
+                        future.set_result(outcome)
+        finally:
+            # The callers must not wait forever if this task is cancelled.
+            for future in batch.futures:
+                future.cancel()
+
+    def _apply(self, session: Session, functions: list[Callable[[Session], Any]]) -> list[Any]:
+        outcomes: list[Any] = []
+        for function in functions:
+            try:
+                with session.begin_nested():
+                    outcomes.append(function(session))
+            except Exception as e:
+                outcomes.append(_Failure(e))
+        return outcomes
+
+    async def wait_closed(self) -> None:
+        """Waits until the batches in progress have been committed."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
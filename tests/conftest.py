@@ -1,6 +1,8 @@
 import os
+import shutil
 from collections.abc import Iterator
-from uuid import uuid4
+from pathlib import Path
+from typing import Literal
 
 import pytest
 from starlette.testclient import TestClient
@@ -11,24 +13,58 @@ from songs_api.database import DatabaseAccess
 from songs_api.endpoints import build_app
 
 
+@pytest.fixture(scope="session")
+def migrated_database(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """
+    Gets the path of a SQLite database to which all migrations have been applied. It is created once per test session
+    (and once per worker with pytest-xdist) and serves as template: the tests copy it with `copy_database()` instead of
+    applying the migrations to a new database.
+    """
+    path = tmp_path_factory.mktemp("template") / "songs.db"
+    database_access = DatabaseAccess(Config(database=DatabaseConfig(url=f"sqlite:///{path}")))
+    apply_all_migrations(database_access)
+    # Closing the last connection checkpoints the write-ahead log into the database file and removes the log.
+    database_access.engine.dispose()
+    assert not Path(f"{path}-wal").exists()
+    return path
+
+
+def copy_database(migrated_database: Path, path: Path) -> str:
+    """Copies the migrated template database to the specified path and returns the URL of the copy."""
+    shutil.copyfile(migrated_database, path)
+    return f"sqlite:///{path}"
+
+
 @pytest.fixture
-def database_access() -> Iterator[DatabaseAccess]:
+def database_access(
+    request: pytest.FixtureRequest, migrated_database: Path, tmp_path: Path
+) -> Iterator[DatabaseAccess]:
     """
-    Gets a `DatabaseAccess` instance for which all migrations have been executed.
+    Gets a `DatabaseAccess` instance for a database of its own to which all migrations have been applied.
+    The database mode is "sync", unless the fixture is parametrized indirectly with another mode.
     :return: the `DatabaseAccess` instance.
     """
-    filename = f"{uuid4()}.db"
-    config = Config(database=DatabaseConfig(url=f"sqlite:///{filename}"))
+    path = tmp_path / "songs.db"
+    mode: Literal["sync", "async"] = request.param if hasattr(request, "param") else "sync"
+    config = Config(database=DatabaseConfig(url=copy_database(migrated_database, path), mode=mode))
     database_access = DatabaseAccess(config)
     try:
-        with database_access.get_session():
-            apply_all_migrations(database_access)
-
-            yield database_access
+        yield database_access
     finally:
-        os.remove(filename)
+        remove_database(database_access, path)
+
+
+def remove_database(database_access: DatabaseAccess, path: str | Path) -> None:
+    """Closes the connections of the `DatabaseAccess` instance and removes its SQLite database file."""
+    database_access.engine.dispose()
+    for file in (str(path), f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(file):
+            os.remove(file)
 
 
 @pytest.fixture
-def client(database_access: DatabaseAccess) -> TestClient:
-    return TestClient(build_app(database_access))
+def client(database_access: DatabaseAccess) -> Iterator[TestClient]:
+    # Use the client as context manager, so that all requests share one event loop, like they do in production.
+    # Connections of the async engine are bound to the event loop that created them.
+    with TestClient(build_app(database_access)) as client:
+        yield client
@@ -0,0 +1,133 @@
+import asyncio
+
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+from starlette.responses import PlainTextResponse
+from starlette.types import Receive, Scope, Send
+
+from songs_api.admission import AdmissionMiddleware, ConcurrencyLimiter, get_concurrency_limits
+from songs_api.config import (
+    AdmissionConfig,
+    Config,
+    DatabaseConfig,
+    DatabasePerformanceConfig,
+    WriteCoalescingConfig,
+)
+
+
+def test_limiter_admits_waiting_requests_in_order() -> None:
+    async def run() -> list[str]:
+        limiter = ConcurrencyLimiter(limit=1, max_waiting=2, max_wait_seconds=5)
+        admitted: list[str] = []
+
+        async def request(name: str) -> None:
+            assert await limiter.acquire()
+            admitted.append(name)
+            await asyncio.sleep(0.01)
+            limiter.release()
+
+        await asyncio.gather(*(request(name) for name in ["first", "second", "third"]))
+        assert (limiter.active, limiter.waiting, limiter.rejected) == (0, 0, 0)
+        return admitted
+
+    assert asyncio.run(run()) == ["first", "second", "third"]
+
+
+def test_limiter_rejects_requests_when_queue_is_full_or_wait_is_too_long() -> None:
+    async def run() -> None:
+        limiter = ConcurrencyLimiter(limit=1, max_waiting=1, max_wait_seconds=0.05)
+        assert await limiter.acquire()
+
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        # The queue is full, so the request is rejected without waiting.
+        assert not await asyncio.wait_for(limiter.acquire(), timeout=0.01)
+        # The waiting request is rejected after max_wait_seconds.
+        assert not await waiting
+        assert (limiter.active, limiter.waiting, limiter.rejected) == (1, 0, 2)
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiting_request_leaves_queue() -> None:
+    async def run() -> None:
+        limiter = ConcurrencyLimiter(limit=1, max_waiting=1, max_wait_seconds=5)
+        assert await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert limiter.waiting == 0
+
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(run())
+
+
+def test_concurrency_limits_are_sized_from_pools() -> None:
+    database_config = DatabaseConfig(
+        url="sqlite:///songs.db",
+        performance=DatabasePerformanceConfig(pool_size=4, max_overflow=2),
+        replica_urls=["sqlite:///replica.db"],
+    )
+    assert get_concurrency_limits(Config(database=database_config)) == (12, 6)
+
+    coalescing_config = database_config.model_copy(update={"write_coalescing": WriteCoalescingConfig(enabled=True)})
+    assert get_concurrency_limits(Config(database=coalescing_config)) == (12, 100)
+
+    admission_config = AdmissionConfig(max_concurrent_reads=3, max_concurrent_writes=2)
+    assert get_concurrency_limits(Config(database=database_config, admission=admission_config)) == (3, 2)
+
+
+def test_middleware_rejects_requests_beyond_limits() -> None:
+    release = asyncio.Event()
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await release.wait()
+        await PlainTextResponse("OK")(scope, receive, send)
+
+    reads = ConcurrencyLimiter(limit=1, max_waiting=0, max_wait_seconds=1)
+    writes = ConcurrencyLimiter(limit=1, max_waiting=0, max_wait_seconds=1)
+    streams = ConcurrencyLimiter(limit=1, max_waiting=0, max_wait_seconds=1)
+    middleware = AdmissionMiddleware(app, reads=reads, writes=writes, streams=streams, retry_after_seconds=2)
+
+    async def run() -> None:
+        async with AsyncClient(transport=ASGITransport(middleware), base_url="http://test") as client:
+            read = asyncio.create_task(client.get("/songs/"))
+            write = asyncio.create_task(client.post("/songs/"))
+            await asyncio.sleep(0.01)
+            assert (reads.active, writes.active) == (1, 1)
+
+            response = await client.get("/songs/1")
+            assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert response.headers["Retry-After"] == "2"
+            assert (await client.delete("/songs/1")).status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert (reads.rejected, writes.rejected) == (1, 1)
+
+            # Accepting text/event-stream does not bypass the limits of other requests.
+            event_stream = {"Accept": "text/event-stream"}
+            for method in ["GET", "POST"]:
+                response = await client.request(method, "/songs/", headers=event_stream)
+                assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert (reads.rejected, writes.rejected) == (2, 2)
+
+            # Streams of events have a limit of their own.
+            stream = asyncio.create_task(client.get("/songs/changes", headers=event_stream))
+            await asyncio.sleep(0.01)
+            assert streams.active == 1
+            response = await client.get("/songs/changes", headers=event_stream)
+            assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert streams.rejected == 1
+
+            # The metrics are not limited.
+            release.set()
+            assert (await client.get("/metrics")).status_code == status.HTTP_200_OK
+            assert (await stream).status_code == status.HTTP_200_OK
+
+            assert (await read).status_code == status.HTTP_200_OK
+            assert (await write).status_code == status.HTTP_200_OK
+            assert (reads.active, writes.active, streams.active) == (0, 0, 0)
+
+    asyncio.run(run())
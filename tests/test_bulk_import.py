@@ -0,0 +1,102 @@
+import json
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+
+from songs_api.bulk_import import bulk_import, get_file_format
+from songs_api.database import DatabaseAccess, Song
+
+CSV_HEADER = "title,composer,artist,year_of_release\n"
+
+
+def get_songs(database_access: DatabaseAccess) -> list[tuple[str, str, str | None, int]]:
+    with database_access.get_session() as session:
+        return [
+            (song.title, song.composer, song.artist, song.year_of_release)
+            for song in session.scalars(select(Song).order_by(Song.id))
+        ]
+
+
+def test_bulk_import_csv(database_access: DatabaseAccess, tmp_path: Path) -> None:
+    path = tmp_path / "songs.csv"
+    path.write_text(
+        CSV_HEADER + 'Song 1,Composer 1,Artist 1,2001\n"Song, 2",Composer 2,,2002\nSong 3,Composer 3,A,2003\n'
+    )
+
+    result = bulk_import(database_access, path, "csv", batch_size=2)
+
+    assert result == (3, 3, 0)
+    assert get_songs(database_access) == [
+        ("Song 1", "Composer 1", "Artist 1", 2001),
+        ("Song, 2", "Composer 2", None, 2002),
+        ("Song 3", "Composer 3", "A", 2003),
+    ]
+    with database_access.get_session() as session:
+        progress = database_access.get_bulk_import(session, "songs.csv")
+        assert progress is not None
+        assert (progress.rows_read, progress.rows_imported) == (3, 3)
+
+
+def test_bulk_import_jsonl_skips_invalid_rows(
+    database_access: DatabaseAccess, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    path = tmp_path / "songs.jsonl"
+    rows = [
+        {"title": "Song 1", "composer": "Composer 1", "artist": None, "year_of_release": 2001},
+        {"title": "Song 2", "composer": "Composer 2", "artist": "Artist 2", "year_of_release": "unknown"},
+        {"title": "Song 3", "composer": "Composer 3", "artist": "Artist 3", "year_of_release": 2003},
+    ]
+    lines = [json.dumps(rows[0]), json.dumps(rows[1]), "", "{not json", json.dumps(rows[2])]
+    path.write_text("\n".join(lines) + "\n\n")
+
+    result = bulk_import(database_access, path, "jsonl")
+
+    assert result == (4, 2, 2)
+    assert [song[0] for song in get_songs(database_access)] == ["Song 1", "Song 3"]
+    errors = capsys.readouterr().err
+    assert "Row 2 is invalid and has been skipped: year_of_release" in errors
+    assert "Row 3 on line 4 is malformed and has been skipped: Expecting property name" in errors
+
+    # The malformed row does not fail the import when it is run again.
+    assert bulk_import(database_access, path, "jsonl", restart=True) == (4, 2, 2)
+
+
+def test_bulk_import_resumes_after_imported_rows(database_access: DatabaseAccess, tmp_path: Path) -> None:
+    path = tmp_path / "songs.csv"
+    path.write_text(CSV_HEADER + "Song 1,Composer 1,,2001\nSong 2,Composer 2,,2002\n")
+    with database_access.get_session() as session:
+        # An earlier run that was interrupted after the first row.
+        database_access.bulk_insert_songs(
+            session, [{"title": "Song 1", "composer": "Composer 1", "artist": None, "year_of_release": 2001}]
+        )
+        database_access.save_bulk_import(session, "songs.csv", 1, 1)
+
+    assert bulk_import(database_access, path, "csv") == (2, 2, 0)
+    assert [song[0] for song in get_songs(database_access)] == ["Song 1", "Song 2"]
+
+    # The file has been imported completely, so running the import again does not import anything.
+    assert bulk_import(database_access, path, "csv") == (2, 2, 0)
+    assert len(get_songs(database_access)) == 2
+
+
+def test_bulk_import_restart(database_access: DatabaseAccess, tmp_path: Path) -> None:
+    path = tmp_path / "songs.csv"
+    path.write_text(CSV_HEADER + "Song 1,Composer 1,,2001\n")
+    bulk_import(database_access, path, "csv")
+
+    assert bulk_import(database_access, path, "csv", restart=True) == (1, 1, 0)
+    assert len(get_songs(database_access)) == 2
+
+
+@pytest.mark.parametrize(
+    "filename,file_format,expected_format",
+    [("songs.csv", None, "csv"), ("songs.JSONL", None, "jsonl"), ("songs.ndjson", None, "jsonl"), ("x", "csv", "csv")],
+)
+def test_get_file_format(filename: str, file_format: str | None, expected_format: str) -> None:
+    assert get_file_format(Path(filename), file_format) == expected_format  # type: ignore[arg-type]
+
+
+def test_get_file_format_unknown_extension() -> None:
+    with pytest.raises(ValueError):
+        get_file_format(Path("songs.txt"), None)
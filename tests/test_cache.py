@@ -0,0 +1,151 @@
+from songs_api.cache import SongCache
+from songs_api.config import CacheConfig
+from songs_api.database import SongRow
+
+song_1 = SongRow(1, "Take The Long Way Home", "Roger Hodgson", "Supertramp", 1979)
+song_2 = SongRow(2, "Breakfast In America", "Roger Hodgson", "Supertramp", 1979)
+song_3 = SongRow(3, "The Logical Song", "Roger Hodgson", "Supertramp", 1979)
+
+
+def test_get_song_that_was_put() -> None:
+    cache = SongCache(CacheConfig())
+
+    assert cache.get(1) is None
+    cache.put(song_1, cache.version)
+    assert cache.get(1) == song_1
+
+    statistics = cache.get_statistics()
+    assert (statistics.hits, statistics.misses, statistics.cached_songs) == (1, 1, 1)
+
+
+def test_put_is_ignored_if_version_changed() -> None:
+    cache = SongCache(CacheConfig())
+
+    version = cache.version
+    cache.invalidate([1])
+    cache.put(song_1, version)
+    cache.put_snapshot([song_1], version)
+    cache.put_count(1, version)
+
+    assert cache.get(1) is None
+    assert cache.get_page(10, None) is None
+    assert cache.get_count() is None
+
+
+def test_least_recently_used_song_is_evicted() -> None:
+    cache = SongCache(CacheConfig(max_songs=2))
+
+    cache.put(song_1, cache.version)
+    cache.put(song_2, cache.version)
+    cache.get(1)
+    cache.put(song_3, cache.version)
+
+    assert cache.get(1) == song_1
+    assert cache.get(2) is None
+    assert cache.get(3) == song_3
+
+
+def test_pages_and_songs_are_served_from_snapshot() -> None:
+    cache = SongCache(CacheConfig())
+
+    cache.put_snapshot([song_1, song_2, song_3], cache.version)
+
+    assert cache.get_page(2, None) == (song_1, song_2)
+    assert cache.get_page(2, 2) == (song_3,)
+    assert cache.get(2) == song_2
+    assert cache.get(4) is None
+    assert cache.get_count() == 3
+
+
+def test_snapshot_that_is_too_large_is_not_stored() -> None:
+    cache = SongCache(CacheConfig(max_snapshot_songs=2))
+
+    cache.put_snapshot([song_1, song_2, song_3], cache.version)
+
+    assert cache.get_page(10, None) is None
+
+
+def test_snapshot_too_large_is_forgotten_after_changes() -> None:
+    cache = SongCache(CacheConfig(max_snapshot_songs=2))
+
+    cache.put_snapshot_too_large(cache.version)
+    assert cache.is_snapshot_too_large()
+
+    version = cache.version
+    cache.invalidate([1])
+    assert not cache.is_snapshot_too_large()
+    cache.put_snapshot_too_large(version)
+    assert not cache.is_snapshot_too_large()
+
+
+def test_invalidate_removes_songs_and_snapshot() -> None:
+    cache = SongCache(CacheConfig())
+    cache.put(song_1, cache.version)
+    cache.put(song_2, cache.version)
+    cache.put_snapshot([song_1, song_2], cache.version)
+
+    cache.invalidate([1])
+
+    assert cache.get(1) is None
+    assert cache.get(2) == song_2
+    assert cache.get_page(10, None) is None
+
+
+def test_disabled_cache_stores_nothing() -> None:
+    cache = SongCache(CacheConfig(enabled=False))
+
+    cache.put(song_1, cache.version)
+    cache.put_snapshot([song_1], cache.version)
+
+    assert cache.get(1) is None
+    assert cache.get_page(10, None) is None
+
+
+def test_expired_songs_are_not_returned() -> None:
+    cache = SongCache(CacheConfig(ttl_seconds=0))
+
+    cache.put(song_1, cache.version)
+
+    assert cache.get(1) is None
+
+
+def test_newer_catalog_version_clears_cache() -> None:
+    cache = SongCache(CacheConfig())
+    version = cache.put_catalog_version(1)
+    assert version is not None
+    cache.put(song_1, version)
+    cache.put_snapshot([song_1], version)
+
+    assert cache.put_catalog_version(1) == version
+    assert cache.get(1) == song_1
+
+    assert cache.put_catalog_version(2) is not None
+    assert cache.get_catalog_version() == 2
+    assert cache.get(1) is None
+    assert cache.get_page(10, None) is None
+
+
+def test_older_catalog_version_does_not_use_cache() -> None:
+    cache = SongCache(CacheConfig())
+    cache.put_catalog_version(2)
+
+    assert cache.put_catalog_version(1) is None
+    assert cache.get_catalog_version() == 2
+
+
+def test_catalog_version_advances_after_own_change() -> None:
+    cache = SongCache(CacheConfig())
+    version = cache.put_catalog_version(1)
+    assert version is not None
+    cache.put(song_1, version)
+    cache.put(song_2, version)
+
+    cache.invalidate([1])
+    cache.advance_catalog_version(2)
+    assert cache.get_catalog_version() == 2
+    assert cache.get(1) is None
+    assert cache.get(2) == song_2
+
+    # Another process changed songs in between, so the cached songs may be outdated for version 4.
+    cache.advance_catalog_version(4)
+    assert cache.get_catalog_version() == 2
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from songs_api.database import Song
@@ -24,3 +25,27 @@ class TdbSong:
         session.add(song)
         session.flush()
         return song
+
+    @staticmethod
+    def create_many(session: Session, count: int, batch_size: int = 10_000) -> None:
+        """
+        Creates `count` songs with multi-row INSERT statements of at most `batch_size` songs. The songs have distinct
+        titles and varying composers, artists and years of release, so that filters and searches select subsets of
+        different sizes.
+        """
+        composers = ["Roger Hodgson", "Rick Davies", "Sander Kooijmans", "Lennon-McCartney", "Kate Bush"]
+        artists = ["Supertramp", None, "The Beatles", "Kate Bush"]
+        for start in range(0, count, batch_size):
+            session.execute(
+                insert(Song),
+                [
+                    {
+                        "title": f"Song {i}",
+                        "composer": composers[i % len(composers)],
+                        "artist": artists[i % len(artists)],
+                        "year_of_release": 1950 + i % 76,
+                    }
+                    for i in range(start, min(start + batch_size, count))
+                ],
+            )
+        session.flush()
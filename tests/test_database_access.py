@@ -1,16 +1,40 @@
-import os
-from collections.abc import Sequence
+import asyncio
+import csv
+import time
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any
 
 import pytest
 from _pytest.python_api import raises
+from sqlalchemy import delete, event, inspect, select, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
 
-from songs_api.config import Config, DatabaseConfig
-from songs_api.database import DatabaseAccess, Song
-from tests.conftest import apply_all_migrations
+from songs_api.config import CacheConfig, Config, DatabaseConfig
+from songs_api.database import (
+    MIGRATION_SESSION_SETTINGS,
+    DatabaseAccess,
+    Song,
+    SongChangeCursor,
+    SongCountPerArtist,
+    SongCountPerComposer,
+    SongCountPerYear,
+    SongFilter,
+    SongSort,
+    format_copy_row,
+    get_prefix_upper_bound,
+)
+from tests.conftest import apply_all_migrations, copy_database, remove_database
 from tests.test_data_builder import TdbSong
 
 create_table = "CREATE TABLE test (\n  id SERIAL PRIMARY KEY),  name VARCHAR(20) NOT NULL\n)"
 insert_statement = "INSERT INTO test (name) VALUES ('Piet Puk')"
+create_trigger = (
+    "-- Comment\nCREATE TRIGGER test_trigger AFTER INSERT ON test BEGIN\n  DELETE FROM test;\n  SELECT 1;\nEND"
+)
 
 
 @pytest.mark.parametrize(
@@ -19,6 +43,19 @@ insert_statement = "INSERT INTO test (name) VALUES ('Piet Puk')"
         ("", []),
         (f"{create_table};", [create_table]),
         (f"{create_table};\n{insert_statement};", [create_table, insert_statement]),
+        (f"{create_trigger};\n{insert_statement};", [create_trigger, insert_statement]),
+        (f"{create_table};\n{insert_statement}", [create_table, insert_statement]),
+        (f"{create_table};\n-- The end;\n", [create_table]),
+        (
+            f"CREATE TRIGGER t AFTER INSERT ON test FOR EACH ROW EXECUTE FUNCTION f();\n{insert_statement};",
+            ["CREATE TRIGGER t AFTER INSERT ON test FOR EACH ROW EXECUTE FUNCTION f()", insert_statement],
+        ),
+        ("INSERT INTO test (name) VALUES ('a;b', 'it''s');", ["INSERT INTO test (name) VALUES ('a;b', 'it''s')"]),
+        ('SELECT "a;b" /* ; */ FROM test;', ['SELECT "a;b" /* ; */ FROM test']),
+        (
+            "CREATE FUNCTION f() RETURNS void AS $body$ BEGIN NULL; END $body$ LANGUAGE plpgsql;",
+            ["CREATE FUNCTION f() RETURNS void AS $body$ BEGIN NULL; END $body$ LANGUAGE plpgsql"],
+        ),
     ],
 )
 def test_parse_sql_files(sql_statements: str, expected_statements: Sequence[str]) -> None:
@@ -26,9 +63,24 @@ def test_parse_sql_files(sql_statements: str, expected_statements: Sequence[str]
     assert actual_statements == expected_statements
 
 
-def test_apply_migrations() -> None:
+@pytest.mark.parametrize(
+    "filename,backend,expected_result",
+    [
+        ("0001_initial.sql", "sqlite", True),
+        ("0001_initial.sql", "postgresql", True),
+        ("0003_song_search.sqlite.sql", "sqlite", True),
+        ("0003_song_search.sqlite.sql", "postgresql", False),
+        ("0003_song_search.postgresql.sql", "postgresql", True),
+    ],
+)
+def test_is_migration_for_backend(filename: str, backend: str, expected_result: bool) -> None:
+    assert DatabaseAccess.is_migration_for_backend(Path(filename), backend) == expected_result
+
+
+def test_apply_migrations(tmp_path: Path) -> None:
+    path = tmp_path / "test_apply_migrations.db"
     try:
-        config = Config(database=DatabaseConfig(url="sqlite:///test_apply_migrations.db"))
+        config = Config(database=DatabaseConfig(url=f"sqlite:///{path}"))
         database_access = DatabaseAccess(config)
 
         apply_all_migrations(database_access)
@@ -38,7 +90,112 @@ def test_apply_migrations() -> None:
                 database_access.get_all_songs(session) == []
             )  # Without migrations, get_all_songs() raises an exception.
     finally:
-        os.remove("test_apply_migrations.db")
+        remove_database(database_access, path)
+
+
+@pytest.fixture
+def migration_database_access(tmp_path: Path) -> Iterator[DatabaseAccess]:
+    database_access = DatabaseAccess(Config(database=DatabaseConfig(url=f"sqlite:///{tmp_path / 'migrations.db'}")))
+    (tmp_path / "migrations").mkdir()
+    yield database_access
+    database_access.engine.dispose()
+
+
+def get_table_names(database_access: DatabaseAccess) -> set[str]:
+    with database_access.engine.connect() as conn:
+        return set(inspect(conn).get_table_names())
+
+
+def test_apply_migrations_only_applies_pending_migrations(
+    migration_database_access: DatabaseAccess, tmp_path: Path
+) -> None:
+    migrations_directory = tmp_path / "migrations"
+    (migrations_directory / "0001_a.sql").write_text("CREATE TABLE a (id INTEGER);")
+    assert migration_database_access.apply_migrations(migrations_directory) == ["0001_a.sql"]
+
+    (migrations_directory / "0002_b.sql").write_text("CREATE TABLE b (id INTEGER);")
+    (migrations_directory / "0002_b.postgresql.sql").write_text("CREATE TABLE c (id INTEGER);")
+    assert migration_database_access.apply_migrations(migrations_directory) == ["0002_b.sql"]
+    assert migration_database_access.apply_migrations(migrations_directory) == []
+    assert get_table_names(migration_database_access) == {"a", "b", "schema_migrations"}
+
+
+def test_migrations_are_applied_without_timeouts_of_requests(
+    migration_database_access: DatabaseAccess, tmp_path: Path
+) -> None:
+    statements: list[str] = []
+    event.listen(migration_database_access.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    (tmp_path / "migrations" / "0001_a.sql").write_text("CREATE TABLE a (id INTEGER);")
+    migration_database_access.apply_migrations(tmp_path / "migrations")
+
+    assert statements[0] == "PRAGMA busy_timeout = 600000"
+    assert statements.index("PRAGMA busy_timeout = 600000") < statements.index("BEGIN IMMEDIATE")
+    # The connection of the migrations is not reused, so other connections keep the configured timeout.
+    with migration_database_access.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+
+def test_apply_migrations_with_advisory_lock(
+    migration_database_access: DatabaseAccess, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # The code path of PostgreSQL is run on SQLite, with functions that stand in for the advisory lock.
+    engine = migration_database_access.engine
+    locks: list[str] = []
+
+    @event.listens_for(engine, "connect")
+    def create_lock_functions(dbapi_connection: Any, connection_record: Any) -> None:
+        dbapi_connection.create_function("pg_advisory_lock", 1, lambda key: locks.append("lock"))
+        dbapi_connection.create_function("pg_advisory_unlock", 1, lambda key: locks.append("unlock"))
+
+    monkeypatch.setattr(engine.dialect, "name", "postgresql")
+    monkeypatch.setitem(MIGRATION_SESSION_SETTINGS, "postgresql", [])
+    migrations_directory = tmp_path / "migrations"
+    (migrations_directory / "0001_a.sql").write_text("CREATE TABLE a (id INTEGER);")
+    (migrations_directory / "0002_b.sql").write_text("CREATE TABLE b (id INTEGER);")
+
+    assert migration_database_access.apply_migrations(migrations_directory) == ["0001_a.sql", "0002_b.sql"]
+    assert locks == ["lock", "unlock"]
+    assert migration_database_access.apply_migrations(migrations_directory) == []
+    assert get_table_names(migration_database_access) == {"a", "b", "schema_migrations"}
+
+
+def test_apply_migrations_when_applied_migration_changed(
+    migration_database_access: DatabaseAccess, tmp_path: Path
+) -> None:
+    migrations_directory = tmp_path / "migrations"
+    (migrations_directory / "0001_a.sql").write_text("CREATE TABLE a (id INTEGER);")
+    migration_database_access.apply_migrations(migrations_directory)
+
+    (migrations_directory / "0001_a.sql").write_text("CREATE TABLE a (id INTEGER, name TEXT);")
+    with raises(ValueError, match="0001_a.sql has been changed"):
+        migration_database_access.apply_migrations(migrations_directory)
+
+
+def test_failed_migration_is_rolled_back(migration_database_access: DatabaseAccess, tmp_path: Path) -> None:
+    migrations_directory = tmp_path / "migrations"
+    (migrations_directory / "0001_a.sql").write_text("CREATE TABLE a (id INTEGER);")
+    (migrations_directory / "0002_b.sql").write_text("CREATE TABLE b (id INTEGER);\nCREATE TABLE a (id INTEGER);")
+    with raises(OperationalError):
+        migration_database_access.apply_migrations(migrations_directory)
+
+    # The first migration was committed. The DDL of the second migration was rolled back.
+    assert get_table_names(migration_database_access) == {"a", "schema_migrations"}
+    (migrations_directory / "0002_b.sql").write_text("CREATE TABLE b (id INTEGER);")
+    assert migration_database_access.apply_migrations(migrations_directory) == ["0002_b.sql"]
+
+
+def test_apply_migrations_with_baseline(migration_database_access: DatabaseAccess, tmp_path: Path) -> None:
+    migrations_directory = tmp_path / "migrations"
+    (migrations_directory / "0001_a.sql").write_text("CREATE TABLE a (id INTEGER);")
+    (migrations_directory / "0002_b.sql").write_text("CREATE TABLE b (id INTEGER);")
+    with raises(ValueError, match="0003_c.sql is not one of the migrations"):
+        migration_database_access.apply_migrations(migrations_directory, baseline="0003_c.sql")
+
+    applied_migrations = migration_database_access.apply_migrations(migrations_directory, baseline="0001_a.sql")
+    assert applied_migrations == ["0001_a.sql", "0002_b.sql"]
+    # Only the migrations after the baseline were executed.
+    assert get_table_names(migration_database_access) == {"b", "schema_migrations"}
+    assert migration_database_access.apply_migrations(migrations_directory) == []
 
 
 def test_create_song(database_access: DatabaseAccess) -> None:
@@ -103,3 +260,389 @@ def test_delete_non_existing_song(database_access: DatabaseAccess) -> None:
             database_access.delete_song(session, 123)
 
     assert str(exc_info.value) == "No song with id 123 exists."
+
+
+def test_get_songs_page(database_access: DatabaseAccess) -> None:
+    with database_access.get_session() as session:
+        songs = [TdbSong.create(session, title=f"Song {i + 1}") for i in range(3)]
+
+        assert database_access.get_songs_page(session, limit=2) == songs[:2]
+        assert database_access.get_songs_page(session, limit=2, after_id=songs[1].id) == songs[2:]
+        assert database_access.get_songs_page(session, limit=2, after_id=songs[2].id) == []
+
+
+def test_songs_page_does_not_count_songs(migrated_database: Path, tmp_path: Path) -> None:
+    url = copy_database(migrated_database, tmp_path / "songs.db")
+    database_access = DatabaseAccess(Config(database=DatabaseConfig(url=url), cache=CacheConfig(max_snapshot_songs=2)))
+    statements: list[str] = []
+    event.listen(database_access.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    try:
+        with database_access.get_session() as session:
+            song_ids = [TdbSong.create(session, title=f"Song {i + 1}").id for i in range(2)]
+
+        # The songs fit in the snapshot, which is loaded with the first page.
+        page = asyncio.run(database_access.read_songs_page(limit=1)).value
+        assert page is not None and [song.id for song in page] == song_ids[:1]
+        assert database_access.song_cache.get_statistics().snapshot_songs == 2
+
+        with database_access.get_session() as session:
+            song_ids.append(TdbSong.create(session, title="Song 3").id)
+            database_access.song_cache.invalidate(song_ids[-1:])
+        for _ in range(2):
+            page = asyncio.run(database_access.read_songs_page(limit=1, after_id=song_ids[1])).value
+            assert page is not None and [song.id for song in page] == song_ids[2:]
+        assert database_access.song_cache.get_statistics().snapshot_songs is None
+        # The number of songs is checked once after the change, with a query that reads at most 3 ids.
+        probes = [statement for statement in statements if statement.startswith("SELECT song.id \nFROM song ORDER BY")]
+        assert len(probes) == 2, statements
+        assert not any("count(" in statement.lower() for statement in statements), statements
+    finally:
+        remove_database(database_access, tmp_path / "songs.db")
+
+
+def test_count_songs_is_invalidated_by_create_and_delete(database_access: DatabaseAccess) -> None:
+    with database_access.get_session() as session:
+        assert database_access.count_songs(session) == 0
+
+        song = database_access.create_song(
+            session, Song(title="Song 1", composer="Roger Hodgson", artist="Supertramp", year_of_release=1979)
+        )
+        assert database_access.count_songs(session) == 1
+
+        database_access.delete_song(session, song.id)
+        assert database_access.count_songs(session) == 0
+
+
+def test_catalog_version_is_incremented_once_per_transaction(database_access: DatabaseAccess) -> None:
+    with database_access.get_session() as session:
+        catalog_version = database_access.get_catalog_version(session)
+
+    with database_access.get_session() as session:
+        songs = [
+            database_access.create_song(
+                session, Song(title=f"Song {i}", composer="Roger Hodgson", artist=None, year_of_release=1979)
+            )
+            for i in range(2)
+        ]
+        database_access.delete_song(session, songs[0].id)
+        song_id = songs[1].id
+
+    with database_access.get_session() as session:
+        assert database_access.get_catalog_version(session) == catalog_version + 1
+
+    with database_access.get_session() as session:
+        database_access.delete_song(session, song_id)
+        session.rollback()
+        assert database_access.get_catalog_version(session) == catalog_version + 1
+
+
+def test_catalog_version_increment_is_rolled_back_with_savepoint(database_access: DatabaseAccess) -> None:
+    with database_access.get_session() as session:
+        catalog_version = database_access.get_catalog_version(session)
+
+    with database_access.get_session() as session:
+        with raises(ValueError):
+            with session.begin_nested():
+                database_access.create_song(
+                    session, Song(title="Song 1", composer="Roger Hodgson", artist=None, year_of_release=1979)
+                )
+                raise ValueError("Rolled back")
+        database_access.create_song(
+            session, Song(title="Song 2", composer="Roger Hodgson", artist=None, year_of_release=1979)
+        )
+
+    with database_access.get_session() as session:
+        assert session.scalars(select(Song.title)).all() == ["Song 2"]
+        assert database_access.get_catalog_version(session) == catalog_version + 1
+        changes = database_access.get_song_changes(session, SongChangeCursor(catalog_version), limit=10).changes
+        assert [change.catalog_version for change in changes] == [catalog_version + 1]
+
+
+def test_catalog_version_is_incremented_at_commit(database_access: DatabaseAccess) -> None:
+    with database_access.get_session() as session:
+        catalog_version = database_access.get_catalog_version(session)
+
+    statements: list[str] = []
+    event.listen(database_access.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    with database_access.get_session() as session:
+        database_access.create_song(
+            session, Song(title="Song 1", composer="Roger Hodgson", artist=None, year_of_release=1979)
+        )
+        # The catalog version is not locked until the transaction commits.
+        assert not any("catalog_version" in statement for statement in statements), statements
+
+    # A failed change of a song that does not exist does not change the catalog version.
+    statements.clear()
+    with raises(ValueError):
+        with database_access.get_session() as session:
+            database_access.delete_song(session, 123)
+    assert not any("catalog_version" in statement for statement in statements), statements
+
+    with database_access.get_session() as session:
+        assert database_access.get_catalog_version(session) == catalog_version + 1
+        changes = database_access.get_song_changes(session, SongChangeCursor(0), limit=10).changes
+        assert [change.catalog_version for change in changes] == [catalog_version + 1]
+
+
+def test_song_changes_are_read_in_pages(database_access: DatabaseAccess) -> None:
+    with database_access.get_session() as session:
+        start = SongChangeCursor(database_access.get_catalog_version(session))
+    with database_access.get_session() as session:
+        song_ids = [
+            database_access.create_song(
+                session, Song(title=f"Song {i}", composer="Roger Hodgson", artist=None, year_of_release=1979)
+            ).id
+            for i in range(3)
+        ]
+    with database_access.get_session() as session:
+        database_access.delete_song(session, song_ids[0])
+
+    with database_access.get_session() as session:
+        page = database_access.get_song_changes(session, start, limit=2)
+        assert [(change.song_id, change.deleted) for change in page.changes] == [
+            (song_ids[1], False),
+            (song_ids[2], False),
+        ]
+        assert page.changes[0].song is not None and page.changes[0].song.title == "Song 1"
+        assert page.has_more
+
+        page = database_access.get_song_changes(session, page.next_cursor, limit=2)
+        assert [(change.song_id, change.deleted, change.song) for change in page.changes] == [(song_ids[0], True, None)]
+        assert page.changes[0].catalog_version == start.catalog_version + 2
+        assert not page.has_more
+        assert page.next_cursor == SongChangeCursor(start.catalog_version + 2)
+
+        page = database_access.get_song_changes(session, page.next_cursor, limit=2)
+        assert page.changes == []
+        assert page.next_cursor == SongChangeCursor(start.catalog_version + 2)
+
+
+@pytest.mark.parametrize("cursor", ["", "-1", "1:", "1:a", "1:2:3", "1234567890123456789"])
+def test_parse_invalid_song_change_cursor(cursor: str) -> None:
+    with raises(ValueError):
+        SongChangeCursor.parse(cursor)
+
+
+def test_stream_songs(database_access: DatabaseAccess) -> None:
+    with database_access.get_session() as session:
+        songs = [TdbSong.create(session, title=f"Song {i + 1}") for i in range(5)]
+
+        assert list(database_access.stream_songs(session, batch_size=2)) == [songs[0:2], songs[2:4], songs[4:5]]
+
+
+@pytest.mark.parametrize(
+    "url,expected_async_url",
+    [
+        ("sqlite:///database.db", "sqlite+aiosqlite:///database.db"),
+        ("postgresql://songs:secret@db:5432/songs", "postgresql+asyncpg://songs:***@db:5432/songs"),
+        ("postgresql+psycopg2://songs:secret@db:5432/songs", "postgresql+asyncpg://songs:***@db:5432/songs"),
+    ],
+)
+def test_async_url(url: str, expected_async_url: str) -> None:
+    assert str(DatabaseAccess.async_url(url)) == expected_async_url
+
+
+@pytest.mark.parametrize(
+    "prefix,expected_upper_bound",
+    [
+        ("The", "Thf"),
+        ("a\U0010ffff", "b"),
+        ("\U0010ffff\U0010ffff", None),
+        ("\ud7ff", "\ue000"),
+    ],
+)
+def test_get_prefix_upper_bound(prefix: str, expected_upper_bound: str | None) -> None:
+    assert get_prefix_upper_bound(prefix) == expected_upper_bound
+
+
+def test_format_copy_row() -> None:
+    line = format_copy_row(["\\N", None, 'Say "hello", world', "", 2001])
+
+    assert line == '"\\N",,"Say ""hello"", world","","2001"\n'
+    assert next(csv.reader([line])) == ["\\N", "", 'Say "hello", world', "", "2001"]
+
+
+def test_song_filter_compares_byte_wise_on_postgresql() -> None:
+    query = select(Song.id).where(*SongFilter(title="The Logical Song", artist_prefix="Super").get_conditions())
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert '(song.title COLLATE "C") =' in sql
+    assert '(song.artist COLLATE "C") >=' in sql
+    assert '(song.artist COLLATE "C") <' in sql
+
+
+@pytest.mark.parametrize(
+    "song_filter,sort,expected_index",
+    [
+        (SongFilter(title="Song 1"), "id", "ix_song_title_id"),
+        (SongFilter(composer_prefix="Roger"), "id", "ix_song_composer_id"),
+        (SongFilter(artist="Supertramp"), "id", "ix_song_artist_id"),
+        (SongFilter(year_of_release_from=1980), "-year_of_release", "ix_song_year_of_release_id"),
+    ],
+)
+def test_filtered_songs_are_read_with_index(
+    database_access: DatabaseAccess, song_filter: SongFilter, sort: SongSort, expected_index: str
+) -> None:
+    statements = []
+    event.listen(database_access.engine, "before_cursor_execute", lambda *args: statements.append(args[2:4]))
+
+    with database_access.get_session() as session:
+        database_access.get_songs_page(session, 10, song_filter=song_filter, sort=sort)
+        statement, parameters = statements[-1]
+        plan = " ".join(
+            row[-1] for row in session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        )
+
+    assert expected_index in plan
+
+
+def test_search_songs(database_access: DatabaseAccess) -> None:
+    with database_access.get_session() as session:
+        song_1 = TdbSong.create(session, title="Take The Long Way Home")
+        song_2 = TdbSong.create(session, title="Cannonball", composer="Rick Davies")
+        song_3 = TdbSong.create(session, title="The Logical Song")
+
+        assert database_access.search_songs(session, "home", 10) == [song_1]
+        assert database_access.search_songs(session, "rick", 10) == [song_2]
+        assert database_access.search_songs(session, "supertramp log", 10) == [song_3]
+        all_songs = database_access.search_songs(session, "supertramp", 10)
+        assert sorted(song.id for song in all_songs) == [song_1.id, song_2.id, song_3.id]
+        assert database_access.search_songs(session, "supertramp", 2, offset=1) == all_songs[1:]
+        assert database_access.search_songs(session, "'*\"", 10) == []
+
+        song_1.title = "Breakfast In America"
+        database_access.update_song(session, song_1)
+        database_access.delete_song(session, song_2.id)
+
+        assert database_access.search_songs(session, "home", 10) == []
+        assert database_access.search_songs(session, "america", 10) == [song_1]
+        assert database_access.search_songs(session, "rick", 10) == []
+
+
+def test_sqlite_pragmas_are_applied(database_access: DatabaseAccess) -> None:
+    with database_access.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+
+@pytest.mark.parametrize("database_access", ["sync", "async"], indirect=True)
+def test_warm_up_fills_pool(database_access: DatabaseAccess) -> None:
+    engine = database_access.async_engine.sync_engine if database_access.async_engine else database_access.engine
+
+    async def warm_up() -> tuple[int, int]:
+        await database_access.dispose()
+        await database_access.warm_up()
+        pool = engine.pool
+        assert isinstance(pool, QueuePool)
+        open_connections = pool.checkedin()
+        # Async connections must be closed in the event loop that opened them.
+        await database_access.dispose()
+        return open_connections, pool.size()
+
+    open_connections, pool_size = asyncio.run(warm_up())
+    assert open_connections == pool_size
+
+
+def test_engine_options() -> None:
+    file_options = DatabaseAccess.engine_options(DatabaseConfig(url="sqlite:///database.db"))
+    assert file_options["echo"] is False
+    assert file_options["pool_size"] == 5
+    assert file_options["pool_pre_ping"] is True
+
+    # In-memory SQLite databases do not use a queue pool, so the pool options do not apply.
+    assert DatabaseAccess.engine_options(DatabaseConfig(url="sqlite://")) == {"echo": False}
+
+
+def create_replicated_database_access(
+    migrated_database: Path, tmp_path: Path, replica_url: str, read_your_writes_seconds: float = 0.0
+) -> DatabaseAccess:
+    """
+    Creates a `DatabaseAccess` instance with a primary database and a replica. The replica does not receive the changes
+    of the primary database, so the tests can see which database is read.
+    """
+    database_access = DatabaseAccess(
+        Config(
+            database=DatabaseConfig(
+                url=copy_database(migrated_database, tmp_path / "primary.db"),
+                replica_urls=[replica_url],
+                read_your_writes_seconds=read_your_writes_seconds,
+            )
+        )
+    )
+    with database_access.get_session() as session:
+        TdbSong.create(session, title="Primary Song")
+    return database_access
+
+
+@pytest.fixture
+def replicated_database_access(migrated_database: Path, tmp_path: Path) -> Iterator[DatabaseAccess]:
+    replica_url = copy_database(migrated_database, tmp_path / "replica.db")
+    replica_access = DatabaseAccess(Config(database=DatabaseConfig(url=replica_url)))
+    with replica_access.get_session() as session:
+        TdbSong.create(session, title="Replica Song")
+    replica_access.engine.dispose()
+
+    database_access = create_replicated_database_access(
+        migrated_database, tmp_path, replica_url, read_your_writes_seconds=60
+    )
+    yield database_access
+    database_access.engine.dispose()
+    database_access.replicas[0].engine.dispose()
+
+
+def get_titles(session: Session) -> list[str]:
+    return list(session.scalars(select(Song.title).order_by(Song.id)))
+
+
+def test_read_only_sessions_use_replica(replicated_database_access: DatabaseAccess) -> None:
+    with replicated_database_access.get_session(read_only=True) as session:
+        assert get_titles(session) == ["Replica Song"]
+    with replicated_database_access.get_session() as session:
+        assert get_titles(session) == ["Primary Song"]
+
+
+def test_read_only_session_refuses_changes(replicated_database_access: DatabaseAccess) -> None:
+    with raises(RuntimeError), replicated_database_access.get_session(read_only=True) as session:
+        replicated_database_access.create_song(session, Song(title="New Song", year_of_release=2025))
+    with raises(RuntimeError), replicated_database_access.get_session(read_only=True) as session:
+        replicated_database_access.delete_song(session, 1)
+
+
+def test_reads_use_primary_during_read_your_writes_window(replicated_database_access: DatabaseAccess) -> None:
+    with replicated_database_access.get_session() as session:
+        replicated_database_access.create_song(session, Song(title="New Song", year_of_release=2025))
+
+    with replicated_database_access.get_session(read_only=True) as session:
+        assert get_titles(session) == ["Primary Song", "New Song"]
+
+
+def test_unreachable_replica_is_skipped(migrated_database: Path, tmp_path: Path) -> None:
+    missing_replica_url = f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"
+    database_access = create_replicated_database_access(migrated_database, tmp_path, missing_replica_url)
+    try:
+        with database_access.get_session(read_only=True) as session:
+            assert get_titles(session) == ["Primary Song"]
+        assert database_access.replicas[0].unhealthy_until > time.monotonic()
+    finally:
+        database_access.engine.dispose()
+
+
+def test_rebuild_song_statistics(database_access: DatabaseAccess) -> None:
+    with database_access.get_session() as session:
+        TdbSong.create_many(session, 100)
+        session.execute(delete(SongCountPerYear).where(SongCountPerYear.year_of_release == 1950))
+        session.execute(update(SongCountPerComposer).values(song_count=0))
+        session.execute(delete(SongCountPerArtist))
+
+    with database_access.get_session() as session:
+        database_access.rebuild_song_statistics(session)
+
+    with database_access.get_session() as session:
+        assert database_access.get_song_counts_per_year(session)[:2] == [(1950, 2), (1951, 2)]
+        assert database_access.get_song_counts_per_composer(session, 2) == [("Kate Bush", 20), ("Lennon-McCartney", 20)]
+        assert database_access.get_song_counts_per_artist(session, 10) == [
+            ("Kate Bush", 25),
+            ("Supertramp", 25),
+            ("The Beatles", 25),
+        ]
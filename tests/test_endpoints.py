@@ -1,9 +1,18 @@
+import json
+
+import pytest
 from fastapi import status
+from sqlalchemy import event
 from starlette.testclient import TestClient
 
+from songs_api.config import CacheConfig
 from songs_api.database import DatabaseAccess
+from songs_api.endpoints import build_app
 from tests.test_data_builder import TdbSong
 
+# All endpoint tests are executed in both database modes.
+pytestmark = pytest.mark.parametrize("database_access", ["sync", "async"], indirect=True)
+
 
 def test_get_songs_when_no_songs_present(client: TestClient) -> None:
     response = client.get("/songs")
@@ -156,3 +165,491 @@ def test_deleting_non_existing_song(database_access: DatabaseAccess, client: Tes
     response = client.delete("/songs/123")
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json() == {"detail": "No song with id 123 exists."}
+
+
+def test_get_songs_in_pages(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        for i in range(5):
+            TdbSong.create(session, title=f"Song {i + 1}")
+
+    response = client.get("/songs", params={"limit": 2, "include_total": True})
+    assert response.status_code == status.HTTP_200_OK
+    assert [song["title"] for song in response.json()] == ["Song 1", "Song 2"]
+    assert response.headers["X-Total-Count"] == "5"
+    assert response.links["next"]["url"] == "http://testserver/songs/?limit=2&include_total=true&after_id=2"
+
+    response = client.get("/songs", params={"limit": 2, "after_id": 2})
+    assert [song["title"] for song in response.json()] == ["Song 3", "Song 4"]
+    assert "X-Total-Count" not in response.headers
+
+    response = client.get("/songs", params={"limit": 2, "after_id": 4})
+    assert [song["title"] for song in response.json()] == ["Song 5"]
+    assert "Link" not in response.headers
+
+
+def test_get_songs_with_invalid_limit(client: TestClient) -> None:
+    response = client.get("/songs", params={"limit": 0})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_export_songs(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        TdbSong.create(session, title="Take The Long Way Home")
+        TdbSong.create(session, title="Breakfast In America")
+
+    response = client.get("/songs/export")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {
+            "artist": "Supertramp",
+            "composer": "Roger Hodgson",
+            "id": 1,
+            "title": "Take The Long Way Home",
+            "year_of_release": 1979,
+        },
+        {
+            "artist": "Supertramp",
+            "composer": "Roger Hodgson",
+            "id": 2,
+            "title": "Breakfast In America",
+            "year_of_release": 1979,
+        },
+    ]
+
+
+def test_export_songs_when_no_songs_present(client: TestClient) -> None:
+    response = client.get("/songs/export")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.text == ""
+
+
+def test_registering_songs_in_batch(database_access: DatabaseAccess, client: TestClient) -> None:
+    response = client.post(
+        "/songs/batch",
+        json=[
+            {"title": "Song 1", "composer": "Sander Kooijmans", "artist": None, "year_of_release": 2024},
+            {"title": "Song 2", "composer": "Sander Kooijmans", "artist": "Sander Kooijmans", "year_of_release": 2025},
+        ],
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json() == [
+        {
+            "id": 1,
+            "status": 201,
+            "song": {
+                "id": 1,
+                "title": "Song 1",
+                "composer": "Sander Kooijmans",
+                "artist": None,
+                "year_of_release": 2024,
+            },
+            "detail": None,
+        },
+        {
+            "id": 2,
+            "status": 201,
+            "song": {
+                "id": 2,
+                "title": "Song 2",
+                "composer": "Sander Kooijmans",
+                "artist": "Sander Kooijmans",
+                "year_of_release": 2025,
+            },
+            "detail": None,
+        },
+    ]
+
+    with database_access.get_session() as session:
+        assert [song.title for song in database_access.get_all_songs(session)] == ["Song 1", "Song 2"]
+
+
+def test_updating_songs_in_batch(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        song_id = TdbSong.create(session, title="Song 1").id
+
+    response = client.put(
+        "/songs/batch",
+        json=[
+            {"id": song_id, "title": "Song 2", "composer": "Roger Hodgson", "artist": None, "year_of_release": 1979},
+            {"id": 123, "title": "Song 3", "composer": "Roger Hodgson", "artist": None, "year_of_release": 1979},
+        ],
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [
+        {
+            "id": song_id,
+            "status": 200,
+            "song": {
+                "id": song_id,
+                "title": "Song 2",
+                "composer": "Roger Hodgson",
+                "artist": None,
+                "year_of_release": 1979,
+            },
+            "detail": None,
+        },
+        {"id": 123, "status": 404, "song": None, "detail": "No song with id 123 exists."},
+    ]
+
+    with database_access.get_session() as session:
+        assert [song.title for song in database_access.get_all_songs(session)] == ["Song 2"]
+
+
+def test_deleting_songs_in_batch(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        song_ids = [TdbSong.create(session, title=f"Song {i + 1}").id for i in range(3)]
+
+    response = client.request("DELETE", "/songs/batch", json=[song_ids[0], 123, song_ids[2]])
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [
+        {"id": song_ids[0], "status": 204, "song": None, "detail": None},
+        {"id": 123, "status": 404, "song": None, "detail": "No song with id 123 exists."},
+        {"id": song_ids[2], "status": 204, "song": None, "detail": None},
+    ]
+
+    with database_access.get_session() as session:
+        assert [song.id for song in database_access.get_all_songs(session)] == [song_ids[1]]
+
+
+def test_get_existing_song(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        song_id = TdbSong.create(session, title="Song 1").id
+
+    for _ in range(2):
+        response = client.get(f"/songs/{song_id}")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "artist": "Supertramp",
+            "composer": "Roger Hodgson",
+            "id": song_id,
+            "title": "Song 1",
+            "year_of_release": 1979,
+        }
+
+    response = client.get("/songs/cache/statistics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["hits"] == 1
+    assert response.json()["misses"] == 1
+
+
+def test_get_non_existing_song(client: TestClient) -> None:
+    response = client.get("/songs/123")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json() == {"detail": "No song with id 123 exists."}
+
+
+def test_cached_songs_are_invalidated_by_changes(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        song_id = TdbSong.create(session, title="Song 1").id
+
+    assert client.get(f"/songs/{song_id}").json()["title"] == "Song 1"
+    assert [song["title"] for song in client.get("/songs").json()] == ["Song 1"]
+
+    client.put(
+        f"/songs/{song_id}",
+        json={"title": "Song 2", "composer": "Roger Hodgson", "artist": "Supertramp", "year_of_release": 1979},
+    )
+    assert client.get(f"/songs/{song_id}").json()["title"] == "Song 2"
+    assert [song["title"] for song in client.get("/songs").json()] == ["Song 2"]
+
+    client.delete(f"/songs/{song_id}")
+    assert client.get(f"/songs/{song_id}").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get("/songs").json() == []
+
+
+def test_conditional_get_of_songs(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        song_id = TdbSong.create(session, title="Song 1").id
+    paths = ["/songs/", "/songs/?title=Song%201", f"/songs/{song_id}"]
+    etags = {path: client.get(path).headers["ETag"] for path in paths}
+
+    engine = database_access.async_engine.sync_engine if database_access.async_engine else database_access.engine
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    for path in paths:
+        response = client.get(path, headers={"If-None-Match": etags[path]})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["ETag"] == etags[path]
+    assert not any("FROM song" in statement for statement in statements), statements
+
+    client.put(
+        f"/songs/{song_id}",
+        json={"title": "Song 1", "composer": "Roger Hodgson", "artist": None, "year_of_release": 1979},
+    )
+    for path in paths:
+        response = client.get(path, headers={"If-None-Match": etags[path]})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["ETag"] != etags[path]
+        assert "Supertramp" not in response.text
+
+
+def test_changes_of_other_processes_are_seen_immediately(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        song_id = TdbSong.create(session, title="Song 1").id
+    other_database_access = DatabaseAccess(database_access.config)
+    with TestClient(build_app(other_database_access)) as other_client:
+        paths = ["/songs/", f"/songs/{song_id}"]
+        etags = {path: client.get(path).headers["ETag"] for path in paths}
+
+        response = other_client.put(
+            f"/songs/{song_id}",
+            json={"title": "Song 2", "composer": "Roger Hodgson", "artist": None, "year_of_release": 1979},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        for path in paths:
+            response = client.get(path, headers={"If-None-Match": etags[path]})
+            assert response.status_code == status.HTTP_200_OK
+            assert "Song 2" in response.text
+
+
+def test_cached_catalog_version_is_trusted_in_single_process(database_access: DatabaseAccess) -> None:
+    config = database_access.config.model_copy(update={"cache": CacheConfig(single_process=True)})
+    database_access = DatabaseAccess(config)
+    with TestClient(build_app(database_access)) as client:
+        etag = client.get("/songs/").headers["ETag"]
+
+        engine = database_access.async_engine.sync_engine if database_access.async_engine else database_access.engine
+        statements: list[str] = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        assert client.get("/songs/", headers={"If-None-Match": etag}).status_code == status.HTTP_304_NOT_MODIFIED
+        assert statements == []
+
+
+def test_conditional_get_with_several_etags(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        song_id = TdbSong.create(session, title="Song 1").id
+    catalog_version = int(client.get("/songs/").headers["ETag"].strip('"'))
+
+    # The songs are not modified if any of the ETags matches, even if another one is newer.
+    etags = f'"{catalog_version}", W/"{catalog_version + 5}", "other"'
+    for path in ["/songs/", f"/songs/{song_id}"]:
+        assert client.get(path, headers={"If-None-Match": etags}).status_code == status.HTTP_304_NOT_MODIFIED
+    etags = f'"{catalog_version - 1}", "{catalog_version + 1}"'
+    assert client.get("/songs/", headers={"If-None-Match": etags}).status_code == status.HTTP_200_OK
+
+
+def test_conditional_get_of_missing_song(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        TdbSong.create(session, title="Song 1")
+    etag = client.get("/songs/").headers["ETag"]
+
+    response = client.get("/songs/999", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_get_song_changes(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        song_ids = [TdbSong.create(session, title=f"Song {i + 1}").id for i in range(3)]
+
+    response = client.get("/songs/changes", params={"limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert [change["song"]["title"] for change in response.json()["changes"]] == ["Song 1", "Song 2"]
+    assert response.json()["has_more"]
+
+    response = client.get("/songs/changes", params={"since": response.json()["next_cursor"], "limit": 2})
+    assert [change["id"] for change in response.json()["changes"]] == [song_ids[2]]
+    assert not response.json()["has_more"]
+    cursor = response.json()["next_cursor"]
+
+    client.delete(f"/songs/{song_ids[0]}")
+    response = client.get("/songs/changes", params={"since": cursor})
+    assert [(change["id"], change["deleted"], change["song"]) for change in response.json()["changes"]] == [
+        (song_ids[0], True, None)
+    ]
+    assert client.get("/songs/changes", params={"since": response.json()["next_cursor"]}).json()["changes"] == []
+
+
+def test_get_song_changes_with_invalid_cursor(client: TestClient) -> None:
+    assert client.get("/songs/changes", params={"since": "a"}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_stream_song_changes(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        song_ids = [TdbSong.create(session, title=f"Song {i + 1}").id for i in range(3)]
+
+    response = client.get("/songs/changes", params={"limit": 2, "timeout": 0}, headers={"Accept": "text/event-stream"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"].startswith("text/event-stream")
+    events = [dict(line.split(": ", 1) for line in event.splitlines()) for event in response.text.split("\n\n")[:-1]]
+    assert [event["event"] for event in events] == ["changes", "changes"]
+    assert [change["id"] for event in events for change in json.loads(event["data"])["changes"]] == song_ids
+
+    client.delete(f"/songs/{song_ids[0]}")
+    headers = {"Accept": "text/event-stream", "Last-Event-ID": events[-1]["id"]}
+    response = client.get("/songs/changes", params={"timeout": 0}, headers=headers)
+    assert [change["id"] for change in json.loads(response.text.split("data: ")[1])["changes"]] == [song_ids[0]]
+
+
+def test_get_songs_with_filter(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        TdbSong.create(session, title="Take The Long Way Home", year_of_release=1979)
+        TdbSong.create(session, title="Breakfast In America", year_of_release=1979)
+        TdbSong.create(session, title="The Logical Song", year_of_release=1979)
+        TdbSong.create(session, title="It's Raining Again", year_of_release=1982)
+        TdbSong.create(session, title="Cannonball", composer="Rick Davies", year_of_release=1985)
+
+    def get_titles(**params: object) -> list[str]:
+        response = client.get("/songs", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        return [song["title"] for song in response.json()]
+
+    assert get_titles(title="The Logical Song") == ["The Logical Song"]
+    assert get_titles(title_prefix="T") == ["Take The Long Way Home", "The Logical Song"]
+    assert get_titles(title_prefix="Th") == ["The Logical Song"]
+    assert get_titles(title_prefix="th") == []
+    assert get_titles(title_prefix="\U0010ffff") == []
+    assert get_titles(composer="Rick Davies") == ["Cannonball"]
+    assert get_titles(composer_prefix="Roger", title_prefix="B") == ["Breakfast In America"]
+    assert get_titles(artist="Supertramp", year_of_release_from=1980) == ["It's Raining Again", "Cannonball"]
+    assert get_titles(year_of_release_from=1980, year_of_release_to=1984) == ["It's Raining Again"]
+
+    response = client.get("/songs", params={"year_of_release_from": 1980, "include_total": True})
+    assert response.headers["X-Total-Count"] == "2"
+
+
+def test_get_songs_with_fields(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        song_ids = [TdbSong.create(session, title=f"Song {i + 1}", year_of_release=1979 + i).id for i in range(3)]
+
+    engine = database_access.async_engine.sync_engine if database_access.async_engine else database_access.engine
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    response = client.get("/songs/", params={"fields": "title,id", "year_of_release_from": 1980, "limit": 1})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [{"id": song_ids[1], "title": "Song 2"}]
+    assert "after_id" in response.headers["Link"]
+    song_queries = [statement for statement in statements if "FROM song" in statement]
+    assert song_queries and not any("composer" in statement for statement in song_queries), song_queries
+
+    response = client.get("/songs/", params={"fields": "year_of_release", "sort": "-year_of_release", "limit": 1})
+    assert response.json() == [{"year_of_release": 1981}]
+    assert f"after_id={song_ids[2]}" in response.headers["Link"]
+
+    assert client.get("/songs/", params={"fields": "title"}).json() == [{"title": f"Song {i + 1}"} for i in range(3)]
+    response = client.get(f"/songs/{song_ids[0]}", params={"fields": "artist, title"})
+    assert response.json() == {"title": "Song 1", "artist": "Supertramp"}
+    assert "ETag" in response.headers
+
+
+def test_get_songs_with_unknown_fields(client: TestClient) -> None:
+    response = client.get("/songs/", params={"fields": "id,lyrics"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert "lyrics" in response.json()["detail"]
+    assert client.get("/songs/1", params={"fields": ""}).status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_get_songs_sorted_by_year_of_release_in_pages(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        TdbSong.create(session, title="Song 1", year_of_release=1985)
+        TdbSong.create(session, title="Song 2", year_of_release=1979)
+        TdbSong.create(session, title="Song 3", year_of_release=1982)
+        TdbSong.create(session, title="Song 4", year_of_release=1979)
+
+    titles = []
+    url = "/songs?sort=-year_of_release&limit=3"
+    while url:
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        titles += [song["title"] for song in response.json()]
+        url = response.links.get("next", {}).get("url")
+
+    assert titles == ["Song 1", "Song 3", "Song 4", "Song 2"]
+
+
+def test_get_songs_sorted_by_year_of_release_without_year_in_cursor(client: TestClient) -> None:
+    response = client.get("/songs", params={"sort": "year_of_release", "after_id": 1})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_search_songs(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        TdbSong.create(session, title="Song Of The Year")
+        TdbSong.create(session, title="The Logical Song")
+        TdbSong.create(session, title="Song")
+
+    response = client.get("/songs/search", params={"q": "song", "limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    # Shorter titles have a higher relevance.
+    assert [song["title"] for song in response.json()] == ["Song", "The Logical Song"]
+
+    response = client.get(response.links["next"]["url"])
+    assert [song["title"] for song in response.json()] == ["Song Of The Year"]
+    assert "Link" not in response.headers
+
+
+def test_search_songs_without_search_text(client: TestClient) -> None:
+    response = client.get("/songs/search", params={"q": ""})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.parametrize(
+    "method,path,body",
+    [
+        ("PUT", "/songs/1", {"title": "Song 2", "composer": "Roger Hodgson", "artist": None, "year_of_release": 1979}),
+        (
+            "PUT",
+            "/songs/123",
+            {"title": "Song 2", "composer": "Roger Hodgson", "artist": None, "year_of_release": 1979},
+        ),
+        ("DELETE", "/songs/1", None),
+        ("DELETE", "/songs/123", None),
+    ],
+)
+def test_update_and_delete_execute_single_statement(
+    database_access: DatabaseAccess, client: TestClient, method: str, path: str, body: dict[str, object] | None
+) -> None:
+    with database_access.get_session() as session:
+        TdbSong.create(session, title="Song 1")
+
+    engine = database_access.async_engine.sync_engine if database_access.async_engine else database_access.engine
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    response = client.request(method, path, json=body)
+    assert response.status_code in (status.HTTP_200_OK, status.HTTP_204_NO_CONTENT, status.HTTP_404_NOT_FOUND)
+    expected_statements = ["UPDATE song " if method == "PUT" else "DELETE FROM song "]
+    if response.status_code != status.HTTP_404_NOT_FOUND:
+        # The commit of a change increments the catalog version and assigns it to the recorded change.
+        expected_statements += ["UPDATE catalog_version ", "UPDATE song_change "]
+    assert len(statements) == len(expected_statements), statements
+    assert all(map(str.startswith, statements, expected_statements)), statements
+
+
+def test_song_statistics_follow_changes(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        TdbSong.create(session, title="The Logical Song", artist="Supertramp", year_of_release=1979)
+        TdbSong.create(session, title="Goodbye Stranger", composer="Rick Davies", year_of_release=1979)
+        song_id = TdbSong.create(session, title="Dreamer", artist=None, year_of_release=1974).id
+
+    client.put(
+        f"/songs/{song_id}",
+        json={"title": "Dreamer", "composer": "Rick Davies", "artist": "Supertramp", "year_of_release": 1975},
+    )
+    client.post(
+        "/songs/batch",
+        json=[{"title": "Hide In Your Shell", "composer": "Roger Hodgson", "artist": None, "year_of_release": 1974}],
+    )
+
+    assert client.get("/songs/stats/years").json() == [
+        {"year_of_release": 1974, "song_count": 1},
+        {"year_of_release": 1975, "song_count": 1},
+        {"year_of_release": 1979, "song_count": 2},
+    ]
+    assert client.get("/songs/stats/composers").json() == [
+        {"composer": "Rick Davies", "song_count": 2},
+        {"composer": "Roger Hodgson", "song_count": 2},
+    ]
+    assert client.get("/songs/stats/artists", params={"limit": 1}).json() == [{"artist": "Supertramp", "song_count": 3}]
+
+    client.delete(f"/songs/{song_id}")
+    assert client.get("/songs/stats/years").json() == [
+        {"year_of_release": 1974, "song_count": 1},
+        {"year_of_release": 1979, "song_count": 2},
+    ]
+    assert client.get("/songs/stats/composers").json() == [
+        {"composer": "Roger Hodgson", "song_count": 2},
+        {"composer": "Rick Davies", "song_count": 1},
+    ]
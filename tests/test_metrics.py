@@ -0,0 +1,113 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import status
+from starlette.testclient import TestClient
+
+from songs_api.database import DatabaseAccess
+from songs_api.endpoints import build_app
+from songs_api.metrics import MULTIPROCESS_DIRECTORY_VARIABLE, get_statement_type
+from tests.test_data_builder import TdbSong
+
+# The tests of the endpoint are executed in both database modes.
+both_modes = pytest.mark.parametrize("database_access", ["sync", "async"], indirect=True)
+
+
+def get_metric(client: TestClient, line_prefix: str) -> float:
+    response = client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    for line in response.text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"No metric {line_prefix} in:\n{response.text}")
+
+
+@both_modes
+def test_metrics_of_requests_are_labelled_with_route(database_access: DatabaseAccess, client: TestClient) -> None:
+    with database_access.get_session() as session:
+        song_id = TdbSong.create(session).id
+
+    assert client.get(f"/songs/{song_id}").status_code == status.HTTP_200_OK
+    assert client.get("/songs/12345").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get("/unknown").status_code == status.HTTP_404_NOT_FOUND
+
+    route = 'method="GET",route="/songs/{song_id}"'
+    assert get_metric(client, f'songs_api_http_requests_total{{{route},status="200"}}') == 1
+    assert get_metric(client, f'songs_api_http_requests_total{{{route},status="404"}}') == 1
+    assert get_metric(client, f"songs_api_http_request_duration_seconds_count{{{route}}}") == 2
+    assert get_metric(client, 'songs_api_http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    # The scrape itself is in progress.
+    assert get_metric(client, 'songs_api_http_requests_in_progress{method="GET"}') == 1
+
+
+@both_modes
+def test_metrics_of_database(database_access: DatabaseAccess, client: TestClient) -> None:
+    engine = "async" if database_access.async_engine else "sync"
+    client.post("/songs", json={"title": "Song", "composer": "Composer", "artist": None, "year_of_release": 2000})
+    client.get("/songs/")
+
+    assert get_metric(client, f'songs_api_db_query_duration_seconds_count{{engine="{engine}",statement="SELECT"}}') >= 1
+    assert get_metric(client, f'songs_api_db_query_duration_seconds_count{{engine="{engine}",statement="INSERT"}}') == 1
+    assert get_metric(client, f'songs_api_db_connection_wait_seconds_count{{engine="{engine}"}}') >= 1
+    assert get_metric(client, f'songs_api_db_pool_checked_out_connections{{engine="{engine}"}}') == 0
+    assert get_metric(client, f'songs_api_db_pool_overflow_connections{{engine="{engine}"}}') == 0
+
+
+def test_engine_is_instrumented_once_by_several_apps(database_access: DatabaseAccess) -> None:
+    engine = database_access.engine
+    build_app(database_access)
+    listeners = len(engine.dispatch.before_cursor_execute), len(engine.dispatch.after_cursor_execute)
+    connect = engine.pool.connect
+
+    with TestClient(build_app(database_access)) as client:
+        assert (len(engine.dispatch.before_cursor_execute), len(engine.dispatch.after_cursor_execute)) == listeners
+        assert engine.pool.connect == connect
+        # The engine is recorded by the metrics of the app that was built last.
+        client.get("/songs/")
+        assert get_metric(client, 'songs_api_db_query_duration_seconds_count{engine="sync",statement="SELECT"}') >= 1
+
+
+def test_metrics_of_several_processes_are_rendered_together(tmp_path: Path) -> None:
+    # prometheus_client reads the directory when it is imported, so each worker is a process of its own.
+    script = (
+        "import sys\n"
+        "from songs_api.metrics import Metrics\n"
+        "metrics = Metrics()\n"
+        "metrics.requests.labels('GET', '/songs/', '200').inc()\n"
+        "sys.stdout.write(metrics.render()[0].decode())\n"
+    )
+    environment = {**os.environ, MULTIPROCESS_DIRECTORY_VARIABLE: str(tmp_path)}
+    command = [sys.executable, "-c", script]
+    outputs = [
+        subprocess.run(command, env=environment, check=True, capture_output=True, text=True).stdout for _ in range(2)
+    ]
+
+    assert 'songs_api_http_requests_total{method="GET",route="/songs/",status="200"} 1.0' in outputs[0]
+    assert 'songs_api_http_requests_total{method="GET",route="/songs/",status="200"} 2.0' in outputs[1]
+
+
+def test_metrics_of_admission(client: TestClient) -> None:
+    # The default pool has 5 connections plus 10 overflow connections.
+    assert get_metric(client, 'songs_api_admission_limit{kind="read"}') == 15
+    assert get_metric(client, 'songs_api_admission_limit{kind="write"}') == 15
+    assert get_metric(client, 'songs_api_admission_active_requests{kind="read"}') == 0
+    assert get_metric(client, 'songs_api_admission_waiting_requests{kind="write"}') == 0
+    assert get_metric(client, 'songs_api_admission_rejected_requests_total{kind="read"}') == 0
+
+
+@pytest.mark.parametrize(
+    "statement, expected_type",
+    [
+        ("SELECT song.id FROM song", "SELECT"),
+        ("\n    insert into song (title) values (?)", "INSERT"),
+        ("UPDATE song SET title = ?", "UPDATE"),
+        ("DELETE FROM song WHERE id = ?", "DELETE"),
+        ("PRAGMA journal_mode = WAL", "OTHER"),
+        ("WITH ids AS (SELECT 1) SELECT * FROM ids", "OTHER"),
+    ],
+)
+def test_get_statement_type(statement: str, expected_type: str) -> None:
+    assert get_statement_type(statement) == expected_type
@@ -0,0 +1,74 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from songs_api.config import CacheConfig, Config, DatabaseConfig, DatabasePerformanceConfig, ServerConfig
+from songs_api.metrics import MULTIPROCESS_DIRECTORY_VARIABLE
+from songs_api.serve import get_worker_config, get_worker_count, prepare_metrics_directory
+
+
+def create_config(workers: int, budget: int | None) -> Config:
+    return Config(
+        database=DatabaseConfig(
+            url="postgresql://localhost/songs", performance=DatabasePerformanceConfig(pool_size=5, max_overflow=10)
+        ),
+        server=ServerConfig(workers=workers, database_connection_budget=budget),
+    )
+
+
+@pytest.mark.parametrize(
+    "workers,budget,expected_pool_size,expected_max_overflow",
+    [
+        (4, None, 5, 10),
+        (4, 100, 5, 10),
+        (4, 40, 5, 3),
+        (4, 12, 2, 0),
+        (4, 5, 1, 0),
+    ],
+)
+def test_get_worker_config(
+    workers: int, budget: int | None, expected_pool_size: int, expected_max_overflow: int
+) -> None:
+    performance = get_worker_config(create_config(workers, budget)).database.performance
+
+    assert (performance.pool_size, performance.max_overflow) == (expected_pool_size, expected_max_overflow)
+    # A rolling restart runs one extra worker.
+    assert budget is None or (workers + 1) * (performance.pool_size + performance.max_overflow) <= budget
+
+
+def test_get_worker_config_with_too_small_budget() -> None:
+    with pytest.raises(ValueError):
+        get_worker_config(create_config(4, 4))
+
+
+def test_get_worker_count() -> None:
+    assert get_worker_count(ServerConfig(workers=3)) == 3
+    assert get_worker_count(ServerConfig()) >= 1
+
+
+def test_get_worker_config_with_single_process_cache() -> None:
+    config = create_config(1, None).model_copy(update={"cache": CacheConfig(single_process=True)})
+    assert get_worker_config(config).cache.single_process
+
+    config = config.model_copy(update={"server": ServerConfig(workers=2)})
+    with pytest.raises(ValueError, match="single_process"):
+        get_worker_config(config)
+
+
+def test_prepare_metrics_directory(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # The variable is set with monkeypatch first, so that it is restored although prepare_metrics_directory() sets it.
+    monkeypatch.setenv(MULTIPROCESS_DIRECTORY_VARIABLE, "")
+    monkeypatch.delenv(MULTIPROCESS_DIRECTORY_VARIABLE)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    prepare_metrics_directory()
+    directory = Path(os.environ[MULTIPROCESS_DIRECTORY_VARIABLE])
+    assert directory.is_dir() and directory.parent == tmp_path
+    directory.rmdir()
+
+    # The metrics of a previous run are removed.
+    (tmp_path / "counter_123.db").write_bytes(b"")
+    monkeypatch.setenv(MULTIPROCESS_DIRECTORY_VARIABLE, str(tmp_path))
+    prepare_metrics_directory()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,140 @@
+import asyncio
+from collections.abc import Iterator
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from pydantic import SecretStr
+from sqlalchemy import select, text
+
+from songs_api import slow_queries
+from songs_api.config import Config, DatabaseConfig, SlowQueryLogConfig
+from songs_api.database import DatabaseAccess, Song
+from songs_api.endpoints import build_app
+
+
+def create_recording_database_access(
+    database_access: DatabaseAccess, slow_query_log: SlowQueryLogConfig
+) -> DatabaseAccess:
+    """Creates a `DatabaseAccess` instance for the database of `database_access` with the slow query log settings."""
+    database_config = DatabaseConfig(
+        url=database_access.engine.url.render_as_string(hide_password=False),
+        mode="async" if database_access.is_async else "sync",
+        slow_query_log=slow_query_log,
+    )
+    return DatabaseAccess(Config(database=database_config))
+
+
+@pytest.fixture
+def recording_database_access(database_access: DatabaseAccess) -> Iterator[DatabaseAccess]:
+    """Gets a `DatabaseAccess` instance for the database of `database_access` that records every statement."""
+    recording_database_access = create_recording_database_access(
+        database_access, SlowQueryLogConfig(enabled=True, threshold_ms=0, admin_token=SecretStr("secret"))
+    )
+    yield recording_database_access
+    recording_database_access.engine.dispose()
+
+
+@pytest.mark.parametrize("database_access", ["sync", "async"], indirect=True)
+def test_statements_are_recorded_with_plan(recording_database_access: DatabaseAccess) -> None:
+    database_access = recording_database_access
+    songs = asyncio.run(
+        database_access.run_in_session(lambda session: database_access.get_all_songs(session), read_only=True)
+    )
+    assert songs == []
+
+    entry = next(entry for entry in database_access.slow_query_log.get_entries() if "FROM song" in entry.statement)
+    assert entry.database == "primary"
+    assert entry.route is None
+    assert not entry.sampled
+    assert entry.executions == 1
+    assert entry.plan is not None and any("song" in line for line in entry.plan)
+
+
+def test_parameter_shapes_are_recorded_without_values(recording_database_access: DatabaseAccess) -> None:
+    database_access = recording_database_access
+    with database_access.get_session() as session:
+        session.execute(text("SELECT title FROM song WHERE id = :id AND title = :title"), {"id": 1, "title": "Secret"})
+
+    [entry] = database_access.slow_query_log.get_entries()
+    assert entry.parameters == ["int", "str"]
+    assert "Secret" not in entry.model_dump_json()
+
+
+@pytest.mark.parametrize("prefix", ["EXPLAIN QUERY PLAN ", "EXPLAIN QUERY PLAN OF "])
+def test_statements_are_explained_in_savepoint(
+    recording_database_access: DatabaseAccess, monkeypatch: pytest.MonkeyPatch, prefix: str
+) -> None:
+    database_access = recording_database_access
+    monkeypatch.setattr(slow_queries, "EXPLAIN_SAVEPOINT_DIALECTS", {"sqlite"})
+    monkeypatch.setitem(slow_queries.EXPLAIN_PREFIXES, "sqlite", prefix)
+    with database_access.get_session() as session:
+        database_access.create_song(
+            session, Song(title="Hurricane", composer="Bob Dylan", artist="Bob Dylan", year_of_release=1975)
+        )
+        session.execute(text("UPDATE song SET year_of_release = 1976"))
+        session.commit()
+
+    with database_access.get_session() as session:
+        assert session.scalars(select(Song.year_of_release)).all() == [1976]
+    entries = database_access.slow_query_log.get_entries()
+    entry = next(entry for entry in entries if entry.statement.startswith("UPDATE"))
+    if prefix == "EXPLAIN QUERY PLAN ":
+        assert entry.plan is not None and any("song" in line for line in entry.plan)
+    else:
+        assert entry.plan is None
+
+
+def test_entries_are_kept_in_ring_buffer(database_access: DatabaseAccess) -> None:
+    config = SlowQueryLogConfig(enabled=True, threshold_ms=1000, sample_rate=1.0, max_entries=2, explain=False)
+    database_access = create_recording_database_access(database_access, config)
+    with database_access.get_session() as session:
+        for number in range(3):
+            session.execute(text(f"SELECT {number}"))
+    database_access.engine.dispose()
+
+    entries = database_access.slow_query_log.get_entries()
+    assert [entry.statement for entry in entries] == ["SELECT 2", "SELECT 1"]
+    assert all(entry.sampled and entry.plan is None for entry in entries)
+
+
+def test_get_slow_queries_with_route(recording_database_access: DatabaseAccess) -> None:
+    database_access = recording_database_access
+    with database_access.get_session() as session:
+        song = database_access.create_song(
+            session, Song(title="Hurricane", composer="Bob Dylan", artist="Bob Dylan", year_of_release=1975)
+        )
+        session.commit()
+        song_id = song.id
+
+    with TestClient(build_app(database_access)) as client:
+        assert client.get(f"/songs/{song_id}").status_code == status.HTTP_200_OK
+        response = client.get("/admin/slow-queries", headers={"Authorization": "Bearer secret"})
+
+    assert response.status_code == status.HTTP_200_OK
+    routes = {entry["route"] for entry in response.json()}
+    assert "GET /songs/{song_id}" in routes
+
+
+@pytest.mark.parametrize("authorization", [None, "Bearer wrong", "secret"])
+def test_get_slow_queries_requires_admin_token(
+    recording_database_access: DatabaseAccess, authorization: str | None
+) -> None:
+    headers = {"Authorization": authorization} if authorization is not None else {}
+    with TestClient(build_app(recording_database_access)) as client:
+        response = client.get("/admin/slow-queries", headers=headers)
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+@pytest.mark.parametrize(
+    "config",
+    [SlowQueryLogConfig(), SlowQueryLogConfig(enabled=True), SlowQueryLogConfig(admin_token=SecretStr("secret"))],
+)
+def test_slow_queries_are_not_served_by_default(database_access: DatabaseAccess, config: SlowQueryLogConfig) -> None:
+    database_access = create_recording_database_access(database_access, config)
+    with TestClient(build_app(database_access)) as client:
+        response = client.get("/admin/slow-queries", headers={"Authorization": "Bearer secret"})
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
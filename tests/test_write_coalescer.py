@@ -0,0 +1,101 @@
+import asyncio
+from collections.abc import Iterator
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from songs_api.config import Config, DatabaseConfig, WriteCoalescingConfig
+from songs_api.database import DatabaseAccess, Song
+
+# All tests are executed in both database modes.
+pytestmark = pytest.mark.parametrize("database_access", ["sync", "async"], indirect=True)
+
+
+@pytest.fixture
+def coalescing_database_access(database_access: DatabaseAccess) -> Iterator[DatabaseAccess]:
+    """Gets a `DatabaseAccess` instance for the database of `database_access` with write coalescing enabled."""
+    database_config = DatabaseConfig(
+        url=database_access.engine.url.render_as_string(hide_password=False),
+        mode="async" if database_access.is_async else "sync",
+        write_coalescing=WriteCoalescingConfig(enabled=True, window_ms=50, max_batch_size=4),
+    )
+    coalescing_database_access = DatabaseAccess(Config(database=database_config))
+    yield coalescing_database_access
+    coalescing_database_access.engine.dispose()
+
+
+def count_commits(database_access: DatabaseAccess) -> list[None]:
+    """Gets a list to which an element is added for each commit of the engine that executes the writes."""
+    engine = database_access.async_engine.sync_engine if database_access.async_engine else database_access.engine
+    commits: list[None] = []
+    event.listen(engine, "commit", lambda connection: commits.append(None))
+    return commits
+
+
+def create_song(title: str) -> Song:
+    return Song(title=title, composer="Roger Hodgson", artist="Supertramp", year_of_release=1979)
+
+
+async def write_song(database_access: DatabaseAccess, title: str) -> int:
+    """Creates a song with `run_write()` and returns its id."""
+    return await database_access.run_write(lambda session: database_access.create_song(session, create_song(title)).id)
+
+
+def test_concurrent_writes_share_a_transaction(coalescing_database_access: DatabaseAccess) -> None:
+    database_access = coalescing_database_access
+    with database_access.get_session() as session:
+        catalog_version = database_access.get_catalog_version(session)
+    commits = count_commits(database_access)
+
+    async def create_songs() -> list[int]:
+        results = await asyncio.gather(*(write_song(database_access, f"{i}") for i in range(3)))
+        await database_access.dispose()
+        return results
+
+    song_ids = asyncio.run(create_songs())
+    assert len(set(song_ids)) == 3
+    assert len(commits) == 1
+    with database_access.get_session() as session:
+        assert [session.get_one(Song, song_id).title for song_id in song_ids] == ["0", "1", "2"]
+        assert database_access.get_catalog_version(session) == catalog_version + 1
+
+
+def test_failed_write_is_rolled_back_alone(coalescing_database_access: DatabaseAccess) -> None:
+    database_access = coalescing_database_access
+
+    def create_and_fail(session: Session) -> None:
+        database_access.create_song(session, create_song("Failed"))
+        raise ValueError("Failed")
+
+    async def write() -> tuple[int | BaseException, BaseException | None, BaseException | None]:
+        results = await asyncio.gather(
+            write_song(database_access, "Created"),
+            database_access.run_write(create_and_fail),
+            database_access.run_write(lambda session: database_access.delete_song(session, 12345)),
+            return_exceptions=True,
+        )
+        await database_access.dispose()
+        return results
+
+    song_id, failure, not_found = asyncio.run(write())
+    assert isinstance(failure, ValueError) and str(failure) == "Failed"
+    assert isinstance(not_found, ValueError) and "12345" in str(not_found)
+    with database_access.get_session() as session:
+        assert session.scalars(select(Song.title)).all() == ["Created"]
+        assert session.get_one(Song, song_id).title == "Created"
+
+
+def test_full_batch_is_committed_without_waiting(coalescing_database_access: DatabaseAccess) -> None:
+    database_access = coalescing_database_access
+    commits = count_commits(database_access)
+
+    async def create_songs() -> None:
+        await asyncio.gather(*(write_song(database_access, "Song") for _ in range(9)))
+        await database_access.dispose()
+
+    asyncio.run(create_songs())
+    # The batches contain 4, 4 and 1 songs.
+    assert len(commits) == 3
+    with database_access.get_session() as session:
+        assert session.scalar(select(func.count()).select_from(Song)) == 9